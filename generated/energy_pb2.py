@@ -24,41 +24,73 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0c\x65nergy.proto\x12\x06\x65nergy\"u\n\rRawEnergyData\x12\x11\n\ttimestamp\x18\x01 \x01(\t\x12\x14\n\x0chousehold_id\x18\x02 \x01(\t\x12\x19\n\x11power_consumption\x18\x03 \x01(\t\x12\x0f\n\x07voltage\x18\x04 \x01(\t\x12\x0f\n\x07\x63urrent\x18\x05 \x01(\t\"\x8d\x01\n\x15ProcessedEnergyReport\x12\x11\n\ttimestamp\x18\x01 \x01(\t\x12\x14\n\x0chousehold_id\x18\x02 \x01(\t\x12\r\n\x05power\x18\x03 \x01(\x02\x12\x12\n\nefficiency\x18\x04 \x01(\x02\x12\x0e\n\x06status\x18\x05 \x01(\t\x12\x18\n\x10\x61nomaly_detected\x18\x06 \x01(\x08\"m\n\x13ProcessedDataReport\x12\x30\n\tprocessed\x18\x01 \x03(\x0b\x32\x1d.energy.ProcessedEnergyReport\x12\x14\n\x0cskipped_rows\x18\x02 \x01(\x05J\x04\x08\x03\x10\x04R\x08raw_data\"\x1f\n\x0fGenerateRequest\x12\x0c\n\x04rows\x18\x01 \x01(\x05\"7\n\x10GenerateResponse\x12#\n\x04\x64\x61ta\x18\x01 \x03(\x0b\x32\x15.energy.RawEnergyData\"5\n\x0e\x41nalyzeRequest\x12#\n\x04\x64\x61ta\x18\x01 \x03(\x0b\x32\x15.energy.RawEnergyData\">\n\x0f\x41nalyzeResponse\x12+\n\x06report\x18\x01 \x01(\x0b\x32\x1b.energy.ProcessedDataReport\"<\n\rReportRequest\x12+\n\x06report\x18\x01 \x01(\x0b\x32\x1b.energy.ProcessedDataReport\"#\n\x0eReportResponse\x12\x11\n\thtml_path\x18\x01 \x01(\t\"9\n\x0e\x45xecuteRequest\x12\x12\n\ninput_file\x18\x01 \x01(\t\x12\x13\n\x0boutput_file\x18\x02 \x01(\t\"3\n\x0f\x45xecuteResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t2T\n\x0f\x45nergyGenerator\x12\x41\n\x0cGenerateData\x12\x17.energy.GenerateRequest\x1a\x18.energy.GenerateResponse2P\n\x0e\x45nergyAnalyzer\x12>\n\x0b\x41nalyzeData\x12\x16.energy.AnalyzeRequest\x1a\x17.energy.AnalyzeResponse2R\n\x0fReportGenerator\x12?\n\x0eGenerateReport\x12\x15.energy.ReportRequest\x1a\x16.energy.ReportResponse2O\n\x11\x43ontainerExecutor\x12:\n\x07\x45xecute\x12\x16.energy.ExecuteRequest\x1a\x17.energy.ExecuteResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0c\x65nergy.proto\x12\x06\x65nergy\"u\n\rRawEnergyData\x12\x11\n\ttimestamp\x18\x01 \x01(\t\x12\x14\n\x0chousehold_id\x18\x02 \x01(\t\x12\x19\n\x11power_consumption\x18\x03 \x01(\t\x12\x0f\n\x07voltage\x18\x04 \x01(\t\x12\x0f\n\x07\x63urrent\x18\x05 \x01(\t\"\x8d\x01\n\x15ProcessedEnergyReport\x12\x11\n\ttimestamp\x18\x01 \x01(\t\x12\x14\n\x0chousehold_id\x18\x02 \x01(\t\x12\r\n\x05power\x18\x03 \x01(\x02\x12\x12\n\nefficiency\x18\x04 \x01(\x02\x12\x0e\n\x06status\x18\x05 \x01(\t\x12\x18\n\x10\x61nomaly_detected\x18\x06 \x01(\x08\"m\n\x13ProcessedDataReport\x12\x30\n\tprocessed\x18\x01 \x03(\x0b\x32\x1d.energy.ProcessedEnergyReport\x12\x14\n\x0cskipped_rows\x18\x02 \x01(\x05J\x04\x08\x03\x10\x04R\x08raw_data\"!\n\x11RawEnergyDataRows\x12\x0c\n\x04\x64\x61ta\x18\x01 \x03(\x0c\"\xa3\x01\n\x0eRawEnergyBatch\x12\x15\n\rhousehold_ids\x18\x01 \x03(\t\x12\x11\n\thousehold\x18\x02 \x03(\r\x12\x14\n\x0ctimestamp_ms\x18\x03 \x03(\x03\x12\x19\n\x11power_consumption\x18\x04 \x03(\x01\x12\x0f\n\x07voltage\x18\x05 \x03(\x01\x12\x0f\n\x07\x63urrent\x18\x06 \x03(\x01\x12\x14\n\x0cskipped_rows\x18\x07 \x01(\x05\"\xcb\x01\n\x14ProcessedEnergyBatch\x12\x15\n\rhousehold_ids\x18\x01 \x03(\t\x12\x11\n\thousehold\x18\x02 \x03(\r\x12\x14\n\x0ctimestamp_ms\x18\x03 \x03(\x03\x12\r\n\x05power\x18\x04 \x03(\x02\x12\x12\n\nefficiency\x18\x05 \x03(\x02\x12\x10\n\x08statuses\x18\x06 \x03(\t\x12\x0e\n\x06status\x18\x07 \x03(\r\x12\x18\n\x10\x61nomaly_detected\x18\x08 \x03(\x08\x12\x14\n\x0cskipped_rows\x18\t \x01(\x05\"\xa2\x01\n\x0fGenerateRequest\x12\x0c\n\x04rows\x18\x01 \x01(\x05\x12\x12\n\nchunk_size\x18\x02 \x01(\x05\x12\x0c\n\x04seed\x18\x03 \x01(\x04\x12\x12\n\nhouseholds\x18\x04 \x01(\r\x12\x10\n\x08start_ms\x18\x05 \x01(\x03\x12\x0e\n\x06\x65nd_ms\x18\x06 \x01(\x03\x12\x13\n\x0binterval_ms\x18\x07 \x01(\x03\x12\x14\n\x0c\x61nomaly_rate\x18\x08 \x01(\x01\"7\n\x10GenerateResponse\x12#\n\x04\x64\x61ta\x18\x01 \x03(\x0b\x32\x15.energy.RawEnergyData\"5\n\x0e\x41nalyzeRequest\x12#\n\x04\x64\x61ta\x18\x01 \x03(\x0b\x32\x15.energy.RawEnergyData\">\n\x0f\x41nalyzeResponse\x12+\n\x06report\x18\x01 \x01(\x0b\x32\x1b.energy.ProcessedDataReport\"q\n\rReportRequest\x12+\n\x06report\x18\x01 \x01(\x0b\x32\x1b.energy.ProcessedDataReport\x12$\n\x06\x66ormat\x18\x02 \x01(\x0e\x32\x14.energy.ReportFormat\x12\r\n\x05store\x18\x03 \x01(\x08\"v\n\x12\x42\x61tchReportRequest\x12+\n\x05\x62\x61tch\x18\x01 \x01(\x0b\x32\x1c.energy.ProcessedEnergyBatch\x12$\n\x06\x66ormat\x18\x02 \x01(\x0e\x32\x14.energy.ReportFormat\x12\r\n\x05store\x18\x03 \x01(\x08\"p\n\x0eReportResponse\x12\x11\n\thtml_path\x18\x01 \x01(\t\x12\x0c\n\x04path\x18\x02 \x01(\t\x12$\n\x06\x66ormat\x18\x03 \x01(\x0e\x32\x14.energy.ReportFormat\x12\x17\n\x0fpartition_paths\x18\x04 \x03(\t\"G\n\x07\x46ileRef\x12\x0c\n\x04path\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x04\x12\x0e\n\x06length\x18\x03 \x01(\x04\x12\x0e\n\x06sha256\x18\x04 \x01(\t\"T\n\x13GenerateFileRequest\x12(\n\x07request\x18\x01 \x01(\x0b\x32\x17.energy.GenerateRequest\x12\x13\n\x0boutput_file\x18\x02 \x01(\t\"_\n\x12\x41nalyzeFileRequest\x12\x1e\n\x05input\x18\x01 \x01(\x0b\x32\x0f.energy.FileRef\x12\x13\n\x0boutput_file\x18\x02 \x01(\t\x12\x14\n\x0cremove_input\x18\x03 \x01(\x08\"~\n\x11ReportFileRequest\x12\x1e\n\x05input\x18\x01 \x01(\x0b\x32\x0f.energy.FileRef\x12$\n\x06\x66ormat\x18\x02 \x01(\x0e\x32\x14.energy.ReportFormat\x12\r\n\x05store\x18\x03 \x01(\x08\x12\x14\n\x0cremove_input\x18\x04 \x01(\x08\"Q\n\x0c\x46ileResponse\x12\x1d\n\x04\x66ile\x18\x01 \x01(\x0b\x32\x0f.energy.FileRef\x12\x0c\n\x04rows\x18\x02 \x01(\x03\x12\x14\n\x0cskipped_rows\x18\x03 \x01(\x05\"\x83\x01\n\x0fPipelineRequest\x12(\n\x07request\x18\x01 \x01(\x0b\x32\x17.energy.GenerateRequest\x12$\n\x06\x66ormat\x18\x02 \x01(\x0e\x32\x14.energy.ReportFormat\x12\r\n\x05store\x18\x03 \x01(\x08\x12\x11\n\tin_flight\x18\x04 \x01(\r\"\xd5\x01\n\x10PipelineProgress\x12\x0c\n\x04rows\x18\x01 \x01(\x03\x12\x16\n\x0egenerated_rows\x18\x02 \x01(\x03\x12\x15\n\ranalyzed_rows\x18\x03 \x01(\x03\x12\x15\n\rreported_rows\x18\x04 \x01(\x03\x12\x14\n\x0cskipped_rows\x18\x05 \x01(\x05\x12\x0e\n\x06\x63hunks\x18\x06 \x01(\x05\x12\x11\n\telapsed_s\x18\x07 \x01(\x01\x12\x0c\n\x04\x64one\x18\x08 \x01(\x08\x12&\n\x06report\x18\t \x01(\x0b\x32\x16.energy.ReportResponse\"q\n\x10\x41ggregateRequest\x12#\n\x04\x64\x61ta\x18\x01 \x03(\x0b\x32\x15.energy.RawEnergyData\x12%\n\x05\x62\x61tch\x18\x02 \x01(\x0b\x32\x16.energy.RawEnergyBatch\x12\x11\n\twindow_ms\x18\x03 \x01(\x03\"\xda\x01\n\x11\x41ggregateResponse\x12\x15\n\rhousehold_ids\x18\x01 \x03(\t\x12\x11\n\thousehold\x18\x02 \x03(\r\x12\x17\n\x0fwindow_start_ms\x18\x03 \x03(\x03\x12\r\n\x05\x63ount\x18\x04 \x03(\r\x12\x0b\n\x03sum\x18\x05 \x03(\x01\x12\x0b\n\x03min\x18\x06 \x03(\x01\x12\x0b\n\x03max\x18\x07 \x03(\x01\x12\x0c\n\x04mean\x18\x08 \x03(\x01\x12\x15\n\ranomaly_count\x18\t \x03(\r\x12\x11\n\twindow_ms\x18\n \x01(\x03\x12\x14\n\x0cskipped_rows\x18\x0b \x01(\x05\"L\n\x12QueryReportRequest\x12\x14\n\x0chousehold_id\x18\x01 \x01(\t\x12\x10\n\x08start_ms\x18\x02 \x01(\x03\x12\x0e\n\x06\x65nd_ms\x18\x03 \x01(\x03\"9\n\x0e\x45xecuteRequest\x12\x12\n\ninput_file\x18\x01 \x01(\t\x12\x13\n\x0boutput_file\x18\x02 \x01(\t\"3\n\x0f\x45xecuteResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t*\x91\x01\n\x0cReportFormat\x12\x15\n\x11REPORT_FORMAT_CSV\x10\x00\x12\x1e\n\x1aREPORT_FORMAT_CSV_COLUMNAR\x10\x01\x12\x19\n\x15REPORT_FORMAT_PARQUET\x10\x02\x12\x17\n\x13REPORT_FORMAT_ARROW\x10\x03\x12\x16\n\x12REPORT_FORMAT_HTML\x10\x04\x32\xa4\x02\n\x0f\x45nergyGenerator\x12\x41\n\x0cGenerateData\x12\x17.energy.GenerateRequest\x1a\x18.energy.GenerateResponse\x12I\n\x12GenerateDataStream\x12\x17.energy.GenerateRequest\x1a\x18.energy.GenerateResponse0\x01\x12@\n\rGenerateBatch\x12\x17.energy.GenerateRequest\x1a\x16.energy.RawEnergyBatch\x12\x41\n\x0cGenerateFile\x12\x1b.energy.GenerateFileRequest\x1a\x14.energy.FileResponse2\xaf\x03\n\x0e\x45nergyAnalyzer\x12>\n\x0b\x41nalyzeData\x12\x16.energy.AnalyzeRequest\x1a\x17.energy.AnalyzeResponse\x12\x46\n\x11\x41nalyzeDataStream\x12\x16.energy.AnalyzeRequest\x1a\x17.energy.AnalyzeResponse(\x01\x12H\n\x11\x41nalyzeDataChunks\x12\x16.energy.AnalyzeRequest\x1a\x17.energy.AnalyzeResponse(\x01\x30\x01\x12\x44\n\x0c\x41nalyzeBatch\x12\x16.energy.RawEnergyBatch\x1a\x1c.energy.ProcessedEnergyBatch\x12?\n\x0b\x41nalyzeFile\x12\x1a.energy.AnalyzeFileRequest\x1a\x14.energy.FileResponse\x12\x44\n\rAggregateData\x12\x18.energy.AggregateRequest\x1a\x19.energy.AggregateResponse2\xfd\x02\n\x0fReportGenerator\x12?\n\x0eGenerateReport\x12\x15.energy.ReportRequest\x1a\x16.energy.ReportResponse\x12I\n\x13GenerateBatchReport\x12\x1a.energy.BatchReportRequest\x1a\x16.energy.ReportResponse\x12K\n\x16GenerateReportFromFile\x12\x19.energy.ReportFileRequest\x1a\x16.energy.ReportResponse\x12G\n\x14GenerateReportStream\x12\x15.energy.ReportRequest\x1a\x16.energy.ReportResponse(\x01\x12H\n\x0bQueryReport\x12\x1a.energy.QueryReportRequest\x1a\x1b.energy.ProcessedDataReport0\x01\x32Z\n\x14PipelineOrchestrator\x12\x42\n\x0bRunPipeline\x12\x17.energy.PipelineRequest\x1a\x18.energy.PipelineProgress0\x01\x32O\n\x11\x43ontainerExecutor\x12:\n\x07\x45xecute\x12\x16.energy.ExecuteRequest\x1a\x17.energy.ExecuteResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'energy_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_REPORTFORMAT']._serialized_start=2839
+  _globals['_REPORTFORMAT']._serialized_end=2984
   _globals['_RAWENERGYDATA']._serialized_start=24
   _globals['_RAWENERGYDATA']._serialized_end=141
   _globals['_PROCESSEDENERGYREPORT']._serialized_start=144
   _globals['_PROCESSEDENERGYREPORT']._serialized_end=285
   _globals['_PROCESSEDDATAREPORT']._serialized_start=287
   _globals['_PROCESSEDDATAREPORT']._serialized_end=396
-  _globals['_GENERATEREQUEST']._serialized_start=398
-  _globals['_GENERATEREQUEST']._serialized_end=429
-  _globals['_GENERATERESPONSE']._serialized_start=431
-  _globals['_GENERATERESPONSE']._serialized_end=486
-  _globals['_ANALYZEREQUEST']._serialized_start=488
-  _globals['_ANALYZEREQUEST']._serialized_end=541
-  _globals['_ANALYZERESPONSE']._serialized_start=543
-  _globals['_ANALYZERESPONSE']._serialized_end=605
-  _globals['_REPORTREQUEST']._serialized_start=607
-  _globals['_REPORTREQUEST']._serialized_end=667
-  _globals['_REPORTRESPONSE']._serialized_start=669
-  _globals['_REPORTRESPONSE']._serialized_end=704
-  _globals['_EXECUTEREQUEST']._serialized_start=706
-  _globals['_EXECUTEREQUEST']._serialized_end=763
-  _globals['_EXECUTERESPONSE']._serialized_start=765
-  _globals['_EXECUTERESPONSE']._serialized_end=816
-  _globals['_ENERGYGENERATOR']._serialized_start=818
-  _globals['_ENERGYGENERATOR']._serialized_end=902
-  _globals['_ENERGYANALYZER']._serialized_start=904
-  _globals['_ENERGYANALYZER']._serialized_end=984
-  _globals['_REPORTGENERATOR']._serialized_start=986
-  _globals['_REPORTGENERATOR']._serialized_end=1068
-  _globals['_CONTAINEREXECUTOR']._serialized_start=1070
-  _globals['_CONTAINEREXECUTOR']._serialized_end=1149
+  _globals['_RAWENERGYDATAROWS']._serialized_start=398
+  _globals['_RAWENERGYDATAROWS']._serialized_end=431
+  _globals['_RAWENERGYBATCH']._serialized_start=434
+  _globals['_RAWENERGYBATCH']._serialized_end=597
+  _globals['_PROCESSEDENERGYBATCH']._serialized_start=600
+  _globals['_PROCESSEDENERGYBATCH']._serialized_end=803
+  _globals['_GENERATEREQUEST']._serialized_start=806
+  _globals['_GENERATEREQUEST']._serialized_end=968
+  _globals['_GENERATERESPONSE']._serialized_start=970
+  _globals['_GENERATERESPONSE']._serialized_end=1025
+  _globals['_ANALYZEREQUEST']._serialized_start=1027
+  _globals['_ANALYZEREQUEST']._serialized_end=1080
+  _globals['_ANALYZERESPONSE']._serialized_start=1082
+  _globals['_ANALYZERESPONSE']._serialized_end=1144
+  _globals['_REPORTREQUEST']._serialized_start=1146
+  _globals['_REPORTREQUEST']._serialized_end=1259
+  _globals['_BATCHREPORTREQUEST']._serialized_start=1261
+  _globals['_BATCHREPORTREQUEST']._serialized_end=1379
+  _globals['_REPORTRESPONSE']._serialized_start=1381
+  _globals['_REPORTRESPONSE']._serialized_end=1493
+  _globals['_FILEREF']._serialized_start=1495
+  _globals['_FILEREF']._serialized_end=1566
+  _globals['_GENERATEFILEREQUEST']._serialized_start=1568
+  _globals['_GENERATEFILEREQUEST']._serialized_end=1652
+  _globals['_ANALYZEFILEREQUEST']._serialized_start=1654
+  _globals['_ANALYZEFILEREQUEST']._serialized_end=1749
+  _globals['_REPORTFILEREQUEST']._serialized_start=1751
+  _globals['_REPORTFILEREQUEST']._serialized_end=1877
+  _globals['_FILERESPONSE']._serialized_start=1879
+  _globals['_FILERESPONSE']._serialized_end=1960
+  _globals['_PIPELINEREQUEST']._serialized_start=1963
+  _globals['_PIPELINEREQUEST']._serialized_end=2094
+  _globals['_PIPELINEPROGRESS']._serialized_start=2097
+  _globals['_PIPELINEPROGRESS']._serialized_end=2310
+  _globals['_AGGREGATEREQUEST']._serialized_start=2312
+  _globals['_AGGREGATEREQUEST']._serialized_end=2425
+  _globals['_AGGREGATERESPONSE']._serialized_start=2428
+  _globals['_AGGREGATERESPONSE']._serialized_end=2646
+  _globals['_QUERYREPORTREQUEST']._serialized_start=2648
+  _globals['_QUERYREPORTREQUEST']._serialized_end=2724
+  _globals['_EXECUTEREQUEST']._serialized_start=2726
+  _globals['_EXECUTEREQUEST']._serialized_end=2783
+  _globals['_EXECUTERESPONSE']._serialized_start=2785
+  _globals['_EXECUTERESPONSE']._serialized_end=2836
+  _globals['_ENERGYGENERATOR']._serialized_start=2987
+  _globals['_ENERGYGENERATOR']._serialized_end=3279
+  _globals['_ENERGYANALYZER']._serialized_start=3282
+  _globals['_ENERGYANALYZER']._serialized_end=3713
+  _globals['_REPORTGENERATOR']._serialized_start=3716
+  _globals['_REPORTGENERATOR']._serialized_end=4097
+  _globals['_PIPELINEORCHESTRATOR']._serialized_start=4099
+  _globals['_PIPELINEORCHESTRATOR']._serialized_end=4189
+  _globals['_CONTAINEREXECUTOR']._serialized_start=4191
+  _globals['_CONTAINEREXECUTOR']._serialized_end=4270
 # @@protoc_insertion_point(module_scope)
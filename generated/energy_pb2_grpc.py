@@ -40,6 +40,21 @@ class EnergyGeneratorStub(object):
                 request_serializer=energy__pb2.GenerateRequest.SerializeToString,
                 response_deserializer=energy__pb2.GenerateResponse.FromString,
                 _registered_method=True)
+        self.GenerateDataStream = channel.unary_stream(
+                '/energy.EnergyGenerator/GenerateDataStream',
+                request_serializer=energy__pb2.GenerateRequest.SerializeToString,
+                response_deserializer=energy__pb2.GenerateResponse.FromString,
+                _registered_method=True)
+        self.GenerateBatch = channel.unary_unary(
+                '/energy.EnergyGenerator/GenerateBatch',
+                request_serializer=energy__pb2.GenerateRequest.SerializeToString,
+                response_deserializer=energy__pb2.RawEnergyBatch.FromString,
+                _registered_method=True)
+        self.GenerateFile = channel.unary_unary(
+                '/energy.EnergyGenerator/GenerateFile',
+                request_serializer=energy__pb2.GenerateFileRequest.SerializeToString,
+                response_deserializer=energy__pb2.FileResponse.FromString,
+                _registered_method=True)
 
 
 class EnergyGeneratorServicer(object):
@@ -52,6 +67,26 @@ class EnergyGeneratorServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GenerateDataStream(self, request, context):
+        """Same rows as GenerateData, sent as chunks of request.chunk_size rows.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GenerateBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GenerateFile(self, request, context):
+        """Same rows as GenerateData, written to a file in the shared volume.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_EnergyGeneratorServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -60,6 +95,21 @@ def add_EnergyGeneratorServicer_to_server(servicer, server):
                     request_deserializer=energy__pb2.GenerateRequest.FromString,
                     response_serializer=energy__pb2.GenerateResponse.SerializeToString,
             ),
+            'GenerateDataStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.GenerateDataStream,
+                    request_deserializer=energy__pb2.GenerateRequest.FromString,
+                    response_serializer=energy__pb2.GenerateResponse.SerializeToString,
+            ),
+            'GenerateBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.GenerateBatch,
+                    request_deserializer=energy__pb2.GenerateRequest.FromString,
+                    response_serializer=energy__pb2.RawEnergyBatch.SerializeToString,
+            ),
+            'GenerateFile': grpc.unary_unary_rpc_method_handler(
+                    servicer.GenerateFile,
+                    request_deserializer=energy__pb2.GenerateFileRequest.FromString,
+                    response_serializer=energy__pb2.FileResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'energy.EnergyGenerator', rpc_method_handlers)
@@ -99,6 +149,87 @@ class EnergyGenerator(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def GenerateDataStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/energy.EnergyGenerator/GenerateDataStream',
+            energy__pb2.GenerateRequest.SerializeToString,
+            energy__pb2.GenerateResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GenerateBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/energy.EnergyGenerator/GenerateBatch',
+            energy__pb2.GenerateRequest.SerializeToString,
+            energy__pb2.RawEnergyBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GenerateFile(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/energy.EnergyGenerator/GenerateFile',
+            energy__pb2.GenerateFileRequest.SerializeToString,
+            energy__pb2.FileResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class EnergyAnalyzerStub(object):
     """Missing associated documentation comment in .proto file."""
@@ -114,6 +245,31 @@ class EnergyAnalyzerStub(object):
                 request_serializer=energy__pb2.AnalyzeRequest.SerializeToString,
                 response_deserializer=energy__pb2.AnalyzeResponse.FromString,
                 _registered_method=True)
+        self.AnalyzeDataStream = channel.stream_unary(
+                '/energy.EnergyAnalyzer/AnalyzeDataStream',
+                request_serializer=energy__pb2.AnalyzeRequest.SerializeToString,
+                response_deserializer=energy__pb2.AnalyzeResponse.FromString,
+                _registered_method=True)
+        self.AnalyzeDataChunks = channel.stream_stream(
+                '/energy.EnergyAnalyzer/AnalyzeDataChunks',
+                request_serializer=energy__pb2.AnalyzeRequest.SerializeToString,
+                response_deserializer=energy__pb2.AnalyzeResponse.FromString,
+                _registered_method=True)
+        self.AnalyzeBatch = channel.unary_unary(
+                '/energy.EnergyAnalyzer/AnalyzeBatch',
+                request_serializer=energy__pb2.RawEnergyBatch.SerializeToString,
+                response_deserializer=energy__pb2.ProcessedEnergyBatch.FromString,
+                _registered_method=True)
+        self.AnalyzeFile = channel.unary_unary(
+                '/energy.EnergyAnalyzer/AnalyzeFile',
+                request_serializer=energy__pb2.AnalyzeFileRequest.SerializeToString,
+                response_deserializer=energy__pb2.FileResponse.FromString,
+                _registered_method=True)
+        self.AggregateData = channel.unary_unary(
+                '/energy.EnergyAnalyzer/AggregateData',
+                request_serializer=energy__pb2.AggregateRequest.SerializeToString,
+                response_deserializer=energy__pb2.AggregateResponse.FromString,
+                _registered_method=True)
 
 
 class EnergyAnalyzerServicer(object):
@@ -125,6 +281,40 @@ class EnergyAnalyzerServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def AnalyzeDataStream(self, request_iterator, context):
+        """Client streams AnalyzeRequest chunks, gets one merged report back.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AnalyzeDataChunks(self, request_iterator, context):
+        """One AnalyzeResponse per incoming chunk, sent as soon as it is analyzed.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AnalyzeBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AnalyzeFile(self, request, context):
+        """AnalyzeData from a file in the shared volume to another one.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AggregateData(self, request, context):
+        """Per-household rollups over time windows instead of every row
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_EnergyAnalyzerServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -133,6 +323,31 @@ def add_EnergyAnalyzerServicer_to_server(servicer, server):
                     request_deserializer=energy__pb2.AnalyzeRequest.FromString,
                     response_serializer=energy__pb2.AnalyzeResponse.SerializeToString,
             ),
+            'AnalyzeDataStream': grpc.stream_unary_rpc_method_handler(
+                    servicer.AnalyzeDataStream,
+                    request_deserializer=energy__pb2.AnalyzeRequest.FromString,
+                    response_serializer=energy__pb2.AnalyzeResponse.SerializeToString,
+            ),
+            'AnalyzeDataChunks': grpc.stream_stream_rpc_method_handler(
+                    servicer.AnalyzeDataChunks,
+                    request_deserializer=energy__pb2.AnalyzeRequest.FromString,
+                    response_serializer=energy__pb2.AnalyzeResponse.SerializeToString,
+            ),
+            'AnalyzeBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.AnalyzeBatch,
+                    request_deserializer=energy__pb2.RawEnergyBatch.FromString,
+                    response_serializer=energy__pb2.ProcessedEnergyBatch.SerializeToString,
+            ),
+            'AnalyzeFile': grpc.unary_unary_rpc_method_handler(
+                    servicer.AnalyzeFile,
+                    request_deserializer=energy__pb2.AnalyzeFileRequest.FromString,
+                    response_serializer=energy__pb2.FileResponse.SerializeToString,
+            ),
+            'AggregateData': grpc.unary_unary_rpc_method_handler(
+                    servicer.AggregateData,
+                    request_deserializer=energy__pb2.AggregateRequest.FromString,
+                    response_serializer=energy__pb2.AggregateResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'energy.EnergyAnalyzer', rpc_method_handlers)
@@ -171,6 +386,141 @@ class EnergyAnalyzer(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def AnalyzeDataStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/energy.EnergyAnalyzer/AnalyzeDataStream',
+            energy__pb2.AnalyzeRequest.SerializeToString,
+            energy__pb2.AnalyzeResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def AnalyzeDataChunks(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/energy.EnergyAnalyzer/AnalyzeDataChunks',
+            energy__pb2.AnalyzeRequest.SerializeToString,
+            energy__pb2.AnalyzeResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def AnalyzeBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/energy.EnergyAnalyzer/AnalyzeBatch',
+            energy__pb2.RawEnergyBatch.SerializeToString,
+            energy__pb2.ProcessedEnergyBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def AnalyzeFile(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/energy.EnergyAnalyzer/AnalyzeFile',
+            energy__pb2.AnalyzeFileRequest.SerializeToString,
+            energy__pb2.FileResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def AggregateData(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/energy.EnergyAnalyzer/AggregateData',
+            energy__pb2.AggregateRequest.SerializeToString,
+            energy__pb2.AggregateResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class ReportGeneratorStub(object):
     """Missing associated documentation comment in .proto file."""
@@ -186,6 +536,26 @@ class ReportGeneratorStub(object):
                 request_serializer=energy__pb2.ReportRequest.SerializeToString,
                 response_deserializer=energy__pb2.ReportResponse.FromString,
                 _registered_method=True)
+        self.GenerateBatchReport = channel.unary_unary(
+                '/energy.ReportGenerator/GenerateBatchReport',
+                request_serializer=energy__pb2.BatchReportRequest.SerializeToString,
+                response_deserializer=energy__pb2.ReportResponse.FromString,
+                _registered_method=True)
+        self.GenerateReportFromFile = channel.unary_unary(
+                '/energy.ReportGenerator/GenerateReportFromFile',
+                request_serializer=energy__pb2.ReportFileRequest.SerializeToString,
+                response_deserializer=energy__pb2.ReportResponse.FromString,
+                _registered_method=True)
+        self.GenerateReportStream = channel.stream_unary(
+                '/energy.ReportGenerator/GenerateReportStream',
+                request_serializer=energy__pb2.ReportRequest.SerializeToString,
+                response_deserializer=energy__pb2.ReportResponse.FromString,
+                _registered_method=True)
+        self.QueryReport = channel.unary_stream(
+                '/energy.ReportGenerator/QueryReport',
+                request_serializer=energy__pb2.QueryReportRequest.SerializeToString,
+                response_deserializer=energy__pb2.ProcessedDataReport.FromString,
+                _registered_method=True)
 
 
 class ReportGeneratorServicer(object):
@@ -197,6 +567,34 @@ class ReportGeneratorServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GenerateBatchReport(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GenerateReportFromFile(self, request, context):
+        """GenerateReport for a ProcessedDataReport file in the shared volume.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GenerateReportStream(self, request_iterator, context):
+        """Client streams the chunks of one report (format and store from the first
+        message); they are written as they arrive.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def QueryReport(self, request, context):
+        """Stored rows, read through the store's block index.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_ReportGeneratorServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -205,6 +603,26 @@ def add_ReportGeneratorServicer_to_server(servicer, server):
                     request_deserializer=energy__pb2.ReportRequest.FromString,
                     response_serializer=energy__pb2.ReportResponse.SerializeToString,
             ),
+            'GenerateBatchReport': grpc.unary_unary_rpc_method_handler(
+                    servicer.GenerateBatchReport,
+                    request_deserializer=energy__pb2.BatchReportRequest.FromString,
+                    response_serializer=energy__pb2.ReportResponse.SerializeToString,
+            ),
+            'GenerateReportFromFile': grpc.unary_unary_rpc_method_handler(
+                    servicer.GenerateReportFromFile,
+                    request_deserializer=energy__pb2.ReportFileRequest.FromString,
+                    response_serializer=energy__pb2.ReportResponse.SerializeToString,
+            ),
+            'GenerateReportStream': grpc.stream_unary_rpc_method_handler(
+                    servicer.GenerateReportStream,
+                    request_deserializer=energy__pb2.ReportRequest.FromString,
+                    response_serializer=energy__pb2.ReportResponse.SerializeToString,
+            ),
+            'QueryReport': grpc.unary_stream_rpc_method_handler(
+                    servicer.QueryReport,
+                    request_deserializer=energy__pb2.QueryReportRequest.FromString,
+                    response_serializer=energy__pb2.ProcessedDataReport.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'energy.ReportGenerator', rpc_method_handlers)
@@ -243,6 +661,192 @@ class ReportGenerator(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def GenerateBatchReport(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/energy.ReportGenerator/GenerateBatchReport',
+            energy__pb2.BatchReportRequest.SerializeToString,
+            energy__pb2.ReportResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GenerateReportFromFile(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/energy.ReportGenerator/GenerateReportFromFile',
+            energy__pb2.ReportFileRequest.SerializeToString,
+            energy__pb2.ReportResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GenerateReportStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/energy.ReportGenerator/GenerateReportStream',
+            energy__pb2.ReportRequest.SerializeToString,
+            energy__pb2.ReportResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def QueryReport(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/energy.ReportGenerator/QueryReport',
+            energy__pb2.QueryReportRequest.SerializeToString,
+            energy__pb2.ProcessedDataReport.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+
+class PipelineOrchestratorStub(object):
+    """Runs generate -> analyze -> report a chunk at a time with the stages
+    overlapping; progress is streamed, the last message carries the report.
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.RunPipeline = channel.unary_stream(
+                '/energy.PipelineOrchestrator/RunPipeline',
+                request_serializer=energy__pb2.PipelineRequest.SerializeToString,
+                response_deserializer=energy__pb2.PipelineProgress.FromString,
+                _registered_method=True)
+
+
+class PipelineOrchestratorServicer(object):
+    """Runs generate -> analyze -> report a chunk at a time with the stages
+    overlapping; progress is streamed, the last message carries the report.
+    """
+
+    def RunPipeline(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_PipelineOrchestratorServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'RunPipeline': grpc.unary_stream_rpc_method_handler(
+                    servicer.RunPipeline,
+                    request_deserializer=energy__pb2.PipelineRequest.FromString,
+                    response_serializer=energy__pb2.PipelineProgress.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'energy.PipelineOrchestrator', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('energy.PipelineOrchestrator', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class PipelineOrchestrator(object):
+    """Runs generate -> analyze -> report a chunk at a time with the stages
+    overlapping; progress is streamed, the last message carries the report.
+    """
+
+    @staticmethod
+    def RunPipeline(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/energy.PipelineOrchestrator/RunPipeline',
+            energy__pb2.PipelineRequest.SerializeToString,
+            energy__pb2.PipelineProgress.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class ContainerExecutorStub(object):
     """Missing associated documentation comment in .proto file."""
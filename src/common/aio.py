@@ -0,0 +1,58 @@
+"""Helpers for the grpc.aio server mode.
+
+The event loop only multiplexes RPCs; anything that parses, computes or
+touches files runs through offload() on a shared thread pool so one large
+batch never stalls the other calls.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent import futures
+
+OFFLOAD_WORKERS = int(os.getenv("AIO_OFFLOAD_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+
+_executor = None
+_lock = threading.Lock()
+
+
+def executor() -> futures.ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(OFFLOAD_WORKERS, thread_name_prefix="offload")
+        return _executor
+
+
+def configure(workers: int) -> None:
+    """Resize the offload pool; takes effect for a pool not yet started."""
+    global OFFLOAD_WORKERS
+    with _lock:
+        OFFLOAD_WORKERS = workers
+
+
+async def offload(fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the offload pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), functools.partial(fn, *args, **kwargs))
+
+
+def blocking_iter(aiterable, loop):
+    """A plain iterator over an async iterable that is driven on `loop`, for
+    code running on the offload pool (e.g. a request stream consumed by a
+    writer that expects an iterator). Each next() blocks until the next
+    item has arrived."""
+    ait = aiterable.__aiter__()
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(ait.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
@@ -0,0 +1,314 @@
+"""Client for the three services: pooled channels, deadlines, retries.
+
+PipelineClient keeps a few long-lived channels to each service, each on its
+own connection, and hands them out round robin. Connection setup (TCP,
+HTTP/2 handshake, name resolution) is paid once per channel rather than once
+per call or run. Targets are host:port or, for a service on the same host,
+"unix:<path>" of its GRPC_UNIX_SOCKET (*_SOCKET below). shared() returns one client per process for callers that
+do not manage their own.
+
+Every call gets a deadline. Transient failures are retried by gRPC itself,
+per the service config below: UNAVAILABLE (the server is restarting or
+draining, or the connection dropped before the call got through) is retried
+with exponential backoff, and retry throttling stops retry storms against a
+service that is really down. With wait_for_ready a call waits (within its
+deadline) for a service that is still starting instead of failing at once;
+wait_ready() blocks until every channel has connected, for startup ordering.
+
+run() sends one batch through generate -> analyze -> report; run_many()
+sends several at once, a bounded number in flight. With a workdir the
+stages hand the batch over by reference instead (GenerateFile, AnalyzeFile,
+GenerateReportFromFile): as files in the volume the services share, so the
+rows never pass through the client.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent import futures
+from dataclasses import dataclass, field
+from itertools import count
+
+import grpc
+
+import energy_pb2
+import energy_pb2_grpc
+from src.common.serving import ServerConfig, channel_options
+from generated import energy_pipeline_pb2 as exec_pb2
+from generated import energy_pipeline_pb2_grpc as exec_pb2_grpc
+
+GENERATOR_ADDR = os.getenv("GENERATOR_ADDR", "localhost:50051")
+ANALYZER_ADDR = os.getenv("ANALYZER_ADDR", "localhost:50052")
+REPORTER_ADDR = os.getenv("REPORTER_ADDR", "localhost:50053")
+# Unix sockets of co-located services (GRPC_UNIX_SOCKET on their side); dialed instead of TCP when set
+GENERATOR_SOCKET = os.getenv("GENERATOR_SOCKET", "")
+ANALYZER_SOCKET = os.getenv("ANALYZER_SOCKET", "")
+REPORTER_SOCKET = os.getenv("REPORTER_SOCKET", "")
+CHANNELS = int(os.getenv("CLIENT_CHANNELS", "2"))                # per service
+DEADLINE_S = float(os.getenv("CLIENT_DEADLINE_S", "60"))         # per call
+MAX_ATTEMPTS = int(os.getenv("CLIENT_MAX_ATTEMPTS", "4"))        # first try included
+CONCURRENCY = int(os.getenv("CLIENT_CONCURRENCY", "4"))          # run_many batches in flight
+WAIT_FOR_READY = os.getenv("CLIENT_WAIT_FOR_READY", "0") == "1"
+
+SERVICES = ("energy.EnergyGenerator", "energy.EnergyAnalyzer", "energy.ReportGenerator", "ContainerExecutor")
+
+
+def target(address: str, unix_socket: str = "") -> str:
+    """The channel target for a service: its Unix socket if it has one, else address."""
+    return f"unix:{unix_socket}" if unix_socket else address
+
+
+def service_config(max_attempts: int = MAX_ATTEMPTS) -> str:
+    """gRPC service config JSON: retry UNAVAILABLE on every method of our services."""
+    return json.dumps({
+        "methodConfig": [{
+            "name": [{"service": s} for s in SERVICES],
+            "retryPolicy": {
+                "maxAttempts": max_attempts,
+                "initialBackoff": "0.1s",
+                "maxBackoff": "2s",
+                "backoffMultiplier": 2,
+                "retryableStatusCodes": ["UNAVAILABLE"],
+            },
+        }],
+        # stop retrying once more than half the recent calls to a target failed
+        "retryThrottling": {"maxTokens": 10, "tokenRatio": 0.1},
+    })
+
+
+def client_options(config: ServerConfig = None, max_attempts: int = MAX_ATTEMPTS):
+    """Channel options: the servers' size and keepalive settings plus retries."""
+    config = config or ServerConfig()
+    send_limit = config.max_send_message_mb << 20 if config.max_send_message_mb >= 0 else 1 << 30
+    return channel_options(config) + [
+        ("grpc.enable_retries", 1),
+        ("grpc.service_config", service_config(max_attempts)),
+        # a request is only retried if it fits the retry buffer (default 256 KiB)
+        ("grpc.per_rpc_retry_buffer_size", send_limit),
+        # a connection per channel, so the pool spreads load over several
+        ("grpc.use_local_subchannel_pool", 1),
+    ]
+
+
+class ChannelPool:
+    """size long-lived channels to one target, handed out round robin."""
+
+    def __init__(self, target: str, size: int = CHANNELS, options=None):
+        self.target = target
+        self.channels = [grpc.insecure_channel(target, options=options) for _ in range(max(1, size))]
+        self._next = count()
+
+    def get(self) -> grpc.Channel:
+        return self.channels[next(self._next) % len(self.channels)]
+
+    def wait_ready(self, timeout: float = None) -> None:
+        """Block until every channel is connected; grpc.FutureTimeoutError after timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for ch in self.channels:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            grpc.channel_ready_future(ch).result(timeout=left)
+
+    def close(self) -> None:
+        for ch in self.channels:
+            ch.close()
+
+
+@dataclass
+class RunResult:
+    processed: int
+    skipped: int
+    response: energy_pb2.ReportResponse
+    seconds: dict = field(default_factory=dict)  # per stage
+
+
+class PipelineClient:
+    """Stubs for the three services over pooled channels, with deadlines and retries."""
+
+    def __init__(self, generator: str = target(GENERATOR_ADDR, GENERATOR_SOCKET),
+                 analyzer: str = target(ANALYZER_ADDR, ANALYZER_SOCKET),
+                 reporter: str = target(REPORTER_ADDR, REPORTER_SOCKET), channels: int = CHANNELS,
+                 deadline_s: float = DEADLINE_S, wait_for_ready: bool = WAIT_FOR_READY,
+                 concurrency: int = CONCURRENCY, config: ServerConfig = None,
+                 max_attempts: int = MAX_ATTEMPTS):
+        options = client_options(config, max_attempts)
+        self.pools = {
+            "generator": ChannelPool(generator, channels, options),
+            "analyzer": ChannelPool(analyzer, channels, options),
+            "reporter": ChannelPool(reporter, channels, options),
+        }
+        self.deadline_s = deadline_s
+        self.wait_for_ready = wait_for_ready
+        self.concurrency = concurrency
+        self._executor = None
+        self._lock = threading.Lock()
+
+    # ----- stubs -----
+    def generator(self) -> energy_pb2_grpc.EnergyGeneratorStub:
+        return energy_pb2_grpc.EnergyGeneratorStub(self.pools["generator"].get())
+
+    def analyzer(self) -> energy_pb2_grpc.EnergyAnalyzerStub:
+        return energy_pb2_grpc.EnergyAnalyzerStub(self.pools["analyzer"].get())
+
+    def reporter(self) -> energy_pb2_grpc.ReportGeneratorStub:
+        return energy_pb2_grpc.ReportGeneratorStub(self.pools["reporter"].get())
+
+    def executor(self, service: str) -> exec_pb2_grpc.ContainerExecutorStub:
+        """ContainerExecutor of "generator", "analyzer" or "reporter"."""
+        return exec_pb2_grpc.ContainerExecutorStub(self.pools[service].get())
+
+    def call_options(self, timeout: float = None):
+        """Keyword arguments for a stub call: deadline and wait_for_ready."""
+        return {"timeout": self.deadline_s if timeout is None else timeout,
+                "wait_for_ready": self.wait_for_ready}
+
+    # ----- calls -----
+    def generate(self, request: energy_pb2.GenerateRequest, timeout: float = None):
+        return self.generator().GenerateData(request, **self.call_options(timeout))
+
+    def generate_batch(self, request: energy_pb2.GenerateRequest, timeout: float = None):
+        return self.generator().GenerateBatch(request, **self.call_options(timeout))
+
+    def analyze(self, data, timeout: float = None) -> energy_pb2.ProcessedDataReport:
+        """AnalyzeData for RawEnergyData rows (or an AnalyzeRequest); returns the report."""
+        request = data if isinstance(data, energy_pb2.AnalyzeRequest) else energy_pb2.AnalyzeRequest(data=data)
+        return self.analyzer().AnalyzeData(request, **self.call_options(timeout)).report
+
+    def analyze_batch(self, batch: energy_pb2.RawEnergyBatch, timeout: float = None):
+        return self.analyzer().AnalyzeBatch(batch, **self.call_options(timeout))
+
+    def aggregate(self, data, window_ms: int = 0, timeout: float = None) -> energy_pb2.AggregateResponse:
+        """AggregateData for RawEnergyData rows or a RawEnergyBatch (window_ms 0: the server's default)."""
+        if isinstance(data, energy_pb2.RawEnergyBatch):
+            request = energy_pb2.AggregateRequest(batch=data, window_ms=window_ms)
+        else:
+            request = energy_pb2.AggregateRequest(data=data, window_ms=window_ms)
+        return self.analyzer().AggregateData(request, **self.call_options(timeout))
+
+    def report(self, report: energy_pb2.ProcessedDataReport, fmt: int = energy_pb2.REPORT_FORMAT_CSV,
+               store: bool = False, timeout: float = None) -> energy_pb2.ReportResponse:
+        request = energy_pb2.ReportRequest(report=report, format=fmt, store=store)
+        return self.reporter().GenerateReport(request, **self.call_options(timeout))
+
+    def report_batch(self, batch: energy_pb2.ProcessedEnergyBatch, fmt: int = energy_pb2.REPORT_FORMAT_CSV,
+                     store: bool = False, timeout: float = None) -> energy_pb2.ReportResponse:
+        request = energy_pb2.BatchReportRequest(batch=batch, format=fmt, store=store)
+        return self.reporter().GenerateBatchReport(request, **self.call_options(timeout))
+
+    def query(self, household_id: str = "", start_ms: int = 0, end_ms: int = 0, timeout: float = None):
+        """QueryReport: the report store's rows in [start_ms, end_ms) (0: unbounded),
+        as a stream of ProcessedDataReport."""
+        request = energy_pb2.QueryReportRequest(household_id=household_id, start_ms=start_ms, end_ms=end_ms)
+        return self.reporter().QueryReport(request, **self.call_options(timeout))
+
+    def generate_file(self, request: energy_pb2.GenerateRequest, output_file: str,
+                      timeout: float = None) -> energy_pb2.FileResponse:
+        request = energy_pb2.GenerateFileRequest(request=request, output_file=output_file)
+        return self.generator().GenerateFile(request, **self.call_options(timeout))
+
+    def analyze_file(self, ref: energy_pb2.FileRef, output_file: str, remove_input: bool = False,
+                     timeout: float = None) -> energy_pb2.FileResponse:
+        request = energy_pb2.AnalyzeFileRequest(input=ref, output_file=output_file, remove_input=remove_input)
+        return self.analyzer().AnalyzeFile(request, **self.call_options(timeout))
+
+    def report_file(self, ref: energy_pb2.FileRef, fmt: int = energy_pb2.REPORT_FORMAT_CSV,
+                    store: bool = False, remove_input: bool = False,
+                    timeout: float = None) -> energy_pb2.ReportResponse:
+        request = energy_pb2.ReportFileRequest(input=ref, format=fmt, store=store, remove_input=remove_input)
+        return self.reporter().GenerateReportFromFile(request, **self.call_options(timeout))
+
+    def execute(self, service: str, input_file: str, output_file: str, timeout: float = None):
+        request = exec_pb2.ExecuteRequest(input_file=input_file, output_file=output_file)
+        return self.executor(service).Execute(request, **self.call_options(timeout))
+
+    # ----- pipeline -----
+    def run(self, request: energy_pb2.GenerateRequest, fmt: int = energy_pb2.REPORT_FORMAT_CSV,
+            store: bool = False, columnar: bool = False, workdir: str = "") -> RunResult:
+        """One batch through generate -> analyze -> report (row or columnar RPCs).
+
+        With workdir (a directory in the services' shared volume, relative to
+        their FILEREF_ROOT or absolute) the batch is handed from stage to
+        stage as files there, which each next stage deletes once read.
+        """
+        t0 = time.perf_counter()
+        if workdir:
+            name = f"{workdir.rstrip('/')}/{uuid.uuid4().hex}"
+            raw = self.generate_file(request, f"{name}.raw.pb")
+            t1 = time.perf_counter()
+            analyzed = self.analyze_file(raw.file, f"{name}.processed.pb", remove_input=True)
+            t2 = time.perf_counter()
+            response = self.report_file(analyzed.file, fmt, store, remove_input=True)
+            processed, skipped = analyzed.rows, analyzed.skipped_rows
+        elif columnar:
+            raw = self.generate_batch(request)
+            t1 = time.perf_counter()
+            batch = self.analyze_batch(raw)
+            t2 = time.perf_counter()
+            response = self.report_batch(batch, fmt, store)
+            processed, skipped = len(batch.power), batch.skipped_rows
+        else:
+            data = self.generate(request).data
+            t1 = time.perf_counter()
+            report = self.analyze(data)
+            t2 = time.perf_counter()
+            response = self.report(report, fmt, store)
+            processed, skipped = len(report.processed), report.skipped_rows
+        t3 = time.perf_counter()
+        return RunResult(processed, skipped, response,
+                         {"generate": t1 - t0, "analyze": t2 - t1, "report": t3 - t2})
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = futures.ThreadPoolExecutor(self.concurrency, thread_name_prefix="pipeline-client")
+            return self._executor
+
+    def run_many(self, requests, fmt: int = energy_pb2.REPORT_FORMAT_CSV, store: bool = False,
+                 columnar: bool = False, workdir: str = ""):
+        """run() for each request, up to `concurrency` at once; yields results in order.
+
+        Without store every batch rewrites the same energy_report file, so
+        concurrent batches normally go to the report store.
+        """
+        pool = self._pool()
+        pending = []
+        for request in requests:
+            pending.append(pool.submit(self.run, request, fmt, store, columnar, workdir))
+            if len(pending) >= 2 * self.concurrency:
+                yield pending.pop(0).result()
+        for f in pending:
+            yield f.result()
+
+    # ----- lifecycle -----
+    def wait_ready(self, timeout: float = None) -> None:
+        """Block until every service is reachable (grpc.FutureTimeoutError after timeout)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for pool in self.pools.values():
+            pool.wait_ready(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        for pool in self.pools.values():
+            pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared() -> PipelineClient:
+    """The process-wide client (env defaults), created on first use and kept open."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PipelineClient()
+        return _shared
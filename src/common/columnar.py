@@ -0,0 +1,195 @@
+"""Converters between the row messages and the columnar batch messages.
+
+RawEnergyBatch / ProcessedEnergyBatch keep one packed column per field, with
+household IDs (and statuses) dictionary encoded and timestamps as int64 epoch
+milliseconds. The helpers here go both ways and hand columns out as NumPy
+arrays so services can work on them without touching individual rows.
+"""
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+
+import energy_pb2
+
+TIMESTAMP_UNSET = np.iinfo(np.int64).min  # missing/unparseable timestamp (== NaT)
+
+
+# ----- columns -----
+def column(values, dtype):
+    """A repeated scalar field as a NumPy array."""
+    return np.fromiter(values, dtype, len(values))
+
+
+def dictionary_encode(values):
+    """(table, indices): distinct values in first-seen order and a uint32 index per value."""
+    table = {}
+    indices = np.fromiter((table.setdefault(v, len(table)) for v in values), np.uint32, len(values))
+    return list(table), indices
+
+
+def dictionary_decode(table, indices):
+    return np.asarray(list(table), dtype=object)[indices].tolist() if len(table) else [""] * len(indices)
+
+
+_CAST_BLOCK = 1024  # granularity used to isolate values the vector cast rejects
+
+
+def _cast(values, vector, scalar, fill):
+    """vector() the whole list; when it raises, retry per block and only go
+    value by value (scalar) inside blocks that still fail."""
+    try:
+        return vector(values)
+    except (ValueError, Warning):
+        pass
+    out = np.full(len(values), fill)
+    for s in range(0, len(values), _CAST_BLOCK):
+        block = values[s:s + _CAST_BLOCK]
+        try:
+            out[s:s + _CAST_BLOCK] = vector(block)
+        except (ValueError, Warning):
+            out[s:s + _CAST_BLOCK] = [scalar(v) for v in block]
+    return out
+
+
+# ----- timestamps -----
+def _parse_timestamp(value):
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return TIMESTAMP_UNSET
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def _parse_timestamps(values):
+    with warnings.catch_warnings():
+        # NumPy only warns about UTC offsets; those take the scalar path.
+        warnings.simplefilter("error")
+        return np.array(values, dtype=str).astype("datetime64[ms]").astype(np.int64)
+
+
+def parse_timestamps(values):
+    """ISO-8601 strings -> int64 epoch ms (UTC); unparseable or empty -> TIMESTAMP_UNSET."""
+    naive = [v[:-1] if v.endswith("Z") else v for v in values]
+    return _cast(naive, _parse_timestamps, _parse_timestamp, TIMESTAMP_UNSET)
+
+
+def format_timestamps(ms):
+    """int64 epoch ms -> ISO-8601 UTC strings (whole seconds drop the fraction)."""
+    ms = np.asarray(ms, np.int64)
+    dt = ms.astype("datetime64[ms]")
+    out = np.datetime_as_string(dt, unit="s", timezone="UTC")
+    fractional = (ms % 1000 != 0) & (ms != TIMESTAMP_UNSET)
+    if fractional.any():
+        out[fractional] = np.datetime_as_string(dt[fractional], unit="ms", timezone="UTC")
+    out[ms == TIMESTAMP_UNSET] = ""
+    return out.tolist()
+
+
+# ----- numbers -----
+def _parse_floats(values):
+    if "\x00" in "".join(values):  # NumPy would strip trailing NULs
+        raise ValueError("NUL in float string")
+    return np.array(values, dtype=str).astype(np.float64)
+
+
+def _parse_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_floats(values):
+    """float() over a list of strings -> (float64 array, ok mask)."""
+    parsed = _cast(values, _parse_floats, _parse_float, None)
+    if parsed.dtype != object:
+        return parsed, np.ones(len(values), bool)
+    ok = np.not_equal(parsed, None)
+    out = np.full(len(values), np.nan)
+    out[ok] = parsed[ok].astype(np.float64)
+    return out, ok
+
+
+def _format_floats(values):
+    # shortest round-trip strings; integral readings keep the "120" form
+    return [str(int(v)) if v.is_integer() else repr(v) for v in values.tolist()]
+
+
+# ----- raw rows <-> RawEnergyBatch -----
+def rows_to_batch(rows):
+    """RawEnergyData rows -> RawEnergyBatch. Rows whose power does not parse are counted, not kept."""
+    rows = list(rows)
+    power, ok = parse_floats([r.power_consumption for r in rows])
+    keep = np.nonzero(ok)[0]
+    rows = [rows[i] for i in keep] if len(keep) != len(rows) else rows
+
+    table, household = dictionary_encode([r.household_id for r in rows])
+    voltage, _ = parse_floats([r.voltage for r in rows])
+    current, _ = parse_floats([r.current for r in rows])
+
+    batch = energy_pb2.RawEnergyBatch(skipped_rows=int(len(ok) - len(keep)))
+    batch.household_ids.extend(table)
+    batch.household.extend(household.tolist())
+    batch.timestamp_ms.extend(parse_timestamps([r.timestamp for r in rows]).tolist())
+    batch.power_consumption.extend(power[keep].tolist())
+    batch.voltage.extend(voltage.tolist())
+    batch.current.extend(current.tolist())
+    return batch
+
+
+def batch_to_rows(batch):
+    """RawEnergyBatch -> list of RawEnergyData."""
+    timestamps = format_timestamps(column(batch.timestamp_ms, np.int64))
+    households = dictionary_decode(batch.household_ids, column(batch.household, np.uint32))
+    power = _format_floats(column(batch.power_consumption, np.float64))
+    voltage = _format_floats(column(batch.voltage, np.float64))
+    current = _format_floats(column(batch.current, np.float64))
+    return [
+        energy_pb2.RawEnergyData(
+            timestamp=t, household_id=h, power_consumption=p, voltage=v, current=c,
+        )
+        for t, h, p, v, c in zip(timestamps, households, power, voltage, current)
+    ]
+
+
+# ----- processed rows <-> ProcessedEnergyBatch -----
+def report_to_batch(report):
+    """ProcessedDataReport -> ProcessedEnergyBatch."""
+    rows = report.processed
+    batch = energy_pb2.ProcessedEnergyBatch(skipped_rows=report.skipped_rows)
+    table, household = dictionary_encode([r.household_id for r in rows])
+    statuses, status = dictionary_encode([r.status for r in rows])
+    batch.household_ids.extend(table)
+    batch.household.extend(household.tolist())
+    batch.timestamp_ms.extend(parse_timestamps([r.timestamp for r in rows]).tolist())
+    batch.power.extend([r.power for r in rows])
+    batch.efficiency.extend([r.efficiency for r in rows])
+    batch.statuses.extend(statuses)
+    batch.status.extend(status.tolist())
+    batch.anomaly_detected.extend([r.anomaly_detected for r in rows])
+    return batch
+
+
+def processed_columns(batch):
+    """Decoded columns of a ProcessedEnergyBatch, in ProcessedEnergyReport field order."""
+    return (
+        format_timestamps(column(batch.timestamp_ms, np.int64)),
+        dictionary_decode(batch.household_ids, column(batch.household, np.uint32)),
+        column(batch.power, np.float32).tolist(),
+        column(batch.efficiency, np.float32).tolist(),
+        dictionary_decode(batch.statuses, column(batch.status, np.uint32)),
+        column(batch.anomaly_detected, bool).tolist(),
+    )
+
+
+def batch_to_report(batch):
+    """ProcessedEnergyBatch -> ProcessedDataReport."""
+    report = energy_pb2.ProcessedDataReport(skipped_rows=batch.skipped_rows)
+    for t, h, p, e, s, a in zip(*processed_columns(batch)):
+        report.processed.add(
+            timestamp=t, household_id=h, power=p, efficiency=e, status=s, anomaly_detected=a,
+        )
+    return report
@@ -0,0 +1,98 @@
+"""By-reference payloads: FileRef messages naming files in the shared volume.
+
+Every container mounts the same data volume (/app/data), so a large batch
+does not have to travel inline in an RPC: the caller names a file there
+(optionally a byte range of it, and its SHA-256), the service reads it in
+place through recordio and answers with a FileRef to the file it wrote.
+Only the references go over the wire, and nothing is serialized except the
+files themselves.
+
+Paths are resolved against FILEREF_ROOT. Relative paths are taken from
+there, and absolute ones must lie under it, so a request cannot make a
+service read or write files outside the data volume.
+"""
+import hashlib
+import mmap
+import os
+from pathlib import Path
+
+import grpc
+
+import energy_pb2
+from src.common.recordio import CHUNK_ROWS, open_records
+
+ROOT = Path(os.getenv("FILEREF_ROOT", "/app/data"))
+
+
+class FileRefError(ValueError):
+    """A FileRef that cannot be used: outside FILEREF_ROOT, a bad range or checksum."""
+
+
+# what a by-reference RPC answers with a status rather than INTERNAL / UNKNOWN
+ERRORS = (FileRefError, FileNotFoundError, EOFError)
+
+
+def set_error(context, e, response):
+    """NOT_FOUND for a missing file, INVALID_ARGUMENT for the other ERRORS."""
+    context.set_details(str(e))
+    context.set_code(grpc.StatusCode.NOT_FOUND if isinstance(e, FileNotFoundError)
+                     else grpc.StatusCode.INVALID_ARGUMENT)
+    return response
+
+
+def resolve(path: str) -> Path:
+    """path as a file under ROOT; FileRefError if it is empty or lies outside."""
+    if not path:
+        raise FileRefError("no file path given")
+    root = ROOT.resolve()
+    resolved = (root / path).resolve()
+    if resolved != root and root not in resolved.parents:
+        raise FileRefError(f"{path} is outside {root}")
+    return resolved
+
+
+def output_path(path: str) -> Path:
+    """resolve() for a file to be written; its directory is created."""
+    out = resolve(path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    return out
+
+
+def _checked_range(ref, path: Path):
+    size = path.stat().st_size  # FileNotFoundError for a missing file
+    end = ref.offset + ref.length if ref.length else size
+    if ref.offset > size or end > size:
+        raise FileRefError(f"range {ref.offset}+{ref.length} is past the end of {ref.path} ({size} bytes)")
+    return end
+
+
+def _sha256(path: Path, start: int, end: int) -> str:
+    h = hashlib.sha256()
+    if end > start:
+        with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                h.update(view[start:end])  # hashlib releases the GIL on large buffers
+            finally:
+                view.release()
+    return h.hexdigest()
+
+
+def records(ref: energy_pb2.FileRef, chunk_rows: int = CHUNK_ROWS):
+    """The serialized chunk records of the file or range ref names, after
+    checking its sha256 when one is given."""
+    path = resolve(ref.path)
+    end = _checked_range(ref, path)
+    if ref.sha256 and _sha256(path, ref.offset, end) != ref.sha256.lower():
+        raise FileRefError(f"sha256 mismatch for {ref.path} range {ref.offset}+{end - ref.offset}")
+    return open_records(path, chunk_rows, ref.offset, end - ref.offset)
+
+
+def remove(ref: energy_pb2.FileRef) -> None:
+    """Delete the file ref names (its whole file, whatever the range)."""
+    resolve(ref.path).unlink(missing_ok=True)
+
+
+def written(writer) -> energy_pb2.FileRef:
+    """FileRef for the file a closed RecordWriter wrote."""
+    return energy_pb2.FileRef(path=str(writer.path), length=writer.size, sha256=writer.sha256)
@@ -0,0 +1,352 @@
+"""Per-RPC metrics for the gRPC services, exposed in Prometheus text format.
+
+MetricsInterceptor / AsyncMetricsInterceptor wrap every handler kind
+(unary and streaming) and record, per method:
+
+    grpc_server_started_total          calls started
+    grpc_server_handled_total          calls finished, by status code
+    grpc_server_in_flight              calls currently running
+    grpc_server_handling_seconds       latency histogram (monotonic clock)
+    grpc_server_msg_received_total     messages read / sent (streams count each one)
+    grpc_server_msg_sent_total
+    grpc_server_request_bytes          serialized message size histograms
+    grpc_server_response_bytes
+
+Message sizes are taken from the (de)serializer wrappers, so nothing is
+re-serialized to measure them. Per-call log lines are sampled
+(log_sample_rate); calls that fail are always logged.
+
+The registry is dependency free; MetricsExporter serves it over HTTP at
+/metrics on a daemon thread.
+"""
+import asyncio
+import bisect
+import inspect
+import logging
+import random
+import threading
+import time
+
+import grpc
+
+log = logging.getLogger("grpc")
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(float(1 << k) for k in range(6, 31, 2))  # 64 B .. 1 GiB
+
+
+# ----- registry -----
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    def count(self, *labels):
+        state = self._values.get(labels)
+        return sum(state[0]) if state else 0
+
+    def render(self):
+        with self._lock:
+            items = [(k, list(counts), total) for k, (counts, total) in self._values.items()]
+        lines = self._header()
+        names = self.labelnames + ("le",)
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(names, key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for m in self._metrics for line in m.render()) + "\n"
+
+
+class RpcMetrics:
+    """The grpc_server_* metric family in one registry."""
+
+    def __init__(self, registry=None):
+        self.registry = registry or Registry()
+        r = self.registry.register
+        self.started = r(Counter("grpc_server_started_total", "RPCs started.", ("method",)))
+        self.handled = r(Counter("grpc_server_handled_total", "RPCs completed, by status code.", ("method", "code")))
+        self.in_flight = r(Gauge("grpc_server_in_flight", "RPCs currently being handled.", ("method",)))
+        self.latency = r(Histogram("grpc_server_handling_seconds", "RPC handling time.", ("method",)))
+        self.received = r(Counter("grpc_server_msg_received_total", "Request messages received.", ("method",)))
+        self.sent = r(Counter("grpc_server_msg_sent_total", "Response messages sent.", ("method",)))
+        self.request_bytes = r(Histogram(
+            "grpc_server_request_bytes", "Serialized request message size.", ("method",), SIZE_BUCKETS))
+        self.response_bytes = r(Histogram(
+            "grpc_server_response_bytes", "Serialized response message size.", ("method",), SIZE_BUCKETS))
+
+
+DEFAULT = RpcMetrics()
+
+
+# ----- interceptors -----
+def _status(context, fallback):
+    """The code the handler set on the context, else fallback (OK, or how it ended)."""
+    try:
+        code = context.code()
+    except Exception:
+        code = None
+    return code if isinstance(code, grpc.StatusCode) else fallback
+
+
+class _Calls:
+    """Bookkeeping shared by the threaded and asyncio interceptors."""
+
+    def __init__(self, metrics, log_sample_rate):
+        self.metrics = metrics
+        self.log_sample_rate = log_sample_rate
+
+    def wrap_serializers(self, method, handler):
+        m = self.metrics
+        deserialize, serialize = handler.request_deserializer, handler.response_serializer
+
+        def request_deserializer(data):
+            m.received.inc(method)
+            m.request_bytes.observe(len(data), method)
+            return deserialize(data) if deserialize else data
+
+        def response_serializer(msg):
+            data = serialize(msg) if serialize else msg
+            m.sent.inc(method)
+            m.response_bytes.observe(len(data), method)
+            return data
+
+        return request_deserializer, response_serializer
+
+    def begin(self, method):
+        self.metrics.started.inc(method)
+        self.metrics.in_flight.inc(method)
+        return time.perf_counter()
+
+    def end(self, method, start, context, fallback):
+        elapsed = time.perf_counter() - start
+        code = _status(context, fallback)
+        m = self.metrics
+        m.in_flight.dec(method)
+        m.handled.inc(method, code.name)
+        m.latency.observe(elapsed, method)
+        if code != grpc.StatusCode.OK:
+            log.warning("rpc method=%s code=%s dur_ms=%.1f", method, code.name, elapsed * 1000)
+        elif self.log_sample_rate and random.random() < self.log_sample_rate:
+            log.info("rpc method=%s code=%s dur_ms=%.1f", method, code.name, elapsed * 1000)
+
+
+_FACTORIES = {
+    "unary_unary": grpc.unary_unary_rpc_method_handler,
+    "unary_stream": grpc.unary_stream_rpc_method_handler,
+    "stream_unary": grpc.stream_unary_rpc_method_handler,
+    "stream_stream": grpc.stream_stream_rpc_method_handler,
+}
+
+
+def _kind(handler):
+    for kind in _FACTORIES:
+        if getattr(handler, kind):
+            return kind
+    return None
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    def __init__(self, metrics: RpcMetrics = DEFAULT, log_sample_rate: float = 0.0):
+        self._calls = _Calls(metrics, log_sample_rate)
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        kind = handler and _kind(handler)
+        if not kind:
+            return handler
+        method = handler_call_details.method
+        calls = self._calls
+        behavior = getattr(handler, kind)
+
+        if kind.endswith("_stream"):
+            def inner(request, context):
+                start = calls.begin(method)
+                ended = grpc.StatusCode.UNKNOWN
+                try:
+                    yield from behavior(request, context)
+                    ended = grpc.StatusCode.OK
+                except GeneratorExit:
+                    ended = grpc.StatusCode.CANCELLED
+                    raise
+                finally:
+                    calls.end(method, start, context, ended)
+        else:
+            def inner(request, context):
+                start = calls.begin(method)
+                ended = grpc.StatusCode.UNKNOWN
+                try:
+                    response = behavior(request, context)
+                    ended = grpc.StatusCode.OK
+                    return response
+                finally:
+                    calls.end(method, start, context, ended)
+
+        request_deserializer, response_serializer = calls.wrap_serializers(method, handler)
+        return _FACTORIES[kind](
+            inner,
+            request_deserializer=request_deserializer,
+            response_serializer=response_serializer,
+        )
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    def __init__(self, metrics: RpcMetrics = DEFAULT, log_sample_rate: float = 0.0):
+        self._calls = _Calls(metrics, log_sample_rate)
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        kind = handler and _kind(handler)
+        if not kind:
+            return handler
+        method = handler_call_details.method
+        calls = self._calls
+        behavior = getattr(handler, kind)
+
+        if inspect.isasyncgenfunction(behavior):
+            async def inner(request, context):
+                start = calls.begin(method)
+                ended = grpc.StatusCode.UNKNOWN
+                try:
+                    async for response in behavior(request, context):
+                        yield response
+                    ended = grpc.StatusCode.OK
+                except (GeneratorExit, asyncio.CancelledError):
+                    ended = grpc.StatusCode.CANCELLED
+                    raise
+                finally:
+                    calls.end(method, start, context, ended)
+        else:
+            # coroutines, including streaming handlers that use context.write()
+            async def inner(request, context):
+                start = calls.begin(method)
+                ended = grpc.StatusCode.UNKNOWN
+                try:
+                    response = behavior(request, context)
+                    if inspect.isawaitable(response):
+                        response = await response
+                    ended = grpc.StatusCode.OK
+                    return response
+                except asyncio.CancelledError:
+                    ended = grpc.StatusCode.CANCELLED
+                    raise
+                finally:
+                    calls.end(method, start, context, ended)
+
+        request_deserializer, response_serializer = calls.wrap_serializers(method, handler)
+        return _FACTORIES[kind](
+            inner,
+            request_deserializer=request_deserializer,
+            response_serializer=response_serializer,
+        )
+
+
+# ----- scrape endpoint -----
+class MetricsExporter:
+    """Serves registry.render() at /metrics from a daemon thread."""
+
+    def __init__(self, port: int, registry: Registry = None):
+        # imported here: a server with metrics_port=0 never needs http.server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = registry or DEFAULT.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("", port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        log.info("metrics on :%d/metrics", self.port)
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,320 @@
+"""Chunked, length-delimited record files for the ContainerExecutor hand-off.
+
+Layout: an 8-byte MAGIC header, then any number of records, each a varint
+byte length followed by that many bytes. Every record is one serialized chunk
+message (a GenerateResponse or ProcessedDataReport holding a slice of the
+rows), so files are written and read a chunk at a time in constant memory.
+Repeated fields concatenate and skipped_rows adds up across chunks.
+
+Files written before this format (one serialized message, no header) are
+detected by the missing MAGIC and are still read incrementally: their
+top-level fields are regrouped into chunks of `chunk_rows` rows, which are
+valid messages of the same type.
+
+open_records() is the entry point for readers: regular files (the shared
+/app/data volume) are memory-mapped, anything else is read with buffered I/O.
+Readers can be limited to a byte range of the file (by-reference requests,
+src/common/fileref.py); the range is read as if it were the whole file.
+"""
+import hashlib
+import mmap
+import os
+from pathlib import Path
+
+MAGIC = b"AEREC01\n"  # 'A' (0x41) is never a valid first tag of our messages
+CHUNK_ROWS = int(os.getenv("RECORD_CHUNK_ROWS", "10000"))
+USE_MMAP = os.getenv("RECORD_MMAP", "1") != "0"
+
+_READ_SIZE = 1 << 20
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _decode_varint(buf, pos):
+    """(value, next offset) of the varint at buf[pos], or (None, None) if buf ends first."""
+    value = shift = 0
+    while pos < len(buf):
+        b = buf[pos]
+        value |= (b & 0x7F) << shift
+        pos += 1
+        if b < 0x80:
+            return value, pos
+        shift += 7
+    return None, None
+
+
+def _read_length(f):
+    """Record length prefix from f, or None at a clean end of file."""
+    value = shift = 0
+    while True:
+        b = f.read(1)
+        if not b:
+            if shift:
+                raise EOFError("truncated record length")
+            return None
+        value |= (b[0] & 0x7F) << shift
+        if b[0] < 0x80:
+            return value
+        shift += 7
+
+
+def chunked(iterable, size: int = CHUNK_ROWS):
+    """Yield lists of up to `size` items."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class RecordWriter:
+    """Writes records to `path` via a temp file that is renamed into place on close,
+    so readers on the shared volume never see a half-written file. With
+    checksum the SHA-256 of the file is computed as it is written (.sha256)."""
+
+    def __init__(self, path, checksum: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.{id(self)}.tmp")
+        self._f = self._tmp.open("wb")
+        self._hash = hashlib.sha256() if checksum else None
+        self.records = 0
+        self.size = 0
+        self._put(MAGIC)
+
+    def _put(self, data) -> None:
+        self._f.write(data)
+        self.size += len(data)
+        if self._hash is not None:
+            self._hash.update(data)
+
+    def write(self, record) -> None:
+        """Append one record: a message (serialized here) or already-serialized bytes."""
+        if not isinstance(record, (bytes, bytearray, memoryview)):
+            record = record.SerializeToString()
+        self._put(_varint(len(record)))
+        self._put(record)
+        self.records += 1
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest() if self._hash is not None else ""
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class _Range:
+    """The read() of a file object, stopping after `left` bytes; EOFError if
+    the file ends first."""
+
+    def __init__(self, f, left: int):
+        self._f = f
+        self._left = left
+
+    def read(self, n: int = -1) -> bytes:
+        if n < 0 or n > self._left:
+            n = self._left
+        data = self._f.read(n)
+        if len(data) < n:
+            raise EOFError(f"range ends past the end of {self._f.name}")
+        self._left -= len(data)
+        return data
+
+
+class RecordReader:
+    """Iterates the serialized chunk records of a record file or a legacy .pb file,
+    or of the byte range offset .. offset + length of one (length 0 = to the end)."""
+
+    def __init__(self, path, chunk_rows: int = CHUNK_ROWS, offset: int = 0, length: int = 0):
+        self.path = Path(path)
+        self.chunk_rows = chunk_rows
+        self.offset = offset
+        self.length = length
+        with self.path.open("rb") as f:
+            self.legacy = self._open_range(f).read(len(MAGIC)) != MAGIC
+
+    def _open_range(self, f):
+        if self.offset:
+            f.seek(self.offset)
+        return _Range(f, self.length) if self.length else f
+
+    def __iter__(self):
+        with self.path.open("rb") as f:
+            f = self._open_range(f)
+            if self.legacy:
+                yield from self._legacy_chunks(f)
+            else:
+                f.read(len(MAGIC))
+                yield from self._records(f)
+
+    def _records(self, f):
+        while True:
+            size = _read_length(f)
+            if size is None:
+                return
+            record = f.read(size)
+            if len(record) != size:
+                raise EOFError(f"truncated record in {self.path}")
+            yield record
+
+    def _legacy_chunks(self, f):
+        # Walk the top-level fields of the single message in buffered reads and
+        # cut the byte stream after every `chunk_rows` occurrences of field 1.
+        buf = bytearray()
+        pos = start = rows = 0
+        eof = False
+        while True:
+            if len(buf) - pos < 16 and not eof:
+                block = f.read(_READ_SIZE)
+                eof = not block
+                del buf[:start]
+                pos -= start
+                start = 0
+                buf += block
+                continue
+            if pos >= len(buf):
+                break
+            end = self._skip_field(buf, pos)
+            if end is None or end > len(buf):
+                if eof:
+                    raise EOFError(f"truncated legacy message in {self.path}")
+                block = f.read(max(_READ_SIZE, (end or 0) - len(buf)))
+                eof = not block
+                buf += block
+                continue
+            if buf[pos] == 0x0A:
+                rows += 1
+            pos = end
+            if rows >= self.chunk_rows:
+                yield bytes(buf[start:pos])
+                start, rows = pos, 0
+        if pos > start:
+            yield bytes(buf[start:pos])
+
+    @staticmethod
+    def _skip_field(buf, pos):
+        """End offset of the top-level field starting at pos, or None if buf is too short to tell."""
+        tag, p = _decode_varint(buf, pos)
+        if tag is None:
+            return None
+        wire = tag & 7
+        if wire == 0:
+            return _decode_varint(buf, p)[1]
+        if wire == 1:
+            return p + 8
+        if wire == 2:
+            length, p = _decode_varint(buf, p)
+            return None if length is None else p + length
+        if wire == 5:
+            return p + 4
+        raise ValueError(f"unsupported wire type {wire} in legacy message")
+
+
+class MappedRecordReader(RecordReader):
+    """RecordReader over an mmap of the file.
+
+    Records come out as memoryview slices of the mapping, so nothing is copied
+    into Python bytes first and pages are faulted in as the consumer reaches
+    them; protobuf and NumPy both parse straight from the views. A slice keeps
+    the mapping alive for as long as it is referenced.
+    """
+
+    def __iter__(self):
+        with self.path.open("rb") as f:
+            if not os.fstat(f.fileno()).st_size:
+                return
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        end = self.offset + self.length if self.length else len(mm)
+        if end > len(mm):
+            raise EOFError(f"range {self.offset}+{self.length} ends past the end of {self.path}")
+        if hasattr(mm, "madvise"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        self._released = self.offset - self.offset % mmap.PAGESIZE
+        view = memoryview(mm)
+        if self.legacy:
+            yield from self._legacy_views(mm, view, self.offset, end)
+        else:
+            yield from self._record_views(mm, view, self.offset + len(MAGIC), end)
+
+    def _release(self, mm, upto):
+        # Drop the pages behind the reader from our resident set. The mapping is
+        # read-only and file-backed, so a view that is still held simply faults
+        # its pages back in from the page cache.
+        upto -= upto % mmap.PAGESIZE
+        if upto > self._released and hasattr(mmap, "MADV_DONTNEED"):
+            mm.madvise(mmap.MADV_DONTNEED, self._released, upto - self._released)
+            self._released = upto
+
+    def _record_views(self, mm, view, pos, end):
+        while pos < end:
+            size, pos = _decode_varint(mm, pos)
+            if size is None or pos + size > end:
+                raise EOFError(f"truncated record in {self.path}")
+            yield view[pos:pos + size]
+            pos += size
+            self._release(mm, pos)
+
+    def _legacy_views(self, mm, view, pos, n):
+        start = pos
+        rows = 0
+        while pos < n:
+            if mm[pos] == 0x0A and pos + 1 < n and mm[pos + 1] < 0x80:
+                end = pos + 2 + mm[pos + 1]  # a row shorter than 128 bytes
+                rows += 1
+            else:
+                end = self._skip_field(mm, pos)
+                if end is not None and mm[pos] == 0x0A:
+                    rows += 1
+            if end is None or end > n:
+                raise EOFError(f"truncated legacy message in {self.path}")
+            pos = end
+            if rows >= self.chunk_rows:
+                yield view[start:pos]
+                start, rows = pos, 0
+                self._release(mm, start)
+        if pos > start:
+            yield view[start:pos]
+
+
+def open_records(path, chunk_rows: int = CHUNK_ROWS, offset: int = 0, length: int = 0):
+    """The reader to use for path: mmap-backed for regular files unless RECORD_MMAP=0."""
+    if USE_MMAP and Path(path).is_file():
+        return MappedRecordReader(path, chunk_rows, offset, length)
+    return RecordReader(path, chunk_rows, offset, length)
+
+
+def read_messages(path, message_cls, chunk_rows: int = CHUNK_ROWS):
+    """Yield each chunk of a record (or legacy) file parsed as message_cls."""
+    for record in open_records(path, chunk_rows):
+        yield message_cls.FromString(record)
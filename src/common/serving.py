@@ -0,0 +1,356 @@
+"""Shared gRPC server bootstrap for the three services.
+
+Every service builds its server through here, so worker counts, message size
+limits, compression, keepalive and concurrency limits are set in one place.
+Settings come from ServerConfig defaults, then the JSON file named by
+GRPC_CONFIG (keys are the field names), then GRPC_<FIELD> environment
+variables (e.g. GRPC_MAX_WORKERS=16, GRPC_COMPRESSION=gzip).
+
+Besides the TCP port a server can listen on a Unix domain socket
+(GRPC_UNIX_SOCKET, e.g. in a volume shared by co-located containers);
+clients on the same host dial it as "unix:<path>" and skip the TCP/IP stack.
+
+Every server records per-method metrics (src/common/metrics.py) and, unless
+metrics_port is 0, serves them for Prometheus at :metrics_port/metrics.
+
+A service can pass a warm-up: the server listens at once but reports
+NOT_SERVING until the warm-up has run warmup_rows synthetic rows through its
+code paths (first-call allocations, lazy imports, pool workers), so a
+readiness check only passes once the first real request runs at full speed.
+
+serve() blocks until SIGTERM or SIGINT, then drains: health goes
+NOT_SERVING, new calls are refused, and in-flight calls get up to
+shutdown_grace_s seconds to finish before the server stops.
+"""
+import asyncio
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent import futures
+from dataclasses import dataclass, fields, replace
+
+import grpc
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
+
+from src.common import aio
+from src.common.metrics import AsyncMetricsInterceptor, MetricsExporter, MetricsInterceptor
+
+log = logging.getLogger(__name__)
+
+COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+_MB = 1 << 20
+
+
+@dataclass(frozen=True)
+class ServerConfig:
+    port: int = 0
+    unix_socket: str = ""                # also listen on this Unix socket path ("" = TCP only)
+    server_mode: str = "thread"          # "thread" or "aio"
+    max_workers: int = 4                 # thread mode: RPC worker threads
+    offload_workers: int = 0             # aio mode: offload pool size (0 = AIO_OFFLOAD_WORKERS)
+    max_concurrent_rpcs: int = 0         # 0 = unlimited
+    max_receive_message_mb: int = 64     # -1 = unlimited
+    max_send_message_mb: int = 64
+    compression: str = "none"            # default for responses: none, gzip or deflate
+    keepalive_time_ms: int = 60000
+    keepalive_timeout_ms: int = 20000
+    keepalive_permit_without_calls: bool = True
+    max_concurrent_streams: int = 0      # per HTTP/2 connection, 0 = gRPC default
+    shutdown_grace_s: float = 20.0
+    metrics_port: int = -1               # Prometheus /metrics; -1 = port + 1000, 0 = off
+    log_sample_rate: float = 0.01        # share of successful RPCs logged (failures always are)
+    warmup_rows: int = 1000              # synthetic rows warmed up before SERVING (0 = no warm-up)
+
+
+def _coerce(value, default):
+    if isinstance(default, bool):
+        return str(value).strip().lower() in ("1", "true", "yes", "on")
+    return type(default)(value)
+
+
+def load_config(port: int, path: str = None) -> ServerConfig:
+    """ServerConfig for a service listening on `port`: defaults < config file < env."""
+    config = ServerConfig(port=port)
+    defaults = {f.name: getattr(config, f.name) for f in fields(ServerConfig)}
+    values = {}
+
+    path = path or os.getenv("GRPC_CONFIG")
+    if path:
+        with open(path) as f:
+            for key, value in json.load(f).items():
+                if key not in defaults:
+                    raise ValueError(f"unknown server setting {key!r} in {path}")
+                values[key] = _coerce(value, defaults[key])
+
+    for key, default in defaults.items():
+        env = os.getenv(f"GRPC_{key.upper()}")
+        if env is not None:
+            values[key] = _coerce(env, default)
+
+    config = replace(config, **values)
+    if config.metrics_port < 0:
+        config = replace(config, metrics_port=config.port + 1000 if config.port else 0)
+    if config.compression not in COMPRESSION:
+        raise ValueError(f"GRPC_COMPRESSION must be one of {sorted(COMPRESSION)}")
+    if config.server_mode not in ("thread", "aio"):
+        raise ValueError("GRPC_SERVER_MODE must be 'thread' or 'aio'")
+    return config
+
+
+def _message_limit(mb: int) -> int:
+    return -1 if mb < 0 else mb * _MB
+
+
+def channel_options(config: ServerConfig):
+    """Message-size and keepalive options shared by servers and the channels that call them."""
+    return [
+        ("grpc.max_receive_message_length", _message_limit(config.max_receive_message_mb)),
+        ("grpc.max_send_message_length", _message_limit(config.max_send_message_mb)),
+        ("grpc.keepalive_time_ms", config.keepalive_time_ms),
+        ("grpc.keepalive_timeout_ms", config.keepalive_timeout_ms),
+        ("grpc.keepalive_permit_without_calls", int(config.keepalive_permit_without_calls)),
+    ]
+
+
+def server_options(config: ServerConfig):
+    options = channel_options(config) + [
+        # accept client pings at the rate our own channels send them
+        ("grpc.http2.min_recv_ping_interval_without_data_ms", config.keepalive_time_ms),
+        ("grpc.http2.max_pings_without_data", 0),
+    ]
+    if config.max_concurrent_streams:
+        options.append(("grpc.max_concurrent_streams", config.max_concurrent_streams))
+    return options
+
+
+def _listen(server, config: ServerConfig) -> int:
+    """Bind the TCP port and, if configured, the Unix socket; returns the TCP port."""
+    port = server.add_insecure_port(f"[::]:{config.port}")
+    if config.unix_socket:
+        path = config.unix_socket
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(path):
+            os.unlink(path)  # left behind by a previous run
+        server.add_insecure_port(f"unix:{path}")
+    return port
+
+
+def _unlink_socket(path: str) -> None:
+    if path:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _warm_up(warmup, rows: int) -> None:
+    if warmup is None or rows <= 0:
+        return
+    t0 = time.perf_counter()
+    warmup(rows)
+    log.info("warmed up in %.3fs (%d rows)", time.perf_counter() - t0, rows)
+
+
+def _server_kwargs(config: ServerConfig):
+    return dict(
+        options=server_options(config),
+        maximum_concurrent_rpcs=config.max_concurrent_rpcs or None,
+        compression=COMPRESSION[config.compression],
+    )
+
+
+# ----- threaded -----
+class Server:
+    """A started thread-pool server, its health servicer and metrics endpoint."""
+
+    def __init__(self, server, health_serv, service_name, port, exporter=None, unix_socket=""):
+        self.server = server
+        self.health = health_serv
+        self.service_name = service_name
+        self.port = port
+        self.exporter = exporter
+        self.unix_socket = unix_socket
+
+    def set_serving(self, serving: bool) -> None:
+        status = (health_pb2.HealthCheckResponse.SERVING if serving
+                  else health_pb2.HealthCheckResponse.NOT_SERVING)
+        self.health.set("", status)
+        self.health.set(self.service_name, status)
+
+    def stop(self, grace: float = None) -> None:
+        """Fail health checks, refuse new calls and wait up to grace seconds for in-flight ones."""
+        self.set_serving(False)
+        self.server.stop(grace).wait()
+        if self.exporter:
+            self.exporter.close()
+        _unlink_socket(self.unix_socket)
+
+
+def start(service_name, servicers, config: ServerConfig, warmup=None) -> Server:
+    """Build and start a thread-pool server; servicers is a list of (add_fn, servicer).
+
+    warmup(rows), if given, runs before health turns SERVING.
+    """
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=config.max_workers),
+        interceptors=[MetricsInterceptor(log_sample_rate=config.log_sample_rate)],
+        **_server_kwargs(config),
+    )
+    for add, servicer in servicers:
+        add(servicer, server)
+
+    health_serv = health.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(health_serv, server)
+
+    port = _listen(server, config)
+    exporter = MetricsExporter(config.metrics_port) if config.metrics_port else None
+    running = Server(server, health_serv, service_name, port, exporter, config.unix_socket)
+    running.set_serving(False)  # until warmed up
+    server.start()
+    log.info("gRPC listening on :%s%s (workers=%d compression=%s)", port,
+             f" and unix:{config.unix_socket}" if config.unix_socket else "",
+             config.max_workers, config.compression)
+    try:
+        _warm_up(warmup, config.warmup_rows)
+    except BaseException:
+        running.stop(0)
+        raise
+    running.set_serving(True)
+    return running
+
+
+# ----- pre-serialized responses -----
+class _Recorded:
+    """Stands in for a server to capture what a generated add_*_to_server registers."""
+
+    def add_generic_rpc_handlers(self, handlers):
+        pass
+
+    def add_registered_method_handlers(self, service, handlers):
+        self.service, self.handlers = service, handlers
+
+
+def _passthrough(serialize):
+    def serializer(response):
+        return response if isinstance(response, bytes) else serialize(response)
+    return serializer
+
+
+def raw_responses(add_to_server, *methods):
+    """A generated add_*Servicer_to_server whose `methods` may also return a
+    response already serialized (bytes, e.g. from a cache); it is sent as it is."""
+    def add(servicer, server):
+        recorded = _Recorded()
+        add_to_server(servicer, recorded)
+        handlers = dict(recorded.handlers)
+        for name in methods:
+            handler = handlers[name]
+            handlers[name] = handler._replace(response_serializer=_passthrough(handler.response_serializer))
+        server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(recorded.service, handlers),))
+        server.add_registered_method_handlers(recorded.service, handlers)
+    return add
+
+
+# ----- asyncio -----
+class AsyncServer:
+    """A started grpc.aio server, its health servicer and metrics endpoint."""
+
+    def __init__(self, server, health_serv, service_name, port, exporter=None, unix_socket=""):
+        self.server = server
+        self.health = health_serv
+        self.service_name = service_name
+        self.port = port
+        self.exporter = exporter
+        self.unix_socket = unix_socket
+
+    async def set_serving(self, serving: bool) -> None:
+        status = (health_pb2.HealthCheckResponse.SERVING if serving
+                  else health_pb2.HealthCheckResponse.NOT_SERVING)
+        await self.health.set("", status)
+        await self.health.set(self.service_name, status)
+
+    async def stop(self, grace: float = None) -> None:
+        await self.health.enter_graceful_shutdown()
+        await self.server.stop(grace)
+        if self.exporter:
+            self.exporter.close()
+        _unlink_socket(self.unix_socket)
+
+
+async def start_async(service_name, servicers, config: ServerConfig, warmup=None) -> AsyncServer:
+    """grpc.aio twin of start(); servicers must be the async servicers.
+
+    The warm-up runs on the offload pool, so health checks are answered meanwhile.
+    """
+    if config.offload_workers:
+        aio.configure(config.offload_workers)
+    server = grpc.aio.server(
+        interceptors=[AsyncMetricsInterceptor(log_sample_rate=config.log_sample_rate)],
+        **_server_kwargs(config),
+    )
+    for add, servicer in servicers:
+        add(servicer, server)
+
+    health_serv = health.aio.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(health_serv, server)
+
+    port = _listen(server, config)
+    exporter = MetricsExporter(config.metrics_port) if config.metrics_port else None
+    running = AsyncServer(server, health_serv, service_name, port, exporter, config.unix_socket)
+    await running.set_serving(False)  # until warmed up
+    await server.start()
+    log.info("gRPC (asyncio) listening on :%s%s (compression=%s)", port,
+             f" and unix:{config.unix_socket}" if config.unix_socket else "", config.compression)
+    try:
+        await aio.offload(_warm_up, warmup, config.warmup_rows)
+    except BaseException:
+        await running.stop(0)
+        raise
+    await running.set_serving(True)
+    return running
+
+
+# ----- entry point -----
+def _serve_threaded(service_name, servicers, config, warmup):
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+
+    server = start(service_name, servicers(aio=False), config, warmup)
+    stop.wait()
+    log.info("shutting down: draining in-flight RPCs for up to %ss", config.shutdown_grace_s)
+    server.stop(config.shutdown_grace_s)
+
+
+async def _serve_async(service_name, servicers, config, warmup):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    server = await start_async(service_name, servicers(aio=True), config, warmup)
+    await stop.wait()
+    log.info("shutting down: draining in-flight RPCs for up to %ss", config.shutdown_grace_s)
+    await server.stop(config.shutdown_grace_s)
+    aio.shutdown()
+
+
+def serve(service_name, servicers, port: int, warmup=None) -> None:
+    """Run a service until SIGTERM/SIGINT, then drain.
+
+    servicers(aio) returns the (add_fn, servicer) pairs to register, async
+    servicers when aio is true; warmup(rows) runs before health is SERVING.
+    """
+    config = load_config(port)
+    if config.server_mode == "aio":
+        asyncio.run(_serve_async(service_name, servicers, config, warmup))
+    else:
+        _serve_threaded(service_name, servicers, config, warmup)
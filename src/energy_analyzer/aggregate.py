@@ -0,0 +1,170 @@
+"""Time-bucketed rollups for AggregateData.
+
+Readings are grouped by household and time window (the window start is the
+timestamp rounded down to a multiple of window_ms) and every group is
+reduced to count, sum, min, max, mean and anomaly count, so a dashboard gets
+one row per household and window instead of every reading.
+
+Grouping is a hash aggregation over columns, with no sort: each row's key
+(household, window start) is hashed into an open-addressing table that is
+probed for all rows at once, one vectorized step per probe distance, which
+gives every row a dense group id; the reductions are then bincounts and
+ufunc.at over those ids. Groups come out in the order of their first row,
+so rows that arrive in time order give windows in time order.
+
+Anomalies are flagged as the analysis flags them: by the HIGH rule, or by a
+stateful detector, which then sees the rows as it does in AnalyzeBatch.
+"""
+import os
+
+import numpy as np
+
+import energy_pb2
+from src.common.columnar import TIMESTAMP_UNSET, column
+from src.energy_analyzer import engine
+
+WINDOW_MS = int(os.getenv("AGGREGATE_WINDOW_MS", str(15 * 60 * 1000)))  # when the request sets none
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)  # 2**64 / golden ratio (Fibonacci hashing)
+
+
+# ----- grouping -----
+def _words(keys):
+    """An 'S' array as an (n, k) uint64 matrix, NUL padded to whole words."""
+    width = max(-(-keys.dtype.itemsize // 8), 1)
+    return np.ascontiguousarray(keys, dtype=f"S{width * 8}").view(np.uint64).reshape(len(keys), width)
+
+
+def _hash(words):
+    h = np.zeros(len(words), np.uint64)
+    for k in range(words.shape[1]):
+        h = (h ^ words[:, k]) * _MIX
+        h ^= h >> np.uint64(29)
+    return h
+
+
+def group_ids(words):
+    """(group id per row, first row of each group) for the keys in the rows of
+    an (n, k) uint64 matrix. Equal keys share an id; ids are numbered in the
+    order the keys first appear.
+
+    The table has at least twice as many slots as rows; rows whose slot
+    holds another key move on to the next slot (linear probing).
+    """
+    n = len(words)
+    if not n:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    bits = max(int(2 * n - 1).bit_length(), 4)
+    mask = (1 << bits) - 1
+    slot = (_hash(words) >> np.uint64(64 - bits)).astype(np.int64)
+    owner = np.full(1 << bits, -1, np.int64)  # a row holding the slot's key
+    row_slot = np.empty(n, np.int64)
+    pending = np.arange(n)
+    while len(pending):
+        at = slot[pending]
+        free = owner[at] < 0
+        owner[at[free]] = pending[free]  # rows racing for one free slot: one of them takes it
+        found = (words[owner[at]] == words[pending]).all(axis=1)
+        row_slot[pending[found]] = at[found]
+        pending = pending[~found]
+        slot[pending] = (slot[pending] + 1) & mask
+
+    first = np.full(1 << bits, n, np.int64)
+    np.minimum.at(first, row_slot, np.arange(n))
+    first_row = first[row_slot]
+    is_first = first_row == np.arange(n)
+    return (np.cumsum(is_first) - 1)[first_row], np.flatnonzero(is_first)
+
+
+def window_starts(timestamp_ms, window_ms: int):
+    """Start of each timestamp's window; rows without a timestamp keep TIMESTAMP_UNSET."""
+    unset = timestamp_ms == TIMESTAMP_UNSET
+    with np.errstate(over="ignore"):
+        start = timestamp_ms - timestamp_ms % window_ms
+    start[unset] = TIMESTAMP_UNSET
+    return start
+
+
+# ----- reduce -----
+def _rollup(household_words, household, timestamp_ms, power, anomaly, window_ms):
+    """Group and reduce; (group household, window start, count, sum, min, max, anomalies)."""
+    start = window_starts(timestamp_ms, window_ms)
+    gid, first = group_ids(np.column_stack([household_words, start.view(np.uint64)]))
+    groups = len(first)
+    count = np.bincount(gid, minlength=groups)
+    total = np.bincount(gid, power, groups)
+    low = np.full(groups, np.inf)
+    np.minimum.at(low, gid, power)
+    high = np.full(groups, -np.inf)
+    np.maximum.at(high, gid, power)
+    anomalies = np.bincount(gid, anomaly, groups).astype(np.int64)
+    return household[first], start[first], count, total, low, high, anomalies
+
+
+def _response(households, household, start, count, total, low, high, anomalies, window_ms, skipped):
+    out = energy_pb2.AggregateResponse(window_ms=window_ms, skipped_rows=skipped)
+    out.household_ids.extend(households)
+    out.household.extend(household.tolist())
+    out.window_start_ms.extend(start.tolist())
+    out.count.extend(count.tolist())
+    out.sum.extend(total.tolist())
+    out.min.extend(low.tolist())
+    out.max.extend(high.tolist())
+    with np.errstate(invalid="ignore"):
+        out.mean.extend((total / count).tolist())
+    out.anomaly_count.extend(anomalies.tolist())
+    return out
+
+
+def aggregate_batch(batch, window_ms: int = WINDOW_MS, detector=None):
+    """RawEnergyBatch -> AggregateResponse; the batch's household table is kept."""
+    if not len(batch.household) == len(batch.timestamp_ms) == len(batch.power_consumption):
+        raise ValueError("batch columns household, timestamp_ms and power_consumption differ in length")
+    household = column(batch.household, np.uint32)
+    power = column(batch.power_consumption, np.float64)
+    _, anomaly = engine.analyze_power(power)
+    if detector is not None:
+        anomaly = detector.update_table(batch.household_ids, household.astype(np.int64), power)
+    rolled = _rollup(household.astype(np.uint64)[:, None], household,
+                     column(batch.timestamp_ms, np.int64), power, anomaly, window_ms)
+    return _response(batch.household_ids, *rolled, window_ms, batch.skipped_rows)
+
+
+def aggregate_serialized(raw, window_ms: int = WINDOW_MS, detector=None):
+    """Serialized rows (an AnalyzeRequest / GenerateResponse, or an
+    AggregateRequest's data) -> AggregateResponse. Rows whose power does
+    not parse are skipped, as in AnalyzeData."""
+    blocks = list(engine.columns_serialized(raw))
+    if not blocks:
+        return _response([], *(np.zeros(0, np.int64),) * 7, window_ms, 0)
+    keys, timestamp_ms, power, skipped = zip(*blocks)
+    keys, timestamp_ms, power = np.concatenate(keys), np.concatenate(timestamp_ms), np.concatenate(power)
+    _, anomaly = engine.analyze_power(power)
+    if detector is not None:
+        anomaly = detector.update(keys, power)
+    group_keys, *rolled = _rollup(_words(keys), keys, timestamp_ms, power, anomaly, window_ms)
+    # the household table: distinct IDs of the groups, in first-seen order
+    table = {}
+    household = np.fromiter((table.setdefault(k, len(table)) for k in group_keys.tolist()),
+                            np.uint32, len(group_keys))
+    households = [k.decode("utf-8", "replace") for k in table]
+    return _response(households, household, *rolled, window_ms, sum(skipped))
+
+
+def request_window(request) -> int:
+    """window_ms of an AggregateRequest (WINDOW_MS when unset); ValueError if negative."""
+    if request.window_ms < 0:
+        raise ValueError(f"window_ms must be positive, got {request.window_ms}")
+    return request.window_ms or WINDOW_MS
+
+
+def aggregate(request, detector=None):
+    """AggregateData: the rows or the batch of an AggregateRequest, rolled up;
+    ValueError for an invalid request."""
+    window_ms = request_window(request)
+    if request.HasField("batch"):
+        if len(request.data):
+            raise ValueError("set either data or batch, not both")
+        return aggregate_batch(request.batch, window_ms, detector)
+    # field 1 of the request is the rows, so its bytes read as an AnalyzeRequest
+    return aggregate_serialized(request.SerializeToString(), window_ms, detector)
@@ -0,0 +1,273 @@
+"""Content-addressed cache of analysis results.
+
+Keys are digests of what the result depends on: the serialized request
+bytes for AnalyzeData, the input file's content for the executor. Values are
+the finished output bytes (a serialized AnalyzeResponse, or the whole
+output record file), so a hit is served without analyzing the rows again.
+AnalyzeData and the executor send or copy the bytes without parsing them; the
+streaming RPCs parse a hit to merge it into their reply.
+
+Two tiers, both bounded by total size and evicted least recently used:
+memory, and an optional directory (e.g. under /app/data) that survives
+restarts. Disk entries are written to a temp file and renamed. Output files
+go file to file (put_file / get_file), so an entry of any size is never held
+in memory; only files that fit the memory tier are also kept there. Hits,
+misses, evictions and sizes are exported with the RPC metrics.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from src.common.metrics import DEFAULT, Counter, Gauge
+
+log = logging.getLogger(__name__)
+
+CACHE_BYTES = int(os.getenv("ANALYZE_CACHE_BYTES", str(256 << 20)))  # 0 disables the cache
+CACHE_DIR = os.getenv("ANALYZE_CACHE_DIR", "")                       # e.g. /app/data/analyze-cache
+CACHE_DISK_BYTES = int(os.getenv("ANALYZE_CACHE_DISK_BYTES", str(4 << 30)))
+
+# bumped whenever the analysis output for the same input changes
+VERSION = b"analyzer-2"
+
+_registry = DEFAULT.registry
+LOOKUPS = _registry.register(Counter(
+    "analyze_cache_lookups_total", "Result cache lookups, by tier that answered (or miss).", ("result",)))
+EVICTIONS = _registry.register(Counter(
+    "analyze_cache_evictions_total", "Result cache entries evicted, by tier.", ("tier",)))
+SIZE = _registry.register(Gauge("analyze_cache_bytes", "Result cache size, by tier.", ("tier",)))
+
+
+def digest(*parts) -> str:
+    h = hashlib.blake2b(VERSION, digest_size=20)
+    for part in parts:
+        h.update(part)
+    return h.hexdigest()
+
+
+def request_key(kind: str, raw) -> str:
+    """Key for a serialized request handled by RPC kind."""
+    return digest(kind.encode(), b"\0", raw)
+
+
+class _FileKeys:
+    """Content digests of input files, remembered per (path, size, mtime) so
+    an unchanged file is hashed only once."""
+
+    def __init__(self, limit: int = 4096):
+        self._known = OrderedDict()
+        self._limit = limit
+        self._lock = threading.Lock()
+
+    def __call__(self, path) -> str:
+        st = os.stat(path)
+        stamp = (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            key = self._known.get(stamp)
+            if key is not None:
+                self._known.move_to_end(stamp)
+                return key
+        with open(path, "rb") as f:
+            if st.st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    key = digest(b"file\0", m)
+            else:
+                key = digest(b"file\0")
+        with self._lock:
+            self._known[stamp] = key
+            while len(self._known) > self._limit:
+                self._known.popitem(last=False)
+        return key
+
+
+file_key = _FileKeys()
+
+
+def _replace(path, fill):
+    """fill(tmp) a temp file next to path, then rename it over path."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        fill(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+class ResultCache:
+    """Bounded LRU of bytes values: memory tier plus an optional disk tier."""
+
+    def __init__(self, max_bytes: int = CACHE_BYTES, disk_dir=CACHE_DIR, disk_bytes: int = CACHE_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self._mem = OrderedDict()
+        self._mem_bytes = 0
+        self._lock = threading.Lock()
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_bytes = disk_bytes
+        self._disk = OrderedDict()  # key -> size, oldest first
+        self._disk_total = 0
+        self._lookups = {"memory": 0, "disk": 0, "miss": 0}  # this instance's; LOOKUPS is process-wide
+        if self.disk_dir is not None:
+            self._scan()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self.disk_dir is not None
+
+    # ----- lookups -----
+    def get(self, key: str):
+        with self._lock:
+            value = self._mem.get(key)
+            if value is not None:
+                self._mem.move_to_end(key)
+            on_disk = value is None and key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+        if value is not None:
+            self._looked_up("memory")
+            return value
+        if on_disk:
+            value = self._read(key)
+            if value is not None:
+                self._looked_up("disk")
+                self._remember(key, value)
+                return value
+        self._looked_up("miss")
+        return None
+
+    def put(self, key: str, value: bytes) -> None:
+        value = bytes(value)
+        self._remember(key, value)
+        if self.disk_dir is not None and len(value) <= self.disk_bytes:
+            self._write(key, value)
+
+    def get_file(self, key: str, path) -> bool:
+        """Write the value for key to path (temp file and rename); False on a miss.
+        A disk entry is copied file to file, not read into memory."""
+        with self._lock:
+            value = self._mem.get(key)
+            if value is not None:
+                self._mem.move_to_end(key)
+            on_disk = value is None and key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+        if value is not None:
+            _replace(path, lambda tmp: tmp.write_bytes(value))
+            self._looked_up("memory")
+            return True
+        if on_disk:
+            entry = self._path(key)
+            try:
+                _replace(path, lambda tmp: shutil.copyfile(entry, tmp))
+                os.utime(entry)
+            except FileNotFoundError:
+                self._forget(key)
+            else:
+                self._looked_up("disk")
+                if os.path.getsize(path) <= self.max_bytes:
+                    self._remember(key, Path(path).read_bytes())
+                return True
+        self._looked_up("miss")
+        return False
+
+    def _looked_up(self, result):
+        LOOKUPS.inc(result)
+        with self._lock:
+            self._lookups[result] += 1
+
+    def put_file(self, key: str, path) -> None:
+        """Cache the contents of a file: copied into the disk tier, and read
+        into the memory tier only when it fits there."""
+        size = os.path.getsize(path)
+        if size <= self.max_bytes:
+            self._remember(key, Path(path).read_bytes())
+        if self.disk_dir is not None and size <= self.disk_bytes:
+            self._store(key, size, lambda tmp: shutil.copyfile(path, tmp))
+
+    # ----- memory tier -----
+    def _remember(self, key, value):
+        if not self.max_bytes or len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._mem.pop(key, None)
+            if old is not None:
+                self._mem_bytes -= len(old)
+            self._mem[key] = value
+            self._mem_bytes += len(value)
+            while self._mem_bytes > self.max_bytes:
+                _, evicted = self._mem.popitem(last=False)
+                self._mem_bytes -= len(evicted)
+                EVICTIONS.inc("memory")
+        self._publish()
+
+    def _publish(self):
+        SIZE.set("memory", value=self._mem_bytes)
+        SIZE.set("disk", value=self._disk_total)
+
+    # ----- disk tier -----
+    def _path(self, key):
+        return self.disk_dir / key[:2] / key
+
+    def _scan(self):
+        entries = []
+        for p in self.disk_dir.glob("??/*"):
+            if p.name.startswith("."):
+                p.unlink(missing_ok=True)  # left over from an interrupted write
+                continue
+            st = p.stat()
+            entries.append((st.st_mtime_ns, p.name, st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_total += size
+        log.info("result cache: %d entries (%d bytes) on disk in %s",
+                 len(self._disk), self._disk_total, self.disk_dir)
+        self._publish()
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            value = path.read_bytes()
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            self._forget(key)
+            return None
+
+    def _forget(self, key):
+        with self._lock:
+            size = self._disk.pop(key, None)
+            if size is not None:
+                self._disk_total -= size
+
+    def _write(self, key, value):
+        self._store(key, len(value), lambda tmp: tmp.write_bytes(value))
+
+    def _store(self, key, size, fill):
+        _replace(self._path(key), fill)
+        evict = []
+        with self._lock:
+            self._disk_total += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            while self._disk_total > self.disk_bytes:
+                old, size = self._disk.popitem(last=False)
+                self._disk_total -= size
+                evict.append(old)
+        for old in evict:
+            self._path(old).unlink(missing_ok=True)
+            EVICTIONS.inc("disk")
+        self._publish()
+
+    def stats(self):
+        """Entries and bytes per tier, and this cache's own hits and misses."""
+        with self._lock:
+            return {
+                "memory_entries": len(self._mem), "memory_bytes": self._mem_bytes,
+                "disk_entries": len(self._disk), "disk_bytes": self._disk_total,
+                "hits": self._lookups["memory"] + self._lookups["disk"], "misses": self._lookups["miss"],
+            }
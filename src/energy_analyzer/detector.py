@@ -0,0 +1,237 @@
+"""Stateful per-household anomaly detection.
+
+EwmaDetector keeps an exponentially weighted mean and second moment of power
+for every household it has seen, in flat NumPy arrays indexed by a slot from
+HouseholdTable, so the state is a few dozen bytes per household and a batch
+is scored and folded in with array operations only (no per-row Python, no
+per-row dict access).
+
+Within a batch every reading is scored against the household's state as it
+was before the batch; the batch is then folded in exactly as if the readings
+had been applied one at a time, in order. A reading is anomalous when its
+z-score reaches z_threshold once the household has at least warmup readings;
+readings that are not finite are always anomalous (as with the static rule).
+
+The state can be snapshotted to an .npz file (written to a temp file and
+renamed) and restored on start-up.
+"""
+import io
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+MODE = os.getenv("ANOMALY_DETECTOR", "static")  # "static" (power / 150 >= 1) or "ewma"
+ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.05"))
+Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "3.0"))
+WARMUP = int(os.getenv("ANOMALY_WARMUP", "20"))
+STATE_PATH = os.getenv("ANOMALY_STATE_PATH", "/app/data/anomaly_state.npz")  # "" = no snapshots
+SNAPSHOT_INTERVAL_S = float(os.getenv("ANOMALY_SNAPSHOT_INTERVAL_S", "60"))
+
+
+class HouseholdTable:
+    """Household ID (bytes) -> dense slot, as a sorted fixed-width key array.
+
+    Lookups are one searchsorted over the distinct keys of a batch; new keys
+    are merged in with one insert. Slots are handed out in first-seen order
+    and never change.
+    """
+
+    def __init__(self):
+        self._keys = np.zeros(0, "S1")
+        self._slots = np.zeros(0, np.int64)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def slots(self, keys):
+        """Slots for a 1-D array of distinct bytes keys, adding the unknown ones."""
+        keys = np.asarray(keys, dtype="S")
+        if not len(keys):
+            return np.zeros(0, np.int64)
+        if keys.dtype.itemsize > self._keys.dtype.itemsize:
+            self._keys = self._keys.astype(keys.dtype)
+        keys = keys.astype(self._keys.dtype)
+
+        pos = np.searchsorted(self._keys, keys)
+        found = pos < len(self._keys)
+        found[found] = self._keys[pos[found]] == keys[found]
+        out = np.empty(len(keys), np.int64)
+        out[found] = self._slots[pos[found]]
+
+        if not found.all():
+            new = keys[~found]
+            new_slots = len(self._keys) + np.arange(len(new))
+            out[~found] = new_slots
+            order = np.argsort(new, kind="stable")
+            at = np.searchsorted(self._keys, new[order])
+            self._keys = np.insert(self._keys, at, new[order])
+            self._slots = np.insert(self._slots, at, new_slots[order])
+        return out
+
+    def keys_by_slot(self):
+        out = np.empty(len(self._keys), self._keys.dtype)
+        out[self._slots] = self._keys
+        return out
+
+
+class EwmaDetector:
+    def __init__(self, alpha: float = ALPHA, z_threshold: float = Z_THRESHOLD, warmup: int = WARMUP):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.households = HouseholdTable()
+        self.mean = np.zeros(0)
+        self.moment2 = np.zeros(0)   # EW mean of power**2; variance = moment2 - mean**2
+        self.count = np.zeros(0, np.int64)
+        self._lock = threading.Lock()
+
+    def _grow(self, n):
+        if n > len(self.count):
+            size = max(n, 2 * len(self.count), 1024)
+            for name in ("mean", "moment2", "count"):
+                old = getattr(self, name)
+                new = np.zeros(size, old.dtype)
+                new[:len(old)] = old
+                setattr(self, name, new)
+
+    # ----- scoring -----
+    def update(self, keys, power):
+        """Score and fold in one batch. keys: UTF-8 household ID (bytes) per
+        row; returns the anomaly flag per row."""
+        distinct, inverse = np.unique(np.asarray(keys, dtype="S"), return_inverse=True)
+        with self._lock:
+            return self._update(self.households.slots(distinct)[inverse.ravel()], power)
+
+    def update_table(self, households, index, power):
+        """update() for dictionary-encoded rows (a table of IDs plus an index per row)."""
+        keys = np.array([h.encode() for h in households], dtype="S") if len(households) else np.zeros(0, "S1")
+        with self._lock:
+            return self._update(self.households.slots(keys)[index], power)
+
+    def _update(self, slots, power):
+        power = np.asarray(power, np.float64)
+        self._grow(len(self.households))
+        finite = np.isfinite(power)
+
+        mean, count = self.mean[slots], self.count[slots]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(np.maximum(self.moment2[slots] - mean * mean, 0.0))
+            z = np.abs(power - mean) / std
+        anomaly = ~finite | ((count >= self.warmup) & (z >= self.z_threshold))
+
+        self._fold(slots[finite], power[finite])
+        return anomaly
+
+    def _fold(self, slots, x):
+        """Apply the readings x in order: m <- (1 - a) m + a x for each one, in closed form."""
+        if not len(slots):
+            return
+        order = np.argsort(slots, kind="stable")
+        s, x = slots[order], x[order]
+        starts = np.flatnonzero(np.r_[True, s[1:] != s[:-1]])
+        sizes = np.diff(np.r_[starts, len(s)])
+        group = s[starts]
+
+        # a household seen for the first time starts from its first reading
+        fresh = self.count[group] == 0
+        self.mean[group[fresh]] = x[starts[fresh]]
+        self.moment2[group[fresh]] = x[starts[fresh]] ** 2
+
+        # after n readings: m_n = d^n m_0 + a * sum_j d^(n-j) x_j, with d = 1 - a
+        d = 1.0 - self.alpha
+        ends = np.repeat(starts + sizes, sizes)
+        weight = self.alpha * d ** (ends - 1 - np.arange(len(s)))
+        decay = d ** sizes
+        idx = np.repeat(np.arange(len(group)), sizes)
+        self.mean[group] = decay * self.mean[group] + np.bincount(idx, weight * x, len(group))
+        self.moment2[group] = decay * self.moment2[group] + np.bincount(idx, weight * x * x, len(group))
+        self.count[group] += sizes
+
+    # ----- snapshots -----
+    def snapshot(self, path) -> None:
+        """Write the state to path atomically."""
+        with self._lock:
+            n = len(self.households)
+            state = dict(
+                keys=self.households.keys_by_slot(),
+                mean=self.mean[:n], moment2=self.moment2[:n], count=self.count[:n],
+                alpha=self.alpha,
+            )
+            buf = io.BytesIO()
+            np.savez(buf, **state)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(buf.getbuffer())
+        os.replace(tmp, path)
+
+    def restore(self, path) -> bool:
+        """Load a snapshot written by snapshot(); False if there is none."""
+        path = Path(path)
+        if not path.exists():
+            return False
+        with np.load(path) as state:
+            keys = state["keys"]
+            if float(state["alpha"]) != self.alpha:
+                log.warning("anomaly state %s was built with alpha=%s, now %s",
+                            path, float(state["alpha"]), self.alpha)
+            with self._lock:
+                self.households = HouseholdTable()
+                self.households.slots(keys)  # distinct keys in slot order -> slots 0..n-1
+                self.mean = state["mean"].astype(np.float64)
+                self.moment2 = state["moment2"].astype(np.float64)
+                self.count = state["count"].astype(np.int64)
+        log.info("anomaly state restored from %s: households=%d", path, len(keys))
+        return True
+
+
+def create(mode: str = MODE):
+    """The detector for mode; None selects the static rule."""
+    if mode == "static":
+        return None
+    if mode == "ewma":
+        return EwmaDetector()
+    raise ValueError(f"unknown ANOMALY_DETECTOR {mode!r} (expected 'static' or 'ewma')")
+
+
+class Snapshotter:
+    """Snapshots a detector every interval_s on a daemon thread, and once more on stop()."""
+
+    def __init__(self, detector: EwmaDetector, path=STATE_PATH, interval_s: float = SNAPSHOT_INTERVAL_S):
+        self.detector = detector
+        self.path = path
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self.path:
+            self.detector.restore(self.path)
+        if self.path and self.interval_s > 0:
+            self._thread = threading.Thread(target=self._run, name="anomaly-snapshots", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self._save()
+
+    def _save(self):
+        try:
+            t0 = time.perf_counter()
+            self.detector.snapshot(self.path)
+            log.debug("anomaly state snapshot: %s in %.3fs", self.path, time.perf_counter() - t0)
+        except Exception:
+            log.exception("anomaly state snapshot failed")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.path:
+            self._save()
@@ -0,0 +1,562 @@
+"""Vectorized batch analysis for the EnergyAnalyzer.
+
+Rows are handled as serialized RawEnergyData bytes: the fields the analyzer
+needs are located with NumPy, power is parsed with one array cast, and the
+ProcessedDataReport entries are assembled directly in wire format, so no
+per-row message objects are created on either side. Output is identical to
+the original row-by-row loop, including which rows count as skipped.
+"""
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import energy_pb2
+from src.common.columnar import TIMESTAMP_UNSET, column, parse_timestamps
+
+EFFICIENCY_DIVISOR = 150.0  # placeholder calculation
+BLOCK_ROWS = 65536          # rows per vectorized block; bounds temporaries
+
+_FAST_POWER_LEN = 32        # longer power strings are parsed one by one
+_CAST_BLOCK = 1024          # granularity used to isolate unparseable strings
+
+STATUSES = ("OK", "HIGH")  # ProcessedEnergyBatch.statuses; status index 1 == HIGH
+
+_STATUS_OK = np.frombuffer(b"\x2a\x02OK\x00\x00", np.uint8)  # padded to HIGH's width
+_STATUS_HIGH = np.frombuffer(b"\x2a\x04HIGH", np.uint8)
+
+
+class _Malformed(Exception):
+    """Rows that the vectorized walker cannot frame; handled by the slow path."""
+
+
+# ----- wire helpers -----
+def _read_varint(buf, pos):
+    first = buf[pos]
+    if not (first & 0x80).any():  # the common case: every value fits in one byte
+        return first.astype(np.int64), np.ones(len(pos), np.int64)
+    value = np.zeros(len(pos), np.uint64)
+    size = np.zeros(len(pos), np.int64)
+    idx = np.arange(len(pos))
+    for k in range(10):
+        if not len(idx):
+            break
+        if int(pos[idx].max()) + k >= len(buf):
+            raise _Malformed("varint runs past the end of the buffer")
+        b = buf[pos[idx] + k].astype(np.uint64)
+        value[idx] |= (b & np.uint64(0x7F)) << np.uint64(7 * k)
+        size[idx] = k + 1
+        idx = idx[(b & np.uint64(0x80)) != 0]
+    if len(idx):
+        raise _Malformed("varint longer than 10 bytes")
+    return value.astype(np.int64), size
+
+
+def _varint_matrix(values):
+    """Encode non-negative int64 values (< 2**35) as an (n, 5) byte matrix plus sizes."""
+    mat = np.zeros((len(values), 5), np.uint8)
+    size = np.ones(len(values), np.int64)
+    v = values.copy()
+    for k in range(5):
+        mat[:, k] = v & 0x7F
+        v >>= 7
+        more = v > 0
+        if k < 4:
+            mat[more, k] |= 0x80
+            size += more
+        if not more.any():
+            break
+    return mat, size
+
+
+def _gather(buf, at, lengths):
+    """Left-aligned (n, max(lengths)) byte slots from buf plus their validity mask."""
+    width = int(lengths.max()) if len(lengths) else 0
+    if len(lengths) and int(lengths.min()) == width:
+        mask = np.ones((len(lengths), width), bool)
+    else:
+        mask = np.arange(width) < lengths[:, None]
+    if not width:
+        return np.zeros((len(at), 0), np.uint8), mask
+    # A strided window view turns the gather into a row take (no per-byte index).
+    last = len(buf) - width
+    if int(at.max()) <= last:
+        return sliding_window_view(buf, width)[at], mask
+    # Windows that would run off the end come from a zero-padded copy of the tail.
+    over = at > last
+    lo = int(at[over].min())
+    tail = np.concatenate([buf[lo:], np.zeros(width, np.uint8)])
+    slots = np.empty((len(at), width), np.uint8)
+    slots[~over] = sliding_window_view(buf, width)[at[~over]]
+    slots[over] = sliding_window_view(tail, width)[at[over] - lo]
+    return slots, mask
+
+
+# ----- decode -----
+def _locate_fields(buf, starts, ends):
+    """Find timestamp/household_id field spans and the power payload of every row."""
+    n = len(starts)
+    ts_at = np.zeros(n, np.int64)
+    ts_len = np.zeros(n, np.int64)
+    hh_at = np.zeros(n, np.int64)
+    hh_len = np.zeros(n, np.int64)
+    pw_at = np.zeros(n, np.int64)
+    pw_len = np.zeros(n, np.int64)
+
+    rows = np.nonzero(starts < ends)[0]
+    pos = starts[rows]
+    while len(rows):
+        tag, length = buf[pos], buf[pos + 1]
+        if not ((tag & 0x87) ^ 0x02).any() and not (length & 0x80).any():
+            # Fast path: every row is at a one-byte-tag string field with a
+            # one-byte length, which is what RawEnergyData nearly always is.
+            field = tag >> 3
+            payload = pos + 2
+            plen = length.astype(np.int64)
+            nxt = payload + plen
+            if (nxt > ends[rows]).any():
+                raise _Malformed("field runs past the end of its row")
+            delim = True
+        else:
+            field, payload, plen, nxt, delim = _walk_field(buf, pos, ends[rows])
+
+        # Later occurrences overwrite earlier ones: proto3 "last one wins".
+        m = delim & (field == 1)
+        ts_at[rows[m]], ts_len[rows[m]] = pos[m], (nxt - pos)[m]
+        m = delim & (field == 2)
+        hh_at[rows[m]], hh_len[rows[m]] = pos[m], (nxt - pos)[m]
+        m = delim & (field == 3)
+        pw_at[rows[m]], pw_len[rows[m]] = payload[m], plen[m]
+
+        more = nxt < ends[rows]
+        rows, pos = rows[more], nxt[more]
+
+    return ts_at, ts_len, hh_at, hh_len, pw_at, pw_len
+
+
+def _walk_field(buf, pos, ends):
+    """General case of one _locate_fields step: any tag size and wire type."""
+    tag, tag_size = _read_varint(buf, pos)
+    wire = tag & 7
+    body = pos + tag_size
+    payload = body.copy()
+    plen = np.zeros(len(pos), np.int64)
+    nxt = np.full(len(pos), -1, np.int64)
+
+    delim = wire == 2
+    if delim.any():
+        length, size = _read_varint(buf, body[delim])
+        payload[delim] = body[delim] + size
+        plen[delim] = length
+        nxt[delim] = payload[delim] + length
+    varint = wire == 0
+    if varint.any():
+        _, size = _read_varint(buf, body[varint])
+        nxt[varint] = body[varint] + size
+    nxt[wire == 1] = body[wire == 1] + 8
+    nxt[wire == 5] = body[wire == 5] + 4
+
+    if ((nxt <= pos) | (nxt > ends) | (plen < 0)).any():
+        raise _Malformed("field runs past the end of its row")
+    return tag >> 3, payload, plen, nxt, delim
+
+
+def _cast_float(strings):
+    """Parse an 'S' array; rows float() would reject come back with ok=False."""
+    try:
+        return strings.astype(np.float64), np.ones(len(strings), bool)
+    except ValueError:
+        pass
+    values = np.full(len(strings), np.nan)
+    ok = np.zeros(len(strings), bool)
+    for s in range(0, len(strings), _CAST_BLOCK):
+        block = strings[s:s + _CAST_BLOCK]
+        try:
+            values[s:s + _CAST_BLOCK] = block.astype(np.float64)
+            ok[s:s + _CAST_BLOCK] = True
+            continue
+        except ValueError:
+            pass
+        for i, raw in enumerate(block, start=s):
+            try:
+                values[i] = float(raw)
+                ok[i] = True
+            except ValueError:
+                pass
+    return values, ok
+
+
+def _parse_power(buf, at, length):
+    n = len(at)
+    power = np.full(n, np.nan)
+    valid = np.zeros(n, bool)
+    slow = (length > _FAST_POWER_LEN)
+
+    fast = np.nonzero((length > 0) & ~slow)[0]
+    if len(fast):
+        chars, inside = _gather(buf, at[fast], length[fast])
+        if not inside.all():
+            chars = np.where(inside, chars, 0)  # 'S' strips the trailing NULs
+        # NUL and non-ASCII bytes need str semantics (NumPy strips NULs,
+        # float() accepts Unicode digits); leave those to the slow path.
+        odd = np.count_nonzero(chars, axis=1) != length[fast]
+        if chars.max() >= 0x80:
+            odd |= (chars >= 0x80).any(axis=1)
+        if odd.any():
+            slow[fast[odd]] = True
+            fast, chars = fast[~odd], chars[~odd]
+        if len(fast):
+            values, ok = _cast_float(chars.view(f"S{chars.shape[1]}").ravel())
+            power[fast], valid[fast] = values, ok
+
+    for i in np.nonzero(slow)[0]:
+        try:
+            power[i] = float(buf[at[i]:at[i] + length[i]].tobytes().decode("utf-8"))
+            valid[i] = True
+        except (ValueError, UnicodeDecodeError):
+            pass
+    return power, valid
+
+
+# ----- compute -----
+def analyze_power(power):
+    """Vectorized analysis of float64 power readings -> (efficiency, high)."""
+    with np.errstate(over="ignore", invalid="ignore"):
+        efficiency = power / EFFICIENCY_DIVISOR
+        high = ~(efficiency < 1.0)  # NaN counts as HIGH, as in the row loop
+    return efficiency, high
+
+
+def analyze_batch(batch, detector=None):
+    """RawEnergyBatch -> ProcessedEnergyBatch. Columns are already numeric, so nothing is parsed.
+
+    With a detector (see detector.py) anomaly_detected comes from it instead
+    of following the HIGH status.
+    """
+    power = column(batch.power_consumption, np.float64)
+    efficiency, high = analyze_power(power)
+    anomaly = high
+    if detector is not None:
+        anomaly = detector.update_table(batch.household_ids, column(batch.household, np.int64), power)
+    with np.errstate(over="ignore"):
+        power32 = power.astype(np.float32)
+        efficiency32 = efficiency.astype(np.float32)
+
+    out = energy_pb2.ProcessedEnergyBatch(skipped_rows=batch.skipped_rows)
+    out.household_ids.extend(batch.household_ids)
+    out.household.extend(batch.household)
+    out.timestamp_ms.extend(batch.timestamp_ms)
+    out.power.extend(power32.tolist())
+    out.efficiency.extend(efficiency32.tolist())
+    out.statuses.extend(STATUSES)
+    out.status.extend(high.astype(np.uint32).tolist())
+    out.anomaly_detected.extend(anomaly.tolist())
+    return out
+
+
+# ----- encode -----
+def encode_processed(buf, ts_at, ts_len, hh_at, hh_len, power, efficiency, high, anomaly=None):
+    """Serialize ProcessedEnergyReport entries as repeated field 1 of a ProcessedDataReport.
+
+    timestamp/household_id are copied verbatim from `buf` (same field numbers
+    and wire type as in RawEnergyData); zero floats and False are omitted as
+    protobuf itself would. `high` picks the status; `anomaly` defaults to it.
+
+    Every row is laid out in fixed-width slots and the present bytes are
+    pulled out with one boolean compress, which yields the rows back to back.
+    """
+    n = len(power)
+    if not n:
+        return b""
+    if anomaly is None:
+        anomaly = high
+    with np.errstate(over="ignore"):
+        p32 = power.astype(np.float32)
+        e32 = efficiency.astype(np.float32)
+
+    ts, ts_mask = _gather(buf, ts_at, ts_len)
+    hh, hh_mask = _gather(buf, hh_at, hh_len)
+    has_p = p32.view(np.uint32) != 0
+    has_e = e32.view(np.uint32) != 0
+    status_len = np.where(high, 6, 4)
+    body_len = ts_len + hh_len + 5 * has_p + 5 * has_e + status_len + 2 * anomaly
+    size, size_len = _varint_matrix(body_len)
+
+    # slot layout: head(6) ts hh power(5) efficiency(5) status(6) anomaly(2)
+    a = 6
+    b = a + ts.shape[1]
+    c = b + hh.shape[1]
+    rows = np.empty((n, c + 18), np.uint8)
+    mask = np.empty((n, c + 18), bool)
+    rows[:, 0] = 0x0A
+    rows[:, 1:a] = size
+    mask[:, :2] = True
+    mask[:, 2:a] = np.arange(1, 5) < size_len[:, None]
+    rows[:, a:b], mask[:, a:b] = ts, ts_mask
+    rows[:, b:c], mask[:, b:c] = hh, hh_mask
+    for at, tag, values, present in ((c, 0x1D, p32, has_p), (c + 5, 0x25, e32, has_e)):
+        rows[:, at] = tag
+        rows[:, at + 1:at + 5] = values.view(np.uint8).reshape(-1, 4)
+        mask[:, at:at + 5] = present[:, None]
+    rows[:, c + 10:c + 16] = _STATUS_OK
+    rows[high, c + 10:c + 16] = _STATUS_HIGH
+    mask[:, c + 10:c + 14] = True
+    mask[:, c + 14:c + 16] = high[:, None]
+    rows[:, c + 16:] = (0x30, 0x01)
+    mask[:, c + 16:] = anomaly[:, None]
+    return rows[mask].tobytes()
+
+
+# ----- driver -----
+def _row_ends(raw, rows):
+    """(lengths, ends) where ends[i] is the offset in raw just past row i,
+    counting its field-1 tag and length prefix. ends is None unless raw is
+    nothing but the run of field-1 rows (the normal case)."""
+    lengths = np.fromiter(map(len, rows), np.int64, len(rows))
+    head = 2 + sum((lengths >= 1 << (7 * k)).astype(np.int64) for k in range(1, 5))
+    ends = np.cumsum(head + lengths)
+    if len(rows) and ends[-1] == len(raw):
+        return lengths, ends
+    return lengths, None
+
+
+def _frame(raw, rows):
+    """(buf, starts, ends) locating every serialized row.
+
+    Rows are addressed in place inside raw when possible; otherwise they are
+    joined into a fresh buffer.
+    """
+    lengths, ends = _row_ends(raw, rows)
+    if ends is not None:
+        buf = np.frombuffer(raw, np.uint8)
+    else:
+        buf = np.frombuffer(b"".join(rows), np.uint8)
+        ends = np.cumsum(lengths)
+    return buf, ends - lengths, ends
+
+
+def split_serialized(raw, shard_bytes):
+    """Cut a serialized AnalyzeRequest/GenerateResponse at row boundaries into
+    pieces of roughly shard_bytes, each a valid message of the same type.
+    Returns None when raw carries anything but rows and cannot be cut blindly."""
+    rows = energy_pb2.RawEnergyDataRows.FromString(raw).data
+    _, ends = _row_ends(raw, rows)
+    if ends is None:
+        return None
+    targets = np.arange(shard_bytes, len(raw), shard_bytes)
+    cuts = np.unique(ends[np.searchsorted(ends, targets)])
+    bounds = [0] + [int(c) for c in cuts if c < len(raw)] + [len(raw)]
+    view = memoryview(raw)
+    return [bytes(view[a:b]) for a, b in zip(bounds, bounds[1:])]
+
+
+def _string_payloads(buf, at, length, tag, name):
+    """(rows, payload at, payload length) of the string fields spanning
+    at/length (tag, size, payload) that are present."""
+    has = np.nonzero(length)[0]
+    if not len(has):
+        return has, has, has
+    if (buf[at[has]] != tag).any():
+        raise _Malformed(f"{name} with a non-canonical tag")
+    _, size = _read_varint(buf, at[has] + 1)
+    return has, at[has] + 1 + size, length[has] - 1 - size
+
+
+def _household_keys(buf, hh_at, hh_len):
+    """household_id of every row as an 'S' array (b"" where absent)."""
+    keys = np.zeros(len(hh_at), "S1")
+    has, at, length = _string_payloads(buf, hh_at, hh_len, 0x12, "household_id")
+    if len(has):
+        chars, inside = _gather(buf, at, length)
+        keys = np.zeros(len(hh_at), f"S{max(chars.shape[1], 1)}")
+        if chars.shape[1]:
+            keys[has] = np.where(inside, chars, 0).view(f"S{chars.shape[1]}").ravel()
+    return keys
+
+
+_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]  # YYYY-MM-DDTHH:MM:SS
+_MONTH_DAYS = np.array([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def _civil_ms(chars):
+    """Epoch ms of 'YYYY-MM-DDTHH:MM:SS' rows of a byte matrix (UTC), with
+    ok=False for rows that are not exactly that (left to NumPy's parser)."""
+    ok = ((chars[:, 4] == ord("-")) & (chars[:, 7] == ord("-")) & (chars[:, 10] == ord("T"))
+          & (chars[:, 13] == ord(":")) & (chars[:, 16] == ord(":")))
+    d = chars[:, _DIGITS].astype(np.int64) - ord("0")
+    ok &= ((d >= 0) & (d <= 9)).all(axis=1)
+    year = d[:, 0] * 1000 + d[:, 1] * 100 + d[:, 2] * 10 + d[:, 3]
+    month, day = d[:, 4] * 10 + d[:, 5], d[:, 6] * 10 + d[:, 7]
+    hour, minute, second = d[:, 8] * 10 + d[:, 9], d[:, 10] * 10 + d[:, 11], d[:, 12] * 10 + d[:, 13]
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    ok &= (month >= 1) & (month <= 12) & (hour < 24) & (minute < 60) & (second < 60) & (day >= 1)
+    ok &= day <= _MONTH_DAYS[np.where(ok, month, 0)] - ((month == 2) & ~leap)
+    # days from civil (proleptic Gregorian), shifted to a March-based year
+    y = year - (month <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    days = era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+    return ((days * 24 + hour) * 60 + minute) * 60000 + second * 1000, ok
+
+
+def _parse_timestamps(buf, ts_at, ts_len):
+    """timestamp of every row as int64 epoch ms, TIMESTAMP_UNSET where absent
+    or unparseable (as columnar.parse_timestamps)."""
+    out = np.full(len(ts_at), TIMESTAMP_UNSET)
+    has, at, length = _string_payloads(buf, ts_at, ts_len, 0x0A, "timestamp")
+    has, at, length = has[length > 0], at[length > 0], length[length > 0]
+    if not len(has):
+        return out
+    chars, inside = _gather(buf, at, length)
+    chars = np.where(inside, chars, 0)
+    # a trailing Z (UTC) is what NumPy's parser would warn about
+    row, last = np.arange(len(has)), length - 1
+    utc = chars[row, last] == ord("Z")
+    chars[row[utc], last[utc]] = 0
+    if chars.shape[1] >= 19:
+        # the generator's form, read from the digits
+        ms, ok = _civil_ms(chars)
+        ok &= length - utc == 19
+        out[has[ok]] = ms[ok]
+        has, at, length, chars = has[~ok], at[~ok], length[~ok], chars[~ok]
+        if not len(has):
+            return out
+    strings = chars.view(f"S{chars.shape[1]}").ravel()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            # through str: NumPy (2.x) crashes when a warning raised as an
+            # error interrupts a bytes -> datetime64 cast
+            out[has] = strings.astype(f"U{chars.shape[1]}").astype("datetime64[ms]").astype(np.int64)
+    except (ValueError, Warning):
+        # offsets, NULs or junk: the per-value rules of the columnar converter
+        text = [buf[a:a + n].tobytes().decode("utf-8", "replace") for a, n in zip(at.tolist(), length.tolist())]
+        out[has] = parse_timestamps(text)
+    return out
+
+
+def _analyze_block(buf, starts, ends, detector=None):
+    ts_at, ts_len, hh_at, hh_len, pw_at, pw_len = _locate_fields(buf, starts, ends)
+    power, valid = _parse_power(buf, pw_at, pw_len)
+    keep = np.nonzero(valid)[0]
+    efficiency, high = analyze_power(power[keep])
+    anomaly = None
+    if detector is not None:
+        anomaly = detector.update(_household_keys(buf, hh_at[keep], hh_len[keep]), power[keep])
+    body = encode_processed(
+        buf, ts_at[keep], ts_len[keep], hh_at[keep], hh_len[keep],
+        power[keep], efficiency, high, anomaly,
+    )
+    return body, len(keep), len(starts) - len(keep)
+
+
+def _columns_block(buf, starts, ends):
+    ts_at, ts_len, hh_at, hh_len, pw_at, pw_len = _locate_fields(buf, starts, ends)
+    power, valid = _parse_power(buf, pw_at, pw_len)
+    keep = np.nonzero(valid)[0]
+    keys = _household_keys(buf, hh_at[keep], hh_len[keep])
+    timestamp_ms = _parse_timestamps(buf, ts_at[keep], ts_len[keep])
+    return keys, timestamp_ms, power[keep], len(starts) - len(keep)
+
+
+def _columns_block_slow(rows):
+    keys, timestamps, readings = [], [], []
+    for raw in rows:
+        r = energy_pb2.RawEnergyData.FromString(raw)
+        try:
+            readings.append(float(r.power_consumption))
+        except ValueError:
+            continue
+        keys.append(r.household_id.encode())
+        timestamps.append(r.timestamp)
+    return (np.array(keys, dtype="S") if keys else np.zeros(0, "S1"), parse_timestamps(timestamps),
+            np.array(readings, np.float64), len(rows) - len(readings))
+
+
+def _analyze_block_slow(rows, detector=None):
+    """Row-by-row reference path, used only for rows the walker cannot frame."""
+    report = energy_pb2.ProcessedDataReport()
+    skipped = 0
+    keys, readings = [], []
+    for raw in rows:
+        r = energy_pb2.RawEnergyData.FromString(raw)
+        try:
+            power = float(r.power_consumption)
+        except ValueError:
+            skipped += 1
+            continue
+        efficiency = power / EFFICIENCY_DIVISOR
+        status = "OK" if efficiency < 1.0 else "HIGH"
+        report.processed.add(
+            timestamp=r.timestamp,
+            household_id=r.household_id,
+            power=power,
+            efficiency=efficiency,
+            status=status,
+            anomaly_detected=(status == "HIGH"),
+        )
+        keys.append(r.household_id.encode())
+        readings.append(power)
+    if detector is not None and keys:
+        for rec, anomaly in zip(report.processed, detector.update(keys, readings).tolist()):
+            rec.anomaly_detected = anomaly
+    return report.SerializeToString(), len(report.processed), skipped
+
+
+def analyze_serialized(raw, detector=None):
+    """Analyze a serialized AnalyzeRequest or GenerateResponse.
+
+    Returns (body, processed, skipped) where body is the serialized
+    `processed` entries of a ProcessedDataReport; callers add skipped_rows.
+    A detector, when given, sets anomaly_detected and is updated with the rows.
+    """
+    rows = energy_pb2.RawEnergyDataRows.FromString(raw).data
+    if not len(rows):
+        return b"", 0, 0
+    buf, starts, ends = _frame(raw, rows)
+    parts, processed, skipped = [], 0, 0
+    for lo in range(0, len(rows), BLOCK_ROWS):
+        hi = lo + BLOCK_ROWS
+        try:
+            body, n_ok, n_bad = _analyze_block(buf, starts[lo:hi], ends[lo:hi], detector)
+        except _Malformed:
+            body, n_ok, n_bad = _analyze_block_slow(rows[lo:hi], detector)
+        parts.append(body)
+        processed += n_ok
+        skipped += n_bad
+    return b"".join(parts), processed, skipped
+
+
+def columns_serialized(raw):
+    """Read a serialized AnalyzeRequest or GenerateResponse as columns, a
+    block at a time, without analyzing it.
+
+    Yields (household_id bytes, timestamp ms, power, skipped) per block for
+    the rows whose power parses (the rows analyze_serialized would keep).
+    """
+    rows = energy_pb2.RawEnergyDataRows.FromString(raw).data
+    if not len(rows):
+        return
+    buf, starts, ends = _frame(raw, rows)
+    for lo in range(0, len(rows), BLOCK_ROWS):
+        hi = lo + BLOCK_ROWS
+        try:
+            yield _columns_block(buf, starts[lo:hi], ends[lo:hi])
+        except _Malformed:
+            yield _columns_block_slow(rows[lo:hi])
+
+
+def analyze_message(msg, report=None, detector=None):
+    """Analyze the rows of an AnalyzeRequest/GenerateResponse into a ProcessedDataReport."""
+    body, _, skipped = analyze_serialized(msg.SerializeToString(), detector)
+    if report is None:
+        report = energy_pb2.ProcessedDataReport()
+    report.MergeFromString(body)
+    report.skipped_rows += skipped
+    return report
+
+
+def serialize_report(body, skipped):
+    """Complete a body from analyze_serialized into a serialized ProcessedDataReport."""
+    return body + energy_pb2.ProcessedDataReport(skipped_rows=skipped).SerializeToString()
@@ -0,0 +1,159 @@
+"""Multi-process sharded analysis for large batches.
+
+Payloads above a size threshold are cut into shards at row boundaries and
+analyzed by a persistent process pool, so throughput scales with cores
+instead of being capped by the GIL. Shards travel to the workers as
+serialized RawEnergyData bytes and come back as serialized
+ProcessedEnergyReport bytes, so no message objects are pickled; results are
+stitched back together in shard order. Anything below the threshold stays
+in-process.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent import futures
+
+import energy_pb2
+from src.energy_analyzer import aggregate, engine
+
+log = logging.getLogger(__name__)
+
+PROCESSES = int(os.getenv("ANALYZE_PROCESSES", str(os.cpu_count() or 1)))
+MIN_BYTES = int(os.getenv("ANALYZE_PARALLEL_MIN_BYTES", str(8 << 20)))
+SHARD_BYTES = int(os.getenv("ANALYZE_SHARD_BYTES", str(4 << 20)))
+
+
+def _warm():
+    return os.getpid()
+
+
+def _merge(results):
+    bodies, processed, skipped = [], 0, 0
+    for body, n_ok, n_bad in results:
+        bodies.append(body)
+        processed += n_ok
+        skipped += n_bad
+    return b"".join(bodies), processed, skipped
+
+
+class ShardedAnalyzer:
+    """Same contract as the engine's analyze_* functions, backed by a process pool.
+
+    processes <= 1 disables the pool entirely. So does a stateful anomaly
+    detector: its per-household state lives in this process and has to see
+    the rows in order.
+    """
+
+    def __init__(self, processes: int = PROCESSES, min_bytes: int = MIN_BYTES,
+                 shard_bytes: int = SHARD_BYTES, detector=None):
+        self.processes = processes
+        self.min_bytes = min_bytes
+        self.shard_bytes = shard_bytes
+        self.detector = detector
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.processes > 1 and self.detector is None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: forking a process that runs gRPC threads is unsafe
+                self._pool = futures.ProcessPoolExecutor(
+                    self.processes, mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def start(self) -> None:
+        """Start the workers now rather than on the first large request."""
+        if not self.enabled:
+            return
+        pool = self._get_pool()
+        for _ in range(self.processes):
+            pool.submit(_warm)
+        log.info("analysis pool: processes=%d min_bytes=%d shard_bytes=%d",
+                 self.processes, self.min_bytes, self.shard_bytes)
+
+    def warm_up(self, raw) -> None:
+        """Analyze raw once per worker and wait, so every worker has started
+        and imported the engine before the first request needs it."""
+        if not self.enabled:
+            return
+        pool = self._get_pool()
+        for result in [pool.submit(engine.analyze_serialized, raw) for _ in range(self.processes)]:
+            result.result()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def analyze_serialized(self, raw):
+        """engine.analyze_serialized, sharded across the pool when raw is large."""
+        if not self.enabled or len(raw) < self.min_bytes:
+            return engine.analyze_serialized(raw, self.detector)
+        shards = engine.split_serialized(raw, self.shard_bytes)
+        if not shards or len(shards) == 1:
+            return engine.analyze_serialized(raw)
+        return _merge(self._get_pool().map(engine.analyze_serialized, shards))
+
+    def analyze_message(self, msg, report=None):
+        """engine.analyze_message, sharded across the pool when msg is large."""
+        if not self.enabled or msg.ByteSize() < self.min_bytes:
+            return engine.analyze_message(msg, report, self.detector)
+        body, _, skipped = self.analyze_serialized(msg.SerializeToString())
+        if report is None:
+            report = energy_pb2.ProcessedDataReport()
+        report.MergeFromString(body)
+        report.skipped_rows += skipped
+        return report
+
+    def analyze_batch(self, batch):
+        """engine.analyze_batch with this analyzer's detector (columnar input is never sharded)."""
+        return engine.analyze_batch(batch, self.detector)
+
+    def aggregate(self, request):
+        """aggregate.aggregate with this analyzer's detector (never sharded)."""
+        return aggregate.aggregate(request, self.detector)
+
+    def map_serialized(self, records):
+        """(body, processed, skipped) for each serialized chunk, in input order.
+
+        Chunks are analyzed in-process until min_bytes of input has been seen;
+        past that they are fanned out to the pool with a bounded number in
+        flight, so memory stays flat however long the input is.
+        """
+        records = iter(records)
+        if not self.enabled:
+            for record in records:
+                yield engine.analyze_serialized(record, self.detector)
+            return
+
+        head, seen = [], 0
+        for record in records:
+            head.append(record)
+            seen += len(record)
+            if seen >= self.min_bytes:
+                break
+        else:
+            yield from map(engine.analyze_serialized, head)
+            return
+
+        pool = self._get_pool()
+        pending = deque()
+        for record in _chain(head, records):
+            pending.append(pool.submit(engine.analyze_serialized, bytes(record)))
+            if len(pending) >= 2 * self.processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _chain(head, rest):
+    yield from head
+    yield from rest
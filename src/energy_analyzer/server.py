@@ -1,12 +1,15 @@
 import os
-import time
+import functools
 import logging
 import grpc
-from concurrent import futures
-from pathlib import Path
 import energy_pb2, energy_pb2_grpc
-from grpc_health.v1 import health, health_pb2, health_pb2_grpc
-from src.common.grpc_logging import ServerLoggingInterceptor
+from src.common import fileref, serving
+from src.common.aio import offload
+from src.common.recordio import RecordWriter, open_records
+from src.energy_analyzer import aggregate, detector as anomaly, engine
+from src.energy_analyzer.cache import ResultCache, file_key, request_key
+from src.energy_analyzer.parallel import ShardedAnalyzer
+from src.energy_generator.profiles import LoadProfile
 
 from generated import energy_pipeline_pb2 as exec_pb2
 from generated import energy_pipeline_pb2_grpc as exec_pb2_grpc
@@ -22,113 +25,321 @@ log = logging.getLogger(__name__)
 SERVICE_NAME = "energy.EnergyAnalyzer"
 
 
+def _usable(cache, analyzer):
+    # results of the stateful detector depend on what it has seen before
+    if cache is None or not cache.enabled or analyzer.detector is not None:
+        return None
+    return cache
+
+
+def write_reports(analyzer, records, out):
+    """Analyze serialized raw chunks into report records on out; (processed, skipped)."""
+    processed = skipped = 0
+    for body, n_ok, n_bad in analyzer.map_serialized(records):
+        out.write(engine.serialize_report(body, n_bad))
+        processed += n_ok
+        skipped += n_bad
+    return processed, skipped
+
+
+def warm_up(analyzer, rows):
+    """Analyze `rows` synthetic rows in each input form, then start the pool.
+
+    A stateful detector is warmed with a fresh instance of its own, so the
+    synthetic households never reach the real one (or its snapshots).
+    """
+    profile = LoadProfile()
+    raw = profile.serialized(0, rows)
+    detector = None if analyzer.detector is None else anomaly.create()
+    engine.analyze_serialized(raw, detector)
+    engine.analyze_message(energy_pb2.AnalyzeRequest.FromString(raw), None, detector)
+    engine.analyze_batch(profile.batch(0, rows), detector)
+    aggregate.aggregate_serialized(raw, detector=detector)
+    aggregate.aggregate_batch(profile.batch(0, rows), detector=detector)
+    analyzer.warm_up(raw)
+
+
+def invalid_argument(context, e, response):
+    context.set_details(str(e))
+    context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+    return response
+
+
+def log_analyze(request, response):
+    if isinstance(response, bytes):
+        log.info("AnalyzeData: received=%d cached (%d bytes)", len(request.data), len(response))
+        return
+    log.info(
+        "AnalyzeData: received=%d processed=%d skipped=%d",
+        len(request.data), len(response.report.processed), response.report.skipped_rows,
+    )
+
+
+def log_aggregate(request, response):
+    log.info(
+        "AggregateData: received=%d buckets=%d households=%d window_ms=%d skipped=%d",
+        len(request.data) or len(request.batch.power_consumption), len(response.count),
+        len(response.household_ids), response.window_ms, response.skipped_rows,
+    )
+
+
 class EnergyAnalyzerServicer(energy_pb2_grpc.EnergyAnalyzerServicer):
+    def __init__(self, analyzer: ShardedAnalyzer = None, cache: ResultCache = None):
+        # large payloads are sharded across the process pool; small ones
+        # (and everything when ANALYZE_PROCESSES=1) stay in-process
+        self.analyzer = analyzer or ShardedAnalyzer(processes=1)
+        self.cache = _usable(cache, self.analyzer)
+
+    def respond(self, msg):
+        """The AnalyzeResponse for msg. With the result cache it is the
+        serialized response (bytes, sent as they are by AnalyzeData), looked
+        up by the serialized message or stored for the next identical one."""
+        if self.cache is None:
+            response = energy_pb2.AnalyzeResponse()
+            self.analyzer.analyze_message(msg, response.report)
+            return response
+        raw = msg.SerializeToString()
+        key = request_key("analyze", raw)
+        result = self.cache.get(key)
+        if result is None:
+            body, _, skipped = self.analyzer.analyze_serialized(raw)
+            # field 1 holding the report: the wire form of AnalyzeResponse(report=...)
+            result = energy_pb2.RawEnergyDataRows(data=[engine.serialize_report(body, skipped)]).SerializeToString()
+            self.cache.put(key, result)
+        return result
+
+    def analyze(self, msg, report):
+        """The analysis of msg merged into report, skipped rows added up (the
+        streaming RPCs, which parse a cached response to merge it)."""
+        if self.cache is None:
+            return self.analyzer.analyze_message(msg, report)
+        chunk = energy_pb2.AnalyzeResponse.FromString(self.respond(msg)).report
+        skipped = report.skipped_rows + chunk.skipped_rows
+        report.MergeFrom(chunk)
+        report.skipped_rows = skipped
+        return report
+
+    def analyze_file(self, request):
+        """AnalyzeFile: request.input analyzed a chunk at a time (pool-sharded
+        when large, as ContainerExecutor does) into a report record file."""
+        records = fileref.records(request.input)
+        with RecordWriter(fileref.output_path(request.output_file), checksum=True) as out:
+            processed, skipped = write_reports(self.analyzer, records, out)
+        if request.remove_input:
+            fileref.remove(request.input)
+        return energy_pb2.FileResponse(file=fileref.written(out), rows=processed, skipped_rows=skipped)
+
     def AnalyzeData(self, request, context):
-        processed, skipped = [], 0
-        for r in request.data:
-            try:
-                power = float(r.power_consumption)
-                efficiency = power / 150.0  # placeholder calculation
-                status = "OK" if efficiency < 1.0 else "HIGH"
-                processed.append(energy_pb2.ProcessedEnergyReport(
-                    timestamp=r.timestamp,
-                    household_id=r.household_id,
-                    power=power,
-                    efficiency=efficiency,
-                    status=status,
-                    anomaly_detected=(status == "HIGH"),
-                ))
-            except Exception:
-                skipped += 1
+        response = self.respond(request)
+        log_analyze(request, response)
+        return response
+
+    def AnalyzeDataStream(self, request_iterator, context):
+        # Each chunk is analyzed and released before the next one is read,
+        # so only the merged output grows with the input.
+        response = energy_pb2.AnalyzeResponse()
+        received = chunks = 0
+        for chunk in request_iterator:
+            self.analyze(chunk, response.report)
+            received += len(chunk.data)
+            chunks += 1
 
         log.info(
-            "AnalyzeData: received=%d processed=%d skipped=%d",
-            len(request.data), len(processed), skipped,
+            "AnalyzeDataStream: chunks=%d received=%d processed=%d skipped=%d",
+            chunks, received, len(response.report.processed), response.report.skipped_rows,
         )
+        return response
 
-        return energy_pb2.AnalyzeResponse(
-            report=energy_pb2.ProcessedDataReport(
-                processed=processed,
-                skipped_rows=skipped,
-            )
+    def AnalyzeDataChunks(self, request_iterator, context):
+        # Bounded memory: one chunk in, one chunk out.
+        received = processed_total = skipped_total = 0
+        for chunk in request_iterator:
+            response = energy_pb2.AnalyzeResponse()
+            report = self.analyze(chunk, response.report)
+            received += len(chunk.data)
+            processed_total += len(report.processed)
+            skipped_total += report.skipped_rows
+            yield response
+
+        log.info(
+            "AnalyzeDataChunks: received=%d processed=%d skipped=%d",
+            received, processed_total, skipped_total,
         )
 
 
+    def AnalyzeBatch(self, request, context):
+        batch = self.analyzer.analyze_batch(request)
+        log.info(
+            "AnalyzeBatch: processed=%d skipped=%d households=%d",
+            len(batch.power), batch.skipped_rows, len(batch.household_ids),
+        )
+        return batch
+
+    def AggregateData(self, request, context):
+        try:
+            response = self.analyzer.aggregate(request)
+        except ValueError as e:
+            return invalid_argument(context, e, energy_pb2.AggregateResponse())
+        log_aggregate(request, response)
+        return response
+
+    def AnalyzeFile(self, request, context):
+        try:
+            response = self.analyze_file(request)
+        except fileref.ERRORS as e:
+            return fileref.set_error(context, e, energy_pb2.FileResponse())
+
+        log.info("AnalyzeFile: %s -> %s processed=%d skipped=%d",
+                 request.input.path, response.file.path, response.rows, response.skipped_rows)
+        return response
+
+
 class ContainerExecutorServicer(exec_pb2_grpc.ContainerExecutorServicer):
+    def __init__(self, analyzer: ShardedAnalyzer = None, cache: ResultCache = None):
+        self.analyzer = analyzer or ShardedAnalyzer(processes=1)
+        self.cache = _usable(cache, self.analyzer)
+
+    def execute(self, request) -> str:
+        if self.cache is None:
+            return self._execute(request)
+        # keyed by the input file's content; a hit copies the stored output
+        key = file_key(request.input_file)
+        if self.cache.get_file(key, request.output_file):
+            return f"Analyzed {request.input_file} (cached result)"
+        message = self._execute(request)
+        self.cache.put_file(key, request.output_file)
+        return message
+
+    def _execute(self, request) -> str:
+        # Each GenerateResponse record is analyzed in serialized form (a
+        # view into the mapped input file) and written straight back as a
+        # report record; on large files the records are fanned out to the
+        # process pool, a bounded number at a time, and written in order.
+        with RecordWriter(request.output_file) as out:
+            processed, skipped = write_reports(self.analyzer, open_records(request.input_file), out)
+        return f"Analyzed {processed} rows (skipped {skipped})"
+
     def Execute(self, request, context):
         try:
-            raw_msg = energy_pb2.GenerateResponse()
-            with open(request.input_file, "rb") as f:
-                raw_msg.ParseFromString(f.read())
-
-            processed = []
-            skipped = 0
-            for r in raw_msg.data:
-                try:
-                    power = float(r.power_consumption)
-                    efficiency = power / 150.0
-                    status = "OK" if efficiency < 1.0 else "HIGH"
-                    processed.append(energy_pb2.ProcessedEnergyReport(
-                        timestamp=r.timestamp,
-                        household_id=r.household_id,
-                        power=power,
-                        efficiency=efficiency,
-                        status=status,
-                        anomaly_detected=(status == "HIGH")
-                    ))
-                except Exception:
-                    skipped += 1
-
-            report = energy_pb2.ProcessedDataReport(
-                processed=processed,
-                skipped_rows=skipped
-            )
-           
-            out_path = Path(request.output_file)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-
-            with out_path.open("wb") as f:
-             f.write(report.SerializeToString())
-
-
-            return exec_pb2.ExecuteResponse(
-                success=True,
-                message=f"Analyzed {len(processed)} rows (skipped {skipped})"
-            )
+            return exec_pb2.ExecuteResponse(success=True, message=self.execute(request))
         except Exception as e:
             context.set_details(str(e))
             context.set_code(grpc.StatusCode.INTERNAL)
             return exec_pb2.ExecuteResponse(success=False, message=str(e))
 
 
-def serve(port: int = 50052):
-    server = grpc.server(
-        futures.ThreadPoolExecutor(max_workers=4),
-        interceptors=[ServerLoggingInterceptor()],
-    )
+# ----- asyncio (grpc.aio) -----
+# Same RPCs without a thread per call: the event loop holds the calls and
+# streams, and every analysis step runs on the offload pool (and from there
+# on the process pool when the payload is large).
+class AsyncEnergyAnalyzerServicer(EnergyAnalyzerServicer):
+    async def AnalyzeData(self, request, context):
+        response = await offload(self.respond, request)
+        log_analyze(request, response)
+        return response
+
+    async def AnalyzeDataStream(self, request_iterator, context):
+        response = energy_pb2.AnalyzeResponse()
+        received = chunks = 0
+        async for chunk in request_iterator:
+            await offload(self.analyze, chunk, response.report)
+            received += len(chunk.data)
+            chunks += 1
+
+        log.info(
+            "AnalyzeDataStream: chunks=%d received=%d processed=%d skipped=%d",
+            chunks, received, len(response.report.processed), response.report.skipped_rows,
+        )
+        return response
+
+    async def AnalyzeDataChunks(self, request_iterator, context):
+        received = processed_total = skipped_total = 0
+        async for chunk in request_iterator:
+            response = energy_pb2.AnalyzeResponse()
+            report = await offload(self.analyze, chunk, response.report)
+            received += len(chunk.data)
+            processed_total += len(report.processed)
+            skipped_total += report.skipped_rows
+            yield response
 
-    energy_pb2_grpc.add_EnergyAnalyzerServicer_to_server(EnergyAnalyzerServicer(), server)
-        
-    # ContainerExecutor (from energy_pipeline.proto)
-    exec_pb2_grpc.add_ContainerExecutorServicer_to_server(ContainerExecutorServicer(), server)
+        log.info(
+            "AnalyzeDataChunks: received=%d processed=%d skipped=%d",
+            received, processed_total, skipped_total,
+        )
 
-    # health service
-    health_serv = health.HealthServicer()
-    health_pb2_grpc.add_HealthServicer_to_server(health_serv, server)
-    health_serv.set("", health_pb2.HealthCheckResponse.SERVING)
-    health_serv.set(SERVICE_NAME, health_pb2.HealthCheckResponse.SERVING)
+    async def AnalyzeBatch(self, request, context):
+        batch = await offload(self.analyzer.analyze_batch, request)
+        log.info(
+            "AnalyzeBatch: processed=%d skipped=%d households=%d",
+            len(batch.power), batch.skipped_rows, len(batch.household_ids),
+        )
+        return batch
 
-    server.add_insecure_port(f"[::]:{port}")
-    server.start()
-    log.info("gRPC listening on :%s", port)
+    async def AggregateData(self, request, context):
+        try:
+            response = await offload(self.analyzer.aggregate, request)
+        except ValueError as e:
+            return invalid_argument(context, e, energy_pb2.AggregateResponse())
+        log_aggregate(request, response)
+        return response
 
+    async def AnalyzeFile(self, request, context):
+        try:
+            response = await offload(self.analyze_file, request)
+        except fileref.ERRORS as e:
+            return fileref.set_error(context, e, energy_pb2.FileResponse())
+
+        log.info("AnalyzeFile: %s -> %s processed=%d skipped=%d",
+                 request.input.path, response.file.path, response.rows, response.skipped_rows)
+        return response
+
+
+class AsyncContainerExecutorServicer(ContainerExecutorServicer):
+    async def Execute(self, request, context):
+        try:
+            return exec_pb2.ExecuteResponse(success=True, message=await offload(self.execute, request))
+        except Exception as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INTERNAL)
+            return exec_pb2.ExecuteResponse(success=False, message=str(e))
+
+
+# ----- server -----
+# AnalyzeData answers a cache hit with the stored serialized response
+_add_analyzer = serving.raw_responses(energy_pb2_grpc.add_EnergyAnalyzerServicer_to_server, "AnalyzeData")
+
+
+def servicers(aio: bool = False, analyzer: ShardedAnalyzer = None, cache: ResultCache = None):
+    if aio:
+        return [
+            (_add_analyzer, AsyncEnergyAnalyzerServicer(analyzer, cache)),
+            (exec_pb2_grpc.add_ContainerExecutorServicer_to_server, AsyncContainerExecutorServicer(analyzer, cache)),
+        ]
+    return [
+        (_add_analyzer, EnergyAnalyzerServicer(analyzer, cache)),
+        # ContainerExecutor (from energy_pipeline.proto)
+        (exec_pb2_grpc.add_ContainerExecutorServicer_to_server, ContainerExecutorServicer(analyzer, cache)),
+    ]
+
+
+def serve(port: int = 50052):
+    detector = anomaly.create()
+    snapshots = None
+    if detector is not None:
+        snapshots = anomaly.Snapshotter(detector)
+        snapshots.start()
+    analyzer = ShardedAnalyzer(detector=detector)
+    analyzer.start()
+    cache = ResultCache()  # shared by both services and, in thread mode, all workers
     try:
-        while True:
-            time.sleep(86400)
-    except KeyboardInterrupt:
-        health_serv.set("", health_pb2.HealthCheckResponse.NOT_SERVING)
-        health_serv.set(SERVICE_NAME, health_pb2.HealthCheckResponse.NOT_SERVING)
-        server.stop(0)
+        serving.serve(SERVICE_NAME, functools.partial(servicers, analyzer=analyzer, cache=cache), port,
+                      functools.partial(warm_up, analyzer))
+    finally:
+        # after the drain, so in-flight batches still have their workers
+        # and the final snapshot includes them
+        analyzer.close()
+        if snapshots is not None:
+            snapshots.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,389 @@
+"""Chunked, parallel CSV ingestion for the generator's ContainerExecutor.
+
+The input is cut into byte ranges that end on line boundaries and every
+range is parsed on its own (in a worker process when the file is large), so
+a meter export is never held in memory as a whole and records are written as
+soon as the first range is done, in file order. Rows are encoded straight to
+serialized RawEnergyData with NumPy (profiles.encode_rows); only lines with
+quotes, non-ASCII bytes or a value of 128 bytes or more go through the csv
+module.
+
+A row is accepted when it has one field per header column, a timestamp and a
+household_id, and power_consumption (plus voltage and current, when the file
+has them) parse as numbers. Other lines are counted and copied unchanged to
+a quarantine CSV next to the output. A quoted field with a line break in it
+is not supported: the pieces of such a record are quarantined.
+"""
+import csv
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent import futures
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import energy_pb2
+from src.common.recordio import CHUNK_ROWS
+from src.energy_generator.profiles import encode_rows
+
+log = logging.getLogger(__name__)
+
+PROCESSES = int(os.getenv("GENERATE_INGEST_PROCESSES", str(os.cpu_count() or 1)))
+RANGE_BYTES = int(os.getenv("GENERATE_INGEST_RANGE_BYTES", str(8 << 20)))
+MIN_BYTES = int(os.getenv("GENERATE_INGEST_PARALLEL_MIN_BYTES", str(32 << 20)))
+
+FIELDS = ("timestamp", "household_id", "power_consumption", "voltage", "current")  # RawEnergyData order
+REQUIRED = ("timestamp", "household_id", "power_consumption")
+NUMERIC = ("power_consumption", "voltage", "current")
+DEFAULTS = {"voltage": "230", "current": "5"}  # for files without those columns
+
+_MAX_VALUE = 128     # longer values take the csv path (encode_rows needs one-byte lengths)
+_CAST_BLOCK = 1024   # granularity used to isolate values the vector cast rejects
+
+
+@dataclass(frozen=True)
+class CsvHeader:
+    columns: tuple
+    line: bytes = b""   # as in the file, for the quarantine file
+    end: int = 0        # offset of the first data line
+
+    def index(self, name):
+        return self.columns.index(name) if name in self.columns else None
+
+
+@dataclass
+class ParsedRange:
+    records: list = field(default_factory=list)  # serialized GenerateResponse chunks
+    rows: int = 0
+    quarantined: bytes = b""                      # rejected lines, each ending in a newline
+    bad: int = 0
+
+
+def read_header(path) -> CsvHeader:
+    with open(path, "rb") as f:
+        line = f.readline()
+    if not line.strip():
+        return CsvHeader(())
+    text = line.decode("utf-8-sig").rstrip("\r\n")
+    columns = tuple(c.strip() for c in next(csv.reader([text])))
+    missing = [c for c in REQUIRED if c not in columns]
+    if missing:
+        raise ValueError(f"{path}: CSV header has no {', '.join(missing)} column")
+    return CsvHeader(columns, line.rstrip(b"\r\n"), len(line))
+
+
+def ranges(path, header: CsvHeader, range_bytes: int = RANGE_BYTES):
+    """(start, stop) byte ranges covering the data lines, each ending after a newline (or at EOF)."""
+    size = os.path.getsize(path)
+    lo = header.end
+    with open(path, "rb") as f:
+        while lo < size:
+            hi = lo + range_bytes
+            if hi < size:
+                f.seek(hi - 1)
+                f.readline()
+                hi = f.tell()
+            else:
+                hi = size
+            yield lo, hi
+            lo = hi
+
+
+# ----- parsing -----
+def _numbers_ok(chars, length):
+    """Which left-aligned values (an (n, width) byte matrix) float() would accept."""
+    n, width = chars.shape
+    if not width:
+        return np.zeros(n, bool)
+    chars = np.where(np.arange(width) < length[:, None], chars, 0)  # 'S' strips the trailing NULs
+    strings = chars.view(f"S{width}").ravel()
+    ok = length > 0
+    try:
+        strings.astype(np.float64)
+        return ok
+    except ValueError:
+        pass
+    for s in range(0, n, _CAST_BLOCK):
+        try:
+            strings[s:s + _CAST_BLOCK].astype(np.float64)
+            continue
+        except ValueError:
+            pass
+        for i in range(s, min(s + _CAST_BLOCK, n)):
+            try:
+                float(strings[i])
+            except ValueError:
+                ok[i] = False
+    return ok
+
+
+def _slow_row(raw: bytes, header: CsvHeader):
+    """One line through the csv module -> serialized data entry, or None if it is malformed."""
+    try:
+        row = next(csv.reader([raw.decode("utf-8")], strict=True))
+    except (UnicodeDecodeError, csv.Error, StopIteration):
+        return None
+    if len(row) != len(header.columns):
+        return None
+    values = dict(zip(header.columns, row))
+    if not values["timestamp"] or not values["household_id"]:
+        return None
+    for name in NUMERIC:
+        if name in values:
+            try:
+                float(values[name])
+            except ValueError:
+                return None
+    data = energy_pb2.RawEnergyData(**{name: values.get(name, DEFAULTS.get(name, "")) for name in FIELDS})
+    return energy_pb2.GenerateResponse(data=[data]).SerializeToString()
+
+
+def parse_lines(data: bytes, header: CsvHeader, chunk_rows: int = CHUNK_ROWS) -> ParsedRange:
+    """Parse whole CSV data lines (no header) into records of up to chunk_rows rows."""
+    buf = np.frombuffer(data, np.uint8)
+    nl = np.flatnonzero(buf == 0x0A)
+    starts = np.r_[0, nl + 1]
+    ends = np.r_[nl, len(buf)]
+    cr = ends > starts
+    cr[cr] = buf[ends[cr] - 1] == 0x0D
+    ends = ends - cr
+    keep = ends > starts  # blank lines are skipped, as csv.reader does
+    starts, ends = starts[keep], ends[keep]
+    n, k = len(starts), len(header.columns)
+    if not n or not k:
+        return ParsedRange()
+
+    def line_of(pos):
+        return np.searchsorted(starts, pos, "right") - 1
+
+    # quotes, non-ASCII and NUL bytes need the csv module (and a UTF-8 check)
+    odd = np.zeros(n, bool)
+    odd[line_of(np.flatnonzero((buf == 0x22) | (buf >= 0x80) | (buf == 0)))] = True
+    commas = np.flatnonzero(buf == 0x2C)
+    comma_line = line_of(commas)
+    fast = ~odd & (np.bincount(comma_line, minlength=n) == k - 1)
+    accept = fast.copy()
+
+    # field spans of the fast lines: one row per line, one column per CSV column
+    lines = np.flatnonzero(fast)
+    cuts = commas[fast[comma_line]].reshape(-1, k - 1)
+    at = np.column_stack([starts[lines], cuts + 1])
+    length = np.column_stack([cuts, ends[lines]]) - at
+    padded = np.concatenate([buf, np.zeros(_MAX_VALUE, np.uint8)])
+
+    def chars(col, rows=slice(None)):
+        width = int(length[rows, col].max()) if len(length[rows]) else 0
+        if not width:
+            return np.zeros((len(at[rows]), 0), np.uint8)
+        return sliding_window_view(padded, width)[at[rows, col]]
+
+    fast_pos = np.cumsum(fast) - 1  # line -> row of at/length
+    long_value = (length >= _MAX_VALUE).any(axis=1)
+    odd[lines[long_value]] = True
+    fast[lines[long_value]] = False
+    ok = ~long_value
+    for name in REQUIRED[:2]:
+        ok &= length[:, header.index(name)] > 0
+    for name in NUMERIC:
+        col = header.index(name)
+        if col is not None and ok.any():
+            ok[ok] &= _numbers_ok(chars(col, ok), length[ok, col])
+    accept[lines] = ok
+
+    slow = {}
+    for i in np.flatnonzero(odd):
+        row = _slow_row(data[starts[i]:ends[i]], header)
+        if row is not None:
+            slow[int(i)] = row
+            accept[i] = True
+
+    out = ParsedRange()
+    bad = np.flatnonzero(~accept)
+    if len(bad):
+        out.bad = len(bad)
+        out.quarantined = b"".join(data[starts[i]:ends[i]] + b"\n" for i in bad)
+
+    accepted = np.flatnonzero(accept)
+    for s in range(0, len(accepted), chunk_rows):
+        block = accepted[s:s + chunk_rows]
+        rows = fast_pos[block[fast[block]]]
+        fields = []
+        for name in FIELDS:
+            col = header.index(name)
+            if col is None:
+                value = np.frombuffer(DEFAULTS[name].encode(), np.uint8)
+                fields.append((_tag(name), np.broadcast_to(value, (len(rows), len(value))),
+                               np.full(len(rows), len(value)), False))
+            else:
+                fields.append((_tag(name), chars(col, rows), length[rows, col], False))
+        encoded = encode_rows(fields) if len(rows) else b""
+        if len(rows) == len(block):
+            out.records.append(encoded)
+        else:
+            out.records.append(_interleave(encoded, fields, block, fast[block], slow))
+        out.rows += len(block)
+    return out
+
+
+def _tag(name):
+    return (FIELDS.index(name) + 1) << 3 | 2
+
+
+def _interleave(encoded, fields, block, is_fast, slow):
+    """Splice the csv-path rows into encode_rows output at their line positions."""
+    body = sum(2 + length for _, _, length, _ in fields)
+    ends = np.cumsum(np.where(body >= 128, 3, 2) + body)
+    parts, done = [], 0
+    for j in np.flatnonzero(~is_fast):
+        upto = int(np.count_nonzero(is_fast[:j]))
+        if upto > done:
+            parts.append(encoded[ends[done - 1] if done else 0:ends[upto - 1]])
+            done = upto
+        parts.append(slow[int(block[j])])
+    if done < len(ends):
+        parts.append(encoded[ends[done - 1] if done else 0:])
+    return b"".join(parts)
+
+
+def parse_range(path, start: int, stop: int, header: CsvHeader, chunk_rows: int = CHUNK_ROWS) -> ParsedRange:
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    return parse_lines(data, header, chunk_rows)
+
+
+# ----- quarantine -----
+def quarantine_path(output_file) -> Path:
+    """Where the rejected lines for output_file go: <output stem>.quarantine.csv."""
+    return Path(output_file).with_suffix(".quarantine.csv")
+
+
+class Quarantine:
+    """Rejected lines under the input's header, renamed into place on close.
+    Created only if something is rejected; a stale file from an earlier run
+    of the same output is removed."""
+
+    def __init__(self, path, header: CsvHeader):
+        self.path = Path(path)
+        self.header = header
+        self.rows = 0
+        self._tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        self._f = None
+
+    def write(self, lines: bytes, count: int) -> None:
+        if not count:
+            return
+        if self._f is None:
+            self._f = self._tmp.open("wb")
+            self._f.write(self.header.line + b"\n")
+        self._f.write(lines)
+        self.rows += count
+
+    def close(self) -> None:
+        if self._f is None:
+            self.path.unlink(missing_ok=True)
+        elif not self._f.closed:
+            self._f.close()
+            os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        if self._f is not None and not self._f.closed:
+            self._f.close()
+            self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# ----- ingestion -----
+def _warm():
+    return os.getpid()
+
+
+class CsvIngestor:
+    """Parses CSV inputs range by range, on a process pool for large files.
+
+    processes <= 1 keeps everything in-process, as do files smaller than
+    min_bytes.
+    """
+
+    def __init__(self, processes: int = PROCESSES, range_bytes: int = RANGE_BYTES,
+                 min_bytes: int = MIN_BYTES, chunk_rows: int = CHUNK_ROWS):
+        self.processes = processes
+        self.range_bytes = range_bytes
+        self.min_bytes = min_bytes
+        self.chunk_rows = chunk_rows
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.processes > 1
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: forking a process that runs gRPC threads is unsafe
+                self._pool = futures.ProcessPoolExecutor(
+                    self.processes, mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def start(self) -> None:
+        """Start the workers now rather than on the first large file."""
+        if not self.enabled:
+            return
+        pool = self._get_pool()
+        for _ in range(self.processes):
+            pool.submit(_warm)
+        log.info("ingest pool: processes=%d range_bytes=%d min_bytes=%d",
+                 self.processes, self.range_bytes, self.min_bytes)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def parse(self, path, header: CsvHeader):
+        """ParsedRange per byte range, in file order; on the pool a bounded
+        number of ranges are in flight, so memory stays flat."""
+        spans = ranges(path, header, self.range_bytes)
+        if not self.enabled or os.path.getsize(path) < self.min_bytes:
+            for start, stop in spans:
+                yield parse_range(path, start, stop, header, self.chunk_rows)
+            return
+        pool = self._get_pool()
+        pending = deque()
+        for start, stop in spans:
+            pending.append(pool.submit(parse_range, str(path), start, stop, header, self.chunk_rows))
+            if len(pending) >= 2 * self.processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def ingest(self, path, out, quarantine_file):
+        """Write the rows of CSV file path to the RecordWriter out and the
+        rejected lines to quarantine_file; returns (rows, rejected)."""
+        header = read_header(path)
+        rows = 0
+        with Quarantine(quarantine_file, header) as quarantine:
+            for parsed in self.parse(path, header):
+                for record in parsed.records:
+                    out.write(record)
+                rows += parsed.rows
+                quarantine.write(parsed.quarantined, parsed.bad)
+        if quarantine.rows:
+            log.warning("ingest %s: quarantined %d malformed rows to %s", path, quarantine.rows, quarantine_file)
+        return rows, quarantine.rows
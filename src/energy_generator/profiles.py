@@ -0,0 +1,363 @@
+"""Seeded, vectorized synthetic load profiles.
+
+Every household reports once per interval; row r is household r % households
+at start + (r // households) * interval. Power follows a daily curve (night
+base load, morning and evening peaks, a midday plateau; later mornings and
+more load at weekends) scaled per household, times Gaussian noise, with a
+fraction of readings replaced by spikes (the injected anomalies).
+
+Randomness is counter based: row r always consumes the same four draws of a
+Philox stream keyed by the seed, so the data is a pure function of (seed,
+options, r) and any range of rows can be produced on its own, in any chunk
+size, without generating the rows before it. Chunks come out as columns,
+as a RawEnergyBatch, or as serialized RawEnergyData rows encoded straight
+from the digit arrays (no per-row message objects or string formatting).
+"""
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent import futures
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+
+import energy_pb2
+
+DEFAULT_START_MS = 1735689600000  # 2025-01-01T00:00:00Z
+# timestamps are written with a four-digit year: 0000-01-01 up to (not including) 10000-01-01
+MIN_MS = -62167219200000
+MAX_MS = 253402300800000
+HOUSEHOLDS = int(os.getenv("GENERATE_HOUSEHOLDS", "100"))
+INTERVAL_MS = int(os.getenv("GENERATE_INTERVAL_MS", "60000"))
+NOISE = float(os.getenv("GENERATE_NOISE", "0.08"))   # relative sd of the per-reading noise
+# per-household parameters and ids are precomputed for every household
+MAX_HOUSEHOLDS = int(os.getenv("GENERATE_MAX_HOUSEHOLDS", "1000000"))
+CHUNK_ROWS = 65536
+
+_DAY_MS = 86_400_000
+_HOUR_MS = 3_600_000
+
+
+@dataclass(frozen=True)
+class ProfileChunk:
+    timestamp_ms: np.ndarray  # int64
+    household: np.ndarray     # uint32 index into LoadProfile.household_ids
+    power: np.ndarray         # float64, rounded to 0.01
+    voltage: np.ndarray       # float64, rounded to 0.01
+    current: np.ndarray       # float64, rounded to 0.001
+    anomaly: np.ndarray       # bool: an injected spike
+
+
+def _bump(hour, centre, width):
+    d = (hour - centre + 12.0) % 24.0 - 12.0  # periodic distance in hours
+    return np.exp(-0.5 * (d / width) ** 2)
+
+
+def daily_curve(hour, weekend):
+    """Relative load at fractional hour of day (about 0.5 at night, 1.6 at the evening peak)."""
+    morning = np.where(weekend, 0.45 * _bump(hour, 9.0, 1.6), 0.6 * _bump(hour, 7.25, 1.0))
+    midday = np.where(weekend, 0.35, 0.15) * _bump(hour, 13.0, 2.5)
+    evening = 1.0 * _bump(hour, 19.5, 1.8)
+    return 0.5 + morning + midday + evening
+
+
+@dataclass(frozen=True)
+class LoadProfile:
+    seed: int = 0
+    households: int = HOUSEHOLDS
+    start_ms: int = DEFAULT_START_MS
+    interval_ms: int = INTERVAL_MS
+    end_ms: int = 0               # exclusive; 0 = open ended
+    anomaly_rate: float = 0.0
+    noise: float = NOISE
+
+    @classmethod
+    def from_request(cls, request):
+        """Profile for a GenerateRequest; unset (zero) options take the defaults."""
+        return cls(
+            seed=request.seed,
+            households=request.households or HOUSEHOLDS,
+            start_ms=request.start_ms or DEFAULT_START_MS,
+            interval_ms=request.interval_ms or INTERVAL_MS,
+            end_ms=request.end_ms,
+            anomaly_rate=request.anomaly_rate,
+        )
+
+    def __post_init__(self):
+        if self.households <= 0 or self.interval_ms <= 0:
+            raise ValueError("households and interval_ms must be positive")
+        if self.households > MAX_HOUSEHOLDS:
+            raise ValueError(f"households must be at most {MAX_HOUSEHOLDS}")
+        if not 0.0 <= self.anomaly_rate <= 1.0:
+            raise ValueError("anomaly_rate must be between 0 and 1")
+        if self.end_ms and self.end_ms <= self.start_ms:
+            raise ValueError("end_ms must be after start_ms")
+        if not MIN_MS <= self.start_ms < MAX_MS or self.end_ms > MAX_MS:
+            raise ValueError("timestamps must fall in the years 0000-9999")
+
+    def rows(self, requested: int = 0) -> int:
+        """Rows to produce: requested, capped by the time range when it has an end
+        (requested 0 with an end means the whole range). ValueError when the
+        rows would run past the year 9999."""
+        if not self.end_ms:
+            if requested and self.start_ms + (requested - 1) // self.households * self.interval_ms >= MAX_MS:
+                raise ValueError("timestamps must fall in the years 0000-9999")
+            return requested
+        in_range = -(-(self.end_ms - self.start_ms) // self.interval_ms) * self.households
+        return min(requested, in_range) if requested else in_range
+
+    # ----- per household -----
+    @cached_property
+    def _household_params(self):
+        rng = np.random.Generator(np.random.Philox(key=[self.seed, 1]))
+        h = self.households
+        base = rng.lognormal(np.log(55.0), 0.35, h)      # night-time load
+        peak = rng.uniform(0.7, 1.5, h)                  # how much the peaks add on top
+        shift = rng.normal(0.0, 0.75, h)                 # hours earlier/later than the curve
+        weekend = rng.uniform(1.0, 1.25, h)              # weekend load factor
+        return base, peak, shift, weekend
+
+    @cached_property
+    def household_ids(self):
+        return [f"HH-{k}" for k in range(self.households)]
+
+    @cached_property
+    def _household_bytes(self):
+        ids = np.char.add(b"HH-", np.arange(self.households).astype("S"))
+        return ids, np.char.str_len(ids).astype(np.int64)
+
+    # ----- rows -----
+    @property
+    def _millis(self) -> bool:
+        """Whether timestamps carry ".mmm": decided by the profile, not by the
+        rows of a chunk, so every chunking gives the same text."""
+        return bool(self.start_ms % 1000 or self.interval_ms % 1000)
+
+    def columns(self, start: int, stop: int) -> ProfileChunk:
+        """Rows [start, stop) as columns."""
+        r = np.arange(start, stop, dtype=np.int64)
+        household = (r % self.households).astype(np.uint32)
+        ts = self.start_ms + (r // self.households) * self.interval_ms
+
+        bits = np.random.Philox(key=[self.seed, 0])
+        bits.advance(start)  # row r uses counter r: four doubles per row
+        u = np.random.Generator(bits).random((len(r), 4))
+
+        base, peak, shift, weekend_factor = self._household_params
+        hour = (ts % _DAY_MS) / _HOUR_MS + shift[household]
+        weekend = ((ts // _DAY_MS + 3) % 7) >= 5       # 1970-01-01 was a Thursday
+        curve = 0.5 + peak[household] * (daily_curve(hour, weekend) - 0.5)
+        load = base[household] * curve * np.where(weekend, weekend_factor[household], 1.0)
+
+        # Box-Muller on u0/u1 gives two independent normals (power and
+        # voltage noise); u2 picks the spikes and u3 sizes them
+        radius = np.sqrt(-2.0 * np.log1p(-u[:, 0]))
+        angle = 2.0 * np.pi * u[:, 1]
+        power = load * np.maximum(1.0 + self.noise * radius * np.cos(angle), 0.05)
+        anomaly = u[:, 2] < self.anomaly_rate
+        power[anomaly] *= 3.0 + 3.0 * u[anomaly, 3]
+
+        voltage = np.round(230.0 + 2.0 * radius * np.sin(angle), 2)
+        power = np.round(power, 2)
+        return ProfileChunk(ts, household, power, voltage, np.round(power / voltage, 3), anomaly)
+
+    def chunks(self, rows: int, chunk_rows: int = CHUNK_ROWS):
+        """(start, stop) ranges covering rows, for lazily producing any of the forms below."""
+        for start in range(0, rows, chunk_rows):
+            yield start, min(start + chunk_rows, rows)
+
+    def batch(self, start: int, stop: int):
+        """Rows [start, stop) as a RawEnergyBatch."""
+        c = self.columns(start, stop)
+        batch = energy_pb2.RawEnergyBatch()
+        h, n = self.households, stop - start
+        if n >= h:
+            table, index = self.household_ids, c.household
+        else:
+            # a short chunk covers a run of n consecutive households (mod h)
+            first = start % h
+            table = [self.household_ids[(first + k) % h] for k in range(n)]
+            index = np.arange(n, dtype=np.uint32)
+        batch.household_ids.extend(table)
+        batch.household.extend(index.tolist())
+        batch.timestamp_ms.extend(c.timestamp_ms.tolist())
+        batch.power_consumption.extend(c.power.tolist())
+        batch.voltage.extend(c.voltage.tolist())
+        batch.current.extend(c.current.tolist())
+        return batch
+
+    def serialized(self, start: int, stop: int) -> bytes:
+        """Rows [start, stop) as a serialized GenerateResponse / AnalyzeRequest."""
+        c = self.columns(start, stop)
+        hh, hh_len = self._household_bytes
+        idx = c.household
+        return encode_rows([
+            (0x0A, *_timestamp_chars(c.timestamp_ms, self._millis), False),
+            (0x12, _left(hh, idx), hh_len[idx], False),
+            (0x1A, *_decimal_chars(c.power, 2), True),
+            (0x22, *_decimal_chars(c.voltage, 2), True),
+            (0x2A, *_decimal_chars(c.current, 3), True),
+        ])
+
+    def response(self, start: int, stop: int):
+        return energy_pb2.GenerateResponse.FromString(self.serialized(start, stop))
+
+
+# ----- wire encoding -----
+def _left(table, idx):
+    """(n, width) byte matrix of table[idx], left aligned."""
+    width = max(table.dtype.itemsize, 1)
+    return np.ascontiguousarray(table[idx]).view(np.uint8).reshape(len(idx), width)
+
+
+def _digits(values, width):
+    """Right-aligned ASCII digits of non-negative int64 values in a (n, width) matrix."""
+    out = np.empty((len(values), width), np.uint8)
+    v = values.copy()
+    for k in range(width - 1, -1, -1):
+        v, d = np.divmod(v, 10)
+        out[:, k] = d
+    out += ord("0")
+    return out
+
+
+def _decimal_chars(values, decimals):
+    """Fixed-point strings of non-negative values ("123.45"), right aligned, plus lengths."""
+    scaled = np.rint(values * 10 ** decimals).astype(np.int64)
+    whole = scaled // 10 ** decimals
+    int_len = np.ones(len(values), np.int64)
+    w = 1
+    while (whole >= 10 ** w).any():
+        int_len += whole >= 10 ** w
+        w += 1
+    chars = np.empty((len(values), w + 1 + decimals), np.uint8)
+    chars[:, :w] = _digits(whole, w)
+    chars[:, w] = ord(".")
+    chars[:, w + 1:] = _digits(scaled % 10 ** decimals, decimals)
+    return chars, int_len + 1 + decimals
+
+
+def _timestamp_chars(ms, frac):
+    """ISO-8601 UTC strings, "2025-01-01T00:00:00Z" (with ".mmm" when frac)."""
+    days = ms // _DAY_MS
+    distinct, inverse = np.unique(days, return_inverse=True)
+    dates = np.datetime_as_string(distinct.astype("datetime64[D]")).astype("S10")
+    n = len(ms)
+    chars = np.empty((n, 24 if frac else 20), np.uint8)
+    chars[:, :10] = dates.view(np.uint8).reshape(-1, 10)[inverse.ravel()]
+    of_day = ms % _DAY_MS
+    secs = of_day // 1000
+    chars[:, 10] = ord("T")
+    chars[:, 11:13] = _digits(secs // 3600, 2)
+    chars[:, 13] = ord(":")
+    chars[:, 14:16] = _digits(secs // 60 % 60, 2)
+    chars[:, 16] = ord(":")
+    chars[:, 17:19] = _digits(secs % 60, 2)
+    if frac:
+        chars[:, 19] = ord(".")
+        chars[:, 20:23] = _digits(of_day % 1000, 3)
+    chars[:, -1] = ord("Z")
+    return chars, np.full(n, chars.shape[1], np.int64)
+
+
+def encode_rows(fields) -> bytes:
+    """Serialize rows of string fields as repeated field 1 (GenerateResponse.data).
+
+    fields: (tag byte, chars, lengths, right) per message field in field
+    order; chars is an (n, width) matrix holding each value left aligned, or
+    right aligned when right is true. Values must be shorter than 128 bytes.
+    Each row is laid out in fixed slots and the present bytes are pulled out
+    with one boolean compress.
+    """
+    n = len(fields[0][1])
+    if not n:
+        return b""
+    body = sum(2 + length for _, _, length, _ in fields)
+    if (body >= 1 << 14).any():
+        raise ValueError("row too long")
+    two = body >= 128
+    width = 3 + sum(2 + chars.shape[1] for _, chars, _, _ in fields)
+    rows = np.empty((n, width), np.uint8)
+    mask = np.zeros((n, width), bool)
+    rows[:, 0] = 0x0A
+    rows[:, 1] = np.where(two, (body & 0x7F) | 0x80, body)
+    rows[:, 2] = body >> 7
+    mask[:, :2] = True
+    mask[:, 2] = two
+    at = 3
+    for tag, chars, length, right in fields:
+        w = chars.shape[1]
+        rows[:, at] = tag
+        rows[:, at + 1] = length
+        rows[:, at + 2:at + 2 + w] = chars
+        mask[:, at:at + 2] = True
+        if int(length.min()) == w:
+            mask[:, at + 2:at + 2 + w] = True
+        else:
+            # one row of the pattern table per possible length (take is much
+            # faster than broadcasting a comparison over the whole block)
+            cols = np.arange(w)
+            table = (cols >= w - np.arange(w + 1)[:, None]) if right else (cols < np.arange(w + 1)[:, None])
+            mask[:, at + 2:at + 2 + w] = np.take(table, length, axis=0, out=np.empty((n, w), bool))
+        at += 2 + w
+    return rows[mask].tobytes()
+
+
+# ----- command line -----
+def _serialized(profile, bounds):
+    return profile.serialized(*bounds)
+
+
+def _produce(profile, rows, chunk_rows, processes):
+    """Serialized chunks in order; with processes > 1 they are built in a pool,
+    a bounded number ahead of the writer (chunks do not depend on each other)."""
+    if processes <= 1:
+        for start, stop in profile.chunks(rows, chunk_rows):
+            yield profile.serialized(start, stop)
+        return
+    pending = deque()
+    with futures.ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for bounds in profile.chunks(rows, chunk_rows):
+            pending.append(pool.submit(_serialized, profile, bounds))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(argv=None):
+    """Write a synthetic dataset as a record file of GenerateResponse chunks."""
+    import argparse
+    from src.common.recordio import RecordWriter
+
+    p = argparse.ArgumentParser(description=main.__doc__)
+    p.add_argument("output")
+    p.add_argument("--rows", type=int, default=0, help="rows to write (0 = the whole --end range)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--households", type=int, default=HOUSEHOLDS)
+    p.add_argument("--start-ms", type=int, default=DEFAULT_START_MS)
+    p.add_argument("--end-ms", type=int, default=0)
+    p.add_argument("--interval-ms", type=int, default=INTERVAL_MS)
+    p.add_argument("--anomaly-rate", type=float, default=0.0)
+    p.add_argument("--noise", type=float, default=NOISE)
+    p.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    p.add_argument("--processes", type=int, default=1, help="worker processes building chunks")
+    args = p.parse_args(argv)
+
+    profile = LoadProfile(
+        seed=args.seed, households=args.households, start_ms=args.start_ms, end_ms=args.end_ms,
+        interval_ms=args.interval_ms, anomaly_rate=args.anomaly_rate, noise=args.noise,
+    )
+    rows = profile.rows(args.rows)
+    t0 = time.perf_counter()
+    with RecordWriter(args.output) as out:
+        for chunk in _produce(profile, rows, args.chunk_rows, args.processes):
+            out.write(chunk)
+    elapsed = time.perf_counter() - t0
+    print(f"wrote {rows} rows to {args.output} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,14 @@
 import os
-import time
+import functools
 import logging
 import grpc
-from concurrent import futures
 from pathlib import Path
-import csv 
 import energy_pb2, energy_pb2_grpc
-from grpc_health.v1 import health, health_pb2, health_pb2_grpc
-from src.common.grpc_logging import ServerLoggingInterceptor
+from src.common import fileref, serving
+from src.common.aio import offload
+from src.common.recordio import RecordWriter
+from src.energy_generator.ingest import CsvIngestor, quarantine_path
+from src.energy_generator.profiles import LoadProfile
 
 
 from generated import energy_pipeline_pb2 as exec_pb2
@@ -24,104 +25,195 @@ log = logging.getLogger(__name__)
 
 SERVICE_NAME = "energy.EnergyGenerator"   # package.service from proto
 
+DEFAULT_CHUNK_SIZE = int(os.getenv("GENERATE_CHUNK_SIZE", "1000"))
+EXECUTOR_ROWS = int(os.getenv("GENERATE_EXECUTOR_ROWS", "10"))  # synthetic rows when there is no input file
+
+
+def plan(request):
+    """(profile, rows) for a GenerateRequest; ValueError for invalid options."""
+    if request.rows < 0 or request.chunk_size < 0:
+        raise ValueError("rows and chunk_size must not be negative")
+    profile = LoadProfile.from_request(request)
+    # 0 rows: the whole range when it has an end, else 10
+    return profile, profile.rows(request.rows or (0 if profile.end_ms else 10))
+
+
+def generate_file(request):
+    """GenerateFile: the rows of request.request as a record file at output_file."""
+    profile, rows = plan(request.request)
+    with RecordWriter(fileref.output_path(request.output_file), checksum=True) as out:
+        for start, stop in profile.chunks(rows):
+            out.write(profile.serialized(start, stop))
+    return energy_pb2.FileResponse(file=fileref.written(out), rows=rows)
+
+
+def warm_up(rows):
+    """Build `rows` synthetic rows in each output form the RPCs send."""
+    profile, rows = plan(energy_pb2.GenerateRequest(rows=rows))
+    profile.response(0, rows)
+    profile.batch(0, rows)
+    for start, stop in profile.chunks(rows, DEFAULT_CHUNK_SIZE):
+        profile.response(start, stop)
+
+
+def invalid_argument(context, e, response):
+    context.set_details(str(e))
+    context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+    return response
+
 
 class EnergyGeneratorServicer(energy_pb2_grpc.EnergyGeneratorServicer):
     def GenerateData(self, request, context):
-        rows = request.rows or 10
-        log.info("GenerateData: rows=%d", rows)
-        data = []
-        # placeholder generator
-        for i in range(rows):
-            data.append(energy_pb2.RawEnergyData(
-                timestamp=f"2025-01-01T00:00:{i:02d}Z",
-                household_id=f"HH-{i%3}",
-                power_consumption=str(120 + i),
-                voltage="230",
-                current="5",
-            ))
-        return energy_pb2.GenerateResponse(data=data)
+        try:
+            profile, rows = plan(request)
+        except ValueError as e:
+            return invalid_argument(context, e, energy_pb2.GenerateResponse())
+        log.info("GenerateData: rows=%d households=%d seed=%d", rows, profile.households, profile.seed)
+        return profile.response(0, rows)
+
+    def GenerateDataStream(self, request, context):
+        try:
+            profile, rows = plan(request)
+        except ValueError as e:
+            invalid_argument(context, e, None)
+            return
+        chunk = request.chunk_size or DEFAULT_CHUNK_SIZE
+        log.info("GenerateDataStream: rows=%d chunk_size=%d households=%d seed=%d",
+                 rows, chunk, profile.households, profile.seed)
+        # Only one chunk is alive at a time; the rest are produced on demand.
+        for start, stop in profile.chunks(rows, chunk):
+            if not context.is_active():
+                log.info("GenerateDataStream: client went away at row %d", start)
+                return
+            yield profile.response(start, stop)
+
+    def GenerateBatch(self, request, context):
+        try:
+            profile, rows = plan(request)
+        except ValueError as e:
+            return invalid_argument(context, e, energy_pb2.RawEnergyBatch())
+        log.info("GenerateBatch: rows=%d households=%d seed=%d", rows, profile.households, profile.seed)
+        return profile.batch(0, rows)
+
+    def GenerateFile(self, request, context):
+        try:
+            response = generate_file(request)
+        except ValueError as e:  # includes fileref.FileRefError
+            return invalid_argument(context, e, energy_pb2.FileResponse())
+        log.info("GenerateFile: rows=%d wrote %s", response.rows, response.file.path)
+        return response
+
 
 class ContainerExecutorServicer(exec_pb2_grpc.ContainerExecutorServicer):
-    def Execute(self, request, context):
+    def __init__(self, ingestor: CsvIngestor = None):
+        # large CSV inputs are parsed by range on the process pool
+        self.ingestor = ingestor or CsvIngestor(processes=1)
+
+    def execute(self, request) -> str:
         """
         Reads request.input_file (a CSV) or generates synthetic records,
-        writes a GenerateResponse to request.output_file,
-        and returns a success/failure message.
+        writes them to request.output_file as a record file of
+        GenerateResponse chunks, and returns the success message.
+        Malformed CSV rows go to <output stem>.quarantine.csv.
         """
-        try:
-            # Determine number of rows from CSV 
-            records = []
+        total = bad = 0
+        quarantine = quarantine_path(request.output_file)
+        # RecordWriter creates the /app/data (or /data) folder if needed
+        with RecordWriter(request.output_file) as out:
             if request.input_file and Path(request.input_file).exists():
-                with open(request.input_file, "r", encoding="utf-8") as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        records.append(energy_pb2.RawEnergyData(
-                            timestamp=row["timestamp"],
-                            household_id=row["household_id"],
-                            power_consumption=row["power_consumption"],
-                            voltage=row.get("voltage", "230"),
-                            current=row.get("current", "5"),
-                        ))
+                total, bad = self.ingestor.ingest(request.input_file, out, quarantine)
             else:
                 # Fall back to synthetic data if no input file
-                for i in range(10):
-                    records.append(energy_pb2.RawEnergyData(
-                        timestamp=f"2025-01-01T00:00:{i:02d}Z",
-                        household_id=f"HH-{i%3}",
-                        power_consumption=str(120 + i),
-                        voltage="230",
-                        current="5",
-                    ))
-
-            # Pack into a GenerateResponse and write to output_file
-
-            gen_resp = energy_pb2.GenerateResponse(data=records)
-
-            # ensure the /app/data (or /data) folder exists inside the container
-            out_path = Path(request.output_file)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-
-            with out_path.open("wb") as f:
-                f.write(gen_resp.SerializeToString())
-            
-
-            return exec_pb2.ExecuteResponse(
-                success=True,
-                message=f"Wrote {len(records)} raw records to {request.output_file}"
-            )
+                profile = LoadProfile()
+                for start, stop in profile.chunks(EXECUTOR_ROWS):
+                    out.write(profile.serialized(start, stop))
+                    total += stop - start
+        if bad:
+            return f"Wrote {total} raw records to {request.output_file} (quarantined {bad} rows to {quarantine})"
+        return f"Wrote {total} raw records to {request.output_file}"
+
+    def Execute(self, request, context):
+        try:
+            return exec_pb2.ExecuteResponse(success=True, message=self.execute(request))
         except Exception as e:
             context.set_details(str(e))
             context.set_code(grpc.StatusCode.INTERNAL)
             return exec_pb2.ExecuteResponse(success=False, message=str(e))
 
-def serve(port: int = 50051):
-    server = grpc.server(
-        futures.ThreadPoolExecutor(max_workers=4),
-        interceptors=[ServerLoggingInterceptor()],
-    )
-
-    # register real service
-    energy_pb2_grpc.add_EnergyGeneratorServicer_to_server(EnergyGeneratorServicer(), server)
-    # ContainerExecutor (from energy_pipeline.proto)
-    exec_pb2_grpc.add_ContainerExecutorServicer_to_server(ContainerExecutorServicer(), server)
-
-    # register health service
-    health_serv = health.HealthServicer()
-    health_pb2_grpc.add_HealthServicer_to_server(health_serv, server)
-    health_serv.set("", health_pb2.HealthCheckResponse.SERVING)
-    health_serv.set(SERVICE_NAME, health_pb2.HealthCheckResponse.SERVING)
-
-    server.add_insecure_port(f"[::]:{port}")
-    server.start()
-    log.info("gRPC listening on :%s", port)
 
+# ----- asyncio (grpc.aio) -----
+# Same RPCs without a thread per call: the event loop holds the calls and
+# streams, and row building / file I/O runs on the offload pool.
+class AsyncEnergyGeneratorServicer(energy_pb2_grpc.EnergyGeneratorServicer):
+    async def GenerateData(self, request, context):
+        try:
+            profile, rows = plan(request)
+        except ValueError as e:
+            return invalid_argument(context, e, energy_pb2.GenerateResponse())
+        log.info("GenerateData: rows=%d households=%d seed=%d", rows, profile.households, profile.seed)
+        return await offload(profile.response, 0, rows)
+
+    async def GenerateDataStream(self, request, context):
+        try:
+            profile, rows = plan(request)
+        except ValueError as e:
+            invalid_argument(context, e, None)
+            return
+        chunk = request.chunk_size or DEFAULT_CHUNK_SIZE
+        log.info("GenerateDataStream: rows=%d chunk_size=%d households=%d seed=%d",
+                 rows, chunk, profile.households, profile.seed)
+        # a client that goes away cancels this generator at the next await
+        for start, stop in profile.chunks(rows, chunk):
+            yield await offload(profile.response, start, stop)
+
+    async def GenerateBatch(self, request, context):
+        try:
+            profile, rows = plan(request)
+        except ValueError as e:
+            return invalid_argument(context, e, energy_pb2.RawEnergyBatch())
+        log.info("GenerateBatch: rows=%d households=%d seed=%d", rows, profile.households, profile.seed)
+        return await offload(profile.batch, 0, rows)
+
+    async def GenerateFile(self, request, context):
+        try:
+            response = await offload(generate_file, request)
+        except ValueError as e:
+            return invalid_argument(context, e, energy_pb2.FileResponse())
+        log.info("GenerateFile: rows=%d wrote %s", response.rows, response.file.path)
+        return response
+
+
+class AsyncContainerExecutorServicer(ContainerExecutorServicer):
+    async def Execute(self, request, context):
+        try:
+            return exec_pb2.ExecuteResponse(success=True, message=await offload(self.execute, request))
+        except Exception as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INTERNAL)
+            return exec_pb2.ExecuteResponse(success=False, message=str(e))
+
+
+# ----- server -----
+def servicers(aio: bool = False, ingestor: CsvIngestor = None):
+    if aio:
+        return [
+            (energy_pb2_grpc.add_EnergyGeneratorServicer_to_server, AsyncEnergyGeneratorServicer()),
+            (exec_pb2_grpc.add_ContainerExecutorServicer_to_server, AsyncContainerExecutorServicer(ingestor)),
+        ]
+    return [
+        (energy_pb2_grpc.add_EnergyGeneratorServicer_to_server, EnergyGeneratorServicer()),
+        # ContainerExecutor (from energy_pipeline.proto)
+        (exec_pb2_grpc.add_ContainerExecutorServicer_to_server, ContainerExecutorServicer(ingestor)),
+    ]
+
+
+def serve(port: int = 50051):
+    ingestor = CsvIngestor()
+    ingestor.start()
     try:
-        while True:
-            time.sleep(86400)
-    except KeyboardInterrupt:
-        health_serv.set("", health_pb2.HealthCheckResponse.NOT_SERVING)
-        health_serv.set(SERVICE_NAME, health_pb2.HealthCheckResponse.NOT_SERVING)
-        server.stop(0)
+        serving.serve(SERVICE_NAME, functools.partial(servicers, ingestor=ingestor), port, warm_up)
+    finally:
+        ingestor.close()
 
 
 if __name__ == "__main__":
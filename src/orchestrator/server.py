@@ -0,0 +1,265 @@
+"""Pipeline orchestrator: generate -> analyze -> report with the stages overlapping.
+
+RunPipeline splits a run into chunks of request.chunk_size rows and keeps all
+three services busy at once instead of running each stage over the whole
+batch in turn:
+
+- generate: the generator's GenerateDataStream, read ahead by gRPC within its
+  flow-control window;
+- analyze: AnalyzeData per chunk, `in_flight` calls at a time, so the
+  analyzer works on several chunks while the next ones are generated;
+- report: one GenerateReportStream call that writes chunks as they arrive,
+  fed in order from a queue of `in_flight` chunks.
+
+When a later stage falls behind, the bounded queue and the in-flight limit
+stop the earlier ones, so memory holds a few chunks however long the run is
+and the end-to-end time approaches that of the slowest stage. Chunks are
+read as the message the next stage takes (a GenerateResponse is an
+AnalyzeRequest, an AnalyzeResponse a ReportRequest on the wire) and so pass
+through without being copied. Progress is streamed at most every
+ORCHESTRATOR_PROGRESS_INTERVAL_S; the last message carries the report.
+"""
+import os
+import asyncio
+import functools
+import logging
+import queue
+import time
+from collections import deque
+from concurrent import futures
+from contextlib import closing
+import grpc
+import energy_pb2, energy_pb2_grpc
+from src.common import serving
+from src.common.aio import offload
+from src.common.client import PipelineClient
+
+# ----- logging -----
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    force=True,
+)
+log = logging.getLogger(__name__)
+
+SERVICE_NAME = "energy.PipelineOrchestrator"
+
+CHUNK_ROWS = int(os.getenv("ORCHESTRATOR_CHUNK_ROWS", "10000"))
+IN_FLIGHT = int(os.getenv("ORCHESTRATOR_IN_FLIGHT", "4"))
+PROGRESS_INTERVAL_S = float(os.getenv("ORCHESTRATOR_PROGRESS_INTERVAL_S", "0.5"))
+RUN_DEADLINE_S = float(os.getenv("ORCHESTRATOR_RUN_DEADLINE_S", "3600"))  # when the caller sets none
+
+_END = object()
+
+
+class StageFailed(Exception):
+    """An upstream call failed; carries its status, details prefixed with the stage."""
+
+    def __init__(self, stage: str, error: grpc.RpcError):
+        self.code = error.code()
+        self.details = f"{stage}: {error.details()}"
+        super().__init__(self.details)
+
+
+# ----- stages -----
+def _chunks(client, request, options):
+    """GenerateDataStream, each chunk read as the AnalyzeRequest it is on the wire."""
+    call = client.pools["generator"].get().unary_stream(
+        "/energy.EnergyGenerator/GenerateDataStream",
+        request_serializer=energy_pb2.GenerateRequest.SerializeToString,
+        response_deserializer=energy_pb2.AnalyzeRequest.FromString,
+    )(request, **options)
+    try:
+        yield from call
+    except grpc.RpcError as e:
+        raise StageFailed("generator", e) from None
+    finally:
+        call.cancel()  # no-op once the stream has ended
+
+
+def _analyze(client, chunk, options):
+    """AnalyzeData for one chunk, the response read as a ReportRequest."""
+    call = client.pools["analyzer"].get().unary_unary(
+        "/energy.EnergyAnalyzer/AnalyzeData",
+        request_serializer=energy_pb2.AnalyzeRequest.SerializeToString,
+        response_deserializer=energy_pb2.ReportRequest.FromString,
+    )
+    try:
+        return call(chunk, **options)
+    except grpc.RpcError as e:
+        raise StageFailed("analyzer", e) from None
+
+
+def _put(q, item, reporter):
+    """q.put that gives up when the report call has already ended."""
+    while True:
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            if reporter.done():
+                _report_result(reporter)
+                raise RuntimeError("reporter finished before the last chunk")
+
+
+def _end(q):
+    """Unblock the reporter's request thread after a failure: drop what is
+    queued and end the stream."""
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            break
+    q.put_nowait(_END)
+
+
+def _report_result(reporter):
+    try:
+        return reporter.result()
+    except grpc.RpcError as e:
+        raise StageFailed("reporter", e) from None
+
+
+def _snapshot(progress):
+    copy = energy_pb2.PipelineProgress()
+    copy.CopyFrom(progress)
+    return copy
+
+
+def run_pipeline(client: PipelineClient, request: energy_pb2.PipelineRequest, timeout: float = None,
+                 in_flight: int = IN_FLIGHT, interval_s: float = PROGRESS_INTERVAL_S):
+    """Yield PipelineProgress for one pipelined run; StageFailed if a service fails.
+
+    Closing the generator early cancels the upstream calls.
+    """
+    in_flight = max(1, request.in_flight or in_flight)
+    generate = energy_pb2.GenerateRequest()
+    generate.CopyFrom(request.request)
+    generate.chunk_size = generate.chunk_size or CHUNK_ROWS
+    options = client.call_options(timeout)
+    progress = energy_pb2.PipelineProgress(rows=generate.rows)
+    t0 = last = time.perf_counter()
+
+    to_report = queue.Queue(maxsize=in_flight)
+    reporter = client.reporter().GenerateReportStream.future(iter(to_report.get, _END), **options)
+    chunks = _chunks(client, generate, options)
+    done = False
+
+    def hand_over(chunk):
+        # every chunk names the format; the reporter reads it from the first
+        chunk.format = request.format
+        chunk.store = request.store
+        report = chunk.report
+        progress.analyzed_rows += len(report.processed) + report.skipped_rows
+        progress.skipped_rows += report.skipped_rows
+        _put(to_report, chunk, reporter)
+        progress.reported_rows += len(report.processed)
+        progress.chunks += 1
+
+    try:
+        with futures.ThreadPoolExecutor(in_flight, thread_name_prefix="orchestrator") as pool:
+            pending = deque()
+            for chunk in chunks:
+                progress.generated_rows += len(chunk.data)
+                pending.append(pool.submit(_analyze, client, chunk, options))
+                # in order; wait for the oldest once `in_flight` are out
+                while pending and (len(pending) >= in_flight or pending[0].done()):
+                    hand_over(pending.popleft().result())
+                if time.perf_counter() - last >= interval_s:
+                    last = time.perf_counter()
+                    progress.elapsed_s = last - t0
+                    yield _snapshot(progress)
+            while pending:
+                hand_over(pending.popleft().result())
+        if not progress.chunks:
+            _put(to_report, energy_pb2.ReportRequest(format=request.format, store=request.store), reporter)
+        _put(to_report, _END, reporter)
+        progress.report.CopyFrom(_report_result(reporter))
+        progress.done = done = True
+        progress.elapsed_s = time.perf_counter() - t0
+        yield _snapshot(progress)
+    finally:
+        if not done:
+            chunks.close()
+            reporter.cancel()
+            _end(to_report)
+
+
+def run_timeout(context) -> float:
+    """Seconds left of the caller's deadline for the upstream calls, or
+    RUN_DEADLINE_S if it set none (thread mode then reports ~2**63 s, aio None)."""
+    remaining = context.time_remaining()
+    if remaining is None or remaining > 1e9:
+        return RUN_DEADLINE_S
+    return remaining
+
+
+class PipelineOrchestratorServicer(energy_pb2_grpc.PipelineOrchestratorServicer):
+    def __init__(self, client: PipelineClient = None):
+        self.client = client or PipelineClient(wait_for_ready=True)
+
+    def RunPipeline(self, request, context):
+        progress = None
+        try:
+            with closing(run_pipeline(self.client, request, run_timeout(context))) as run:
+                for progress in run:
+                    yield progress
+        except StageFailed as e:
+            context.set_details(e.details)
+            context.set_code(e.code)
+            return
+
+        log.info("RunPipeline: rows=%d chunks=%d skipped=%d in %.2fs -> %s",
+                 progress.generated_rows, progress.chunks, progress.skipped_rows,
+                 progress.elapsed_s, progress.report.path)
+
+
+# ----- asyncio (grpc.aio) -----
+# The run blocks on its upstream calls, so it is stepped on the offload pool;
+# the event loop only relays progress.
+class AsyncPipelineOrchestratorServicer(PipelineOrchestratorServicer):
+    async def RunPipeline(self, request, context):
+        run = run_pipeline(self.client, request, run_timeout(context))
+        progress = step = None
+        try:
+            while True:
+                step = asyncio.ensure_future(offload(next, run, None))
+                # shielded: a cancelled call must not leave the step running
+                # while the run is closed below
+                item = await asyncio.shield(step)
+                if item is None:
+                    break
+                progress = item
+                yield progress
+        except StageFailed as e:
+            context.set_details(e.details)
+            context.set_code(e.code)
+            return
+        finally:
+            if step is not None and not step.done():
+                await asyncio.wait([step])
+            await offload(run.close)
+
+        log.info("RunPipeline: rows=%d chunks=%d skipped=%d in %.2fs -> %s",
+                 progress.generated_rows, progress.chunks, progress.skipped_rows,
+                 progress.elapsed_s, progress.report.path)
+
+
+# ----- server -----
+def servicers(aio: bool = False, client: PipelineClient = None):
+    if aio:
+        return [(energy_pb2_grpc.add_PipelineOrchestratorServicer_to_server, AsyncPipelineOrchestratorServicer(client))]
+    return [(energy_pb2_grpc.add_PipelineOrchestratorServicer_to_server, PipelineOrchestratorServicer(client))]
+
+
+def serve(port: int = 50054):
+    # one set of pooled channels to the stages (GENERATOR_ADDR / *_SOCKET ...)
+    client = PipelineClient(wait_for_ready=True)
+    try:
+        serving.serve(SERVICE_NAME, functools.partial(servicers, client=client), port)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    serve()
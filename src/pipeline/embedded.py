@@ -0,0 +1,105 @@
+"""Generate -> analyze -> report in one process, without gRPC.
+
+EmbeddedPipeline calls the same functions the three services run behind
+their RPCs (the generator's plan/profile, the analyzer's ShardedAnalyzer and
+the reporter's generate_report / generate_batch_report). A GenerateRequest
+therefore yields the same report as the gRPC chain, without three hops and
+the serialize/parse round trip at each of them.
+
+Row mode hands the analyzer serialized RawEnergyData chunks straight from the
+generator (the form it parses anyway) and merges the results into the
+ProcessedDataReport of a ReportRequest, so raw rows never become message
+objects. Columnar mode passes the RawEnergyBatch and ProcessedEnergyBatch
+objects from stage to stage.
+"""
+import time
+from dataclasses import dataclass, field
+
+import energy_pb2
+from src.energy_analyzer import detector as anomaly
+from src.energy_analyzer.parallel import ShardedAnalyzer
+from src.energy_generator import server as generator
+from src.report_generator import server as reporter
+
+
+@dataclass
+class PipelineResult:
+    rows: int
+    processed: int
+    skipped: int
+    response: energy_pb2.ReportResponse
+    seconds: dict = field(default_factory=dict)  # per stage
+
+    @property
+    def path(self) -> str:
+        return self.response.path
+
+
+class EmbeddedPipeline:
+    """The three stages in this process. The analyzer is set up as the
+    analyzer service sets it up (process pool, ANOMALY_DETECTOR with its
+    snapshots) unless one is passed in; close() releases it."""
+
+    def __init__(self, analyzer: ShardedAnalyzer = None):
+        self._snapshots = None
+        if analyzer is None:
+            detector = anomaly.create()
+            if detector is not None:
+                self._snapshots = anomaly.Snapshotter(detector)
+                self._snapshots.start()
+            analyzer = ShardedAnalyzer(detector=detector)
+        self.analyzer = analyzer
+
+    def close(self) -> None:
+        self.analyzer.close()
+        if self._snapshots is not None:
+            self._snapshots.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, request: energy_pb2.GenerateRequest, fmt: int = energy_pb2.REPORT_FORMAT_CSV,
+            store: bool = False, columnar: bool = False) -> PipelineResult:
+        """One pipeline run; ValueError for invalid GenerateRequest options,
+        ReportFormatError for an unusable format."""
+        profile, rows = generator.plan(request)
+        if columnar:
+            return self._run_columnar(profile, rows, fmt, store)
+        return self._run_rows(profile, rows, fmt, store)
+
+    def _run_rows(self, profile, rows, fmt, store):
+        seconds = dict.fromkeys(("generate", "analyze", "report"), 0.0)
+        request = energy_pb2.ReportRequest(format=fmt, store=store)
+        report = request.report
+        processed = 0
+        for start, stop in profile.chunks(rows):
+            t0 = time.perf_counter()
+            raw = profile.serialized(start, stop)
+            t1 = time.perf_counter()
+            body, n_ok, n_bad = self.analyzer.analyze_serialized(raw)
+            report.MergeFromString(body)
+            report.skipped_rows += n_bad
+            processed += n_ok
+            t2 = time.perf_counter()
+            seconds["generate"] += t1 - t0
+            seconds["analyze"] += t2 - t1
+
+        t0 = time.perf_counter()
+        response = reporter.generate_report(request)
+        seconds["report"] = time.perf_counter() - t0
+        return PipelineResult(rows, processed, report.skipped_rows, response, seconds)
+
+    def _run_columnar(self, profile, rows, fmt, store):
+        t0 = time.perf_counter()
+        raw = profile.batch(0, rows)
+        t1 = time.perf_counter()
+        batch = self.analyzer.analyze_batch(raw)
+        t2 = time.perf_counter()
+        request = energy_pb2.BatchReportRequest(batch=batch, format=fmt, store=store)
+        response = reporter.generate_batch_report(request)
+        t3 = time.perf_counter()
+        seconds = {"generate": t1 - t0, "analyze": t2 - t1, "report": t3 - t2}
+        return PipelineResult(rows, len(batch.power), batch.skipped_rows, response, seconds)
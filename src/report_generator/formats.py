@@ -0,0 +1,374 @@
+"""Columnar report writers: fast CSV, Parquet, Arrow IPC and the HTML summary.
+
+Reports are handled as ReportColumns (one array per output column, household
+IDs and statuses dictionary encoded) built either from ProcessedDataReport
+rows or straight from a ProcessedEnergyBatch, and written a chunk at a time
+so record files of any size stream through in constant memory.
+
+Parquet and Arrow need pyarrow, which is optional: without it those formats
+raise ReportFormatError and everything else keeps working. It is imported
+when the first such report is written, not at start-up (about 50 ms). In
+both, the timestamp column is a real timestamp[ms, UTC] (timestamps that do
+not parse become null) and household_id / status are dictionary columns.
+"""
+import os
+from operator import attrgetter
+from pathlib import Path
+
+import numpy as np
+
+import energy_pb2
+from src.common.columnar import (
+    TIMESTAMP_UNSET, column, dictionary_decode, dictionary_encode, format_timestamps, parse_timestamps,
+)
+from src.report_generator.summary import HtmlSummaryWriter
+
+pa = pq = None  # pyarrow and pyarrow.parquet once load_pyarrow() found them
+_pyarrow_tried = False
+
+CSV = energy_pb2.REPORT_FORMAT_CSV
+CSV_COLUMNAR = energy_pb2.REPORT_FORMAT_CSV_COLUMNAR
+PARQUET = energy_pb2.REPORT_FORMAT_PARQUET
+ARROW = energy_pb2.REPORT_FORMAT_ARROW
+HTML = energy_pb2.REPORT_FORMAT_HTML
+
+SUFFIXES = {CSV: ".csv", CSV_COLUMNAR: ".csv", PARQUET: ".parquet", ARROW: ".arrow", HTML: ".html"}
+
+PARQUET_COMPRESSION = os.getenv("REPORT_PARQUET_COMPRESSION", "zstd")
+ARROW_COMPRESSION = os.getenv("REPORT_ARROW_COMPRESSION", "none")
+ROW_GROUP_ROWS = int(os.getenv("REPORT_ROW_GROUP_ROWS", "131072"))
+CSV_WRITER = os.getenv("REPORT_CSV_WRITER", "rows")  # "columnar" switches executor .csv output
+CHUNK_ROWS = 65536
+
+CSV_HEADER = ["timestamp", "household_id", "power",
+              "efficiency", "status", "anomaly_detected"]
+
+
+class ReportFormatError(ValueError):
+    """The requested report format is unknown or not available here."""
+
+
+def suffix(fmt) -> str:
+    try:
+        return SUFFIXES[fmt]
+    except KeyError:
+        raise ReportFormatError(f"unknown report format {fmt}") from None
+
+
+def format_for_path(path):
+    """Executor output format chosen by file extension."""
+    ext = Path(path).suffix.lower()
+    if ext in (".parquet", ".pq"):
+        return PARQUET
+    if ext in (".arrow", ".feather", ".ipc"):
+        return ARROW
+    if ext in (".html", ".htm"):
+        return HTML
+    return CSV_COLUMNAR if CSV_WRITER == "columnar" else CSV
+
+
+# ----- columns -----
+_ROW_FIELDS = attrgetter("timestamp", "household_id", "power", "efficiency", "status", "anomaly_detected")
+
+
+class ReportColumns:
+    """One chunk of a report as columns."""
+
+    def __init__(self, households, household, statuses, status, power, efficiency, anomaly,
+                 timestamps=None, timestamp_ms=None):
+        self.households = households     # distinct household IDs
+        self.household = household       # uint32 index per row
+        self.statuses = statuses
+        self.status = status
+        self.power = power               # float32
+        self.efficiency = efficiency     # float32
+        self.anomaly = anomaly           # bool
+        self._timestamps = timestamps    # strings, as received
+        self._timestamp_ms = timestamp_ms
+
+    def __len__(self):
+        return len(self.power)
+
+    @classmethod
+    def from_report(cls, report):
+        return cls.from_rows(report.processed)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """From a sequence of ProcessedEnergyReport."""
+        if not rows:
+            return cls([], np.zeros(0, np.uint32), [], np.zeros(0, np.uint32),
+                       np.zeros(0, np.float32), np.zeros(0, np.float32), np.zeros(0, bool),
+                       timestamps=[])
+        # one pass over the rows (each access to a repeated message field
+        # builds a wrapper object), then transpose
+        ts, hh, power, efficiency, st, anomaly = zip(*map(_ROW_FIELDS, rows))
+        households, household = dictionary_encode(hh)
+        statuses, status = dictionary_encode(st)
+        return cls(
+            households, household, statuses, status,
+            np.array(power, np.float32), np.array(efficiency, np.float32), np.array(anomaly, bool),
+            timestamps=list(ts),
+        )
+
+    @classmethod
+    def from_batch(cls, batch):
+        return cls(
+            list(batch.household_ids), column(batch.household, np.uint32),
+            list(batch.statuses), column(batch.status, np.uint32),
+            column(batch.power, np.float32),
+            column(batch.efficiency, np.float32),
+            column(batch.anomaly_detected, bool),
+            timestamp_ms=column(batch.timestamp_ms, np.int64),
+        )
+
+    def timestamps(self):
+        if self._timestamps is None:
+            self._timestamps = format_timestamps(self._timestamp_ms)
+        return self._timestamps
+
+    def timestamp_ms(self):
+        if self._timestamp_ms is None:
+            self._timestamp_ms = parse_timestamps(self._timestamps)
+        return self._timestamp_ms
+
+    def take(self, indices):
+        """The rows at indices (dictionary tables are shared, not pruned)."""
+        timestamps = None
+        if self._timestamps is not None:
+            if not isinstance(self._timestamps, np.ndarray):
+                self._timestamps = np.asarray(self._timestamps, dtype=object)
+            timestamps = self._timestamps[indices].tolist()
+        return ReportColumns(
+            self.households, self.household[indices], self.statuses, self.status[indices],
+            self.power[indices], self.efficiency[indices], self.anomaly[indices],
+            timestamps=timestamps,
+            timestamp_ms=None if self._timestamp_ms is None else self._timestamp_ms[indices],
+        )
+
+    def to_report(self):
+        """The rows as a ProcessedDataReport."""
+        report = energy_pb2.ProcessedDataReport()
+        for t, h, p, e, s, a in zip(
+            self.timestamps(), dictionary_decode(self.households, self.household),
+            self.power.tolist(), self.efficiency.tolist(),
+            dictionary_decode(self.statuses, self.status), self.anomaly.tolist(),
+        ):
+            report.processed.add(timestamp=t, household_id=h, power=p, efficiency=e, status=s, anomaly_detected=a)
+        return report
+
+
+def report_chunks(report, rows: int = CHUNK_ROWS):
+    """ReportColumns for consecutive slices of one report, so a huge report
+    never has all of its per-row temporaries alive at once."""
+    processed = report.processed
+    for start in range(0, len(processed), rows):
+        yield ReportColumns.from_rows(processed[start:start + rows])
+
+
+# ----- CSV -----
+_CSV_SPECIAL = (",", '"', "\r", "\n")
+
+
+def _csv_field(value: str) -> str:
+    if any(c in value for c in _CSV_SPECIAL):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _csv_strings(values):
+    # one scan of the joined column decides whether any value needs quoting
+    joined = "\x00".join(values)
+    if any(c in joined for c in _CSV_SPECIAL):
+        return [_csv_field(v) for v in values]
+    return values
+
+
+def _float_strings(values):
+    # float32 -> shortest string is the slow part and readings repeat a lot,
+    # so each distinct value is formatted once when that pays off
+    distinct, inverse = np.unique(values, return_inverse=True)
+    if 2 * len(distinct) > len(values):
+        return values.astype(str).tolist()
+    return distinct.astype(str)[inverse].tolist()
+
+
+def _decode(table, indices):
+    if not len(indices):
+        return []
+    return np.asarray([_csv_field(v) for v in table], dtype=object)[indices].tolist()
+
+
+class ColumnarCsvWriter:
+    """Same columns and dialect as the csv.writer report, built a whole column at a time.
+
+    Floats are printed in the shortest form that round-trips their float32
+    value ("0.03", not "0.029999999329447746").
+    """
+
+    def __init__(self, path):
+        self._f = Path(path).open("w", newline="")
+        self._f.write(",".join(CSV_HEADER) + "\r\n")
+
+    def write(self, cols: ReportColumns) -> None:
+        if not len(cols):
+            return
+        fields = (
+            _csv_strings(cols.timestamps()),
+            _decode(cols.households, cols.household),
+            _float_strings(cols.power),
+            _float_strings(cols.efficiency),
+            _decode(cols.statuses, cols.status),
+            np.where(cols.anomaly, "True", "False").tolist(),
+        )
+        self._f.write("\r\n".join(map(",".join, zip(*fields))))
+        self._f.write("\r\n")
+
+    def tell(self) -> int:
+        """Byte offset at which the next row will start."""
+        return self._f.tell()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+# ----- Arrow / Parquet -----
+def load_pyarrow() -> bool:
+    """Import pyarrow on first use; False if it is not installed."""
+    global pa, pq, _pyarrow_tried
+    if not _pyarrow_tried:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+            pa, pq = pyarrow, pyarrow.parquet
+        except ImportError:  # optional: only the Parquet / Arrow formats need it
+            pass
+        _pyarrow_tried = True
+    return pa is not None
+
+
+def _require_pyarrow(fmt_name):
+    if not load_pyarrow():
+        raise ReportFormatError(f"{fmt_name} reports need pyarrow, which is not installed")
+
+
+def arrow_schema():
+    return pa.schema([
+        ("timestamp", pa.timestamp("ms", tz="UTC")),
+        ("household_id", pa.dictionary(pa.int32(), pa.string())),
+        ("power", pa.float32()),
+        ("efficiency", pa.float32()),
+        ("status", pa.dictionary(pa.int32(), pa.string())),
+        ("anomaly_detected", pa.bool_()),
+    ])
+
+
+class _Dictionary:
+    """Stream-wide dictionary: each chunk's local codes are remapped onto one
+    growing table, so every batch of a file shares (a prefix of) it."""
+
+    def __init__(self):
+        self.codes = {}
+
+    def remap(self, table, indices):
+        local = np.fromiter((self.codes.setdefault(v, len(self.codes)) for v in table),
+                            np.int32, len(table))
+        values = pa.array(list(self.codes), pa.string())
+        return pa.DictionaryArray.from_arrays(local[indices] if len(indices) else np.zeros(0, np.int32), values)
+
+
+class _ArrowTables:
+    def __init__(self):
+        self.schema = arrow_schema()
+        self._households = _Dictionary()
+        self._statuses = _Dictionary()
+
+    def batch(self, cols: ReportColumns):
+        ms = cols.timestamp_ms()
+        return pa.record_batch([
+            pa.array(ms, pa.int64(), mask=ms == TIMESTAMP_UNSET).cast(self.schema.field("timestamp").type),
+            self._households.remap(cols.households, cols.household),
+            pa.array(cols.power, pa.float32()),
+            pa.array(cols.efficiency, pa.float32()),
+            self._statuses.remap(cols.statuses, cols.status),
+            pa.array(cols.anomaly, pa.bool_()),
+        ], schema=self.schema)
+
+
+class ParquetWriter:
+    """Buffers chunks into row groups of row_group_rows and compresses them."""
+
+    def __init__(self, path, row_group_rows: int = ROW_GROUP_ROWS, compression: str = PARQUET_COMPRESSION):
+        _require_pyarrow("Parquet")
+        self._tables = _ArrowTables()
+        self._writer = pq.ParquetWriter(str(path), self._tables.schema, compression=compression)
+        self._row_group_rows = row_group_rows
+        self._pending, self._rows = [], 0
+
+    def write(self, cols: ReportColumns) -> None:
+        if not len(cols):
+            return
+        self._pending.append(self._tables.batch(cols))
+        self._rows += len(cols)
+        if self._rows >= self._row_group_rows:
+            self._flush()
+
+    def _flush(self, final=False):
+        # write whole row groups; a partial one waits for more rows unless final
+        if not self._pending:
+            return
+        table = pa.Table.from_batches(self._pending, self._tables.schema)
+        full = len(table) if final else len(table) - len(table) % self._row_group_rows
+        if full:
+            self._writer.write_table(table.slice(0, full), row_group_size=self._row_group_rows)
+        rest = table.slice(full)
+        self._pending, self._rows = rest.to_batches(), len(rest)
+
+    def close(self) -> None:
+        self._flush(final=True)
+        self._writer.close()
+
+
+class ArrowWriter:
+    """Arrow IPC file, one record batch per chunk."""
+
+    def __init__(self, path, compression: str = ARROW_COMPRESSION):
+        _require_pyarrow("Arrow")
+        self._tables = _ArrowTables()
+        options = pa.ipc.IpcWriteOptions(
+            compression=None if compression == "none" else compression,
+            emit_dictionary_deltas=True,
+        )
+        self._writer = pa.ipc.new_file(str(path), self._tables.schema, options=options)
+
+    def write(self, cols: ReportColumns) -> None:
+        if len(cols):
+            self._writer.write_batch(self._tables.batch(cols))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+_WRITERS = {
+    CSV_COLUMNAR: ColumnarCsvWriter, PARQUET: ParquetWriter, ARROW: ArrowWriter,
+    HTML: HtmlSummaryWriter,
+}
+
+
+def open_writer(path, fmt):
+    """A writer with write(ReportColumns) / close() for a columnar format."""
+    if fmt not in _WRITERS:
+        raise ReportFormatError(f"no columnar writer for report format {fmt}")
+    return _WRITERS[fmt](path)
+
+
+def write_report(path, fmt, chunks) -> None:
+    """Write an iterable of ReportColumns to path in a columnar format."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = open_writer(path, fmt)
+    try:
+        for cols in chunks:
+            writer.write(cols)
+    finally:
+        writer.close()
@@ -0,0 +1,212 @@
+"""Sidecar block index of report store parts.
+
+Every part gets a small index file next to it, written by the same call:
+
+    part-<ns>-<pid>-<rand>.csv
+    part-<ns>-<pid>-<rand>.csv.idx
+
+It lists the part's blocks of up to BLOCK_ROWS consecutive rows: first row,
+row count, byte range (CSV parts; -1 otherwise) and the smallest and largest
+timestamp in the block. A part holds one household and one day (its
+partition), so a query goes household -> partition directory -> parts ->
+blocks and reads only the blocks whose time range overlaps it: their bytes
+in a CSV part, their record batches / row groups in Arrow and Parquet parts.
+
+The index is an .npy array of DTYPE (48 bytes a block). It is renamed into
+place before its part, so every visible part has one; parts written before
+there were indexes are scanned whole instead.
+"""
+import csv
+import io
+import os
+from pathlib import Path
+
+import numpy as np
+
+from src.common.columnar import TIMESTAMP_UNSET, dictionary_encode
+from src.report_generator import formats
+from src.report_generator.formats import ReportColumns, ReportFormatError
+
+SUFFIX = ".idx"
+BLOCK_ROWS = int(os.getenv("REPORT_INDEX_BLOCK_ROWS", "1024"))
+
+DTYPE = np.dtype([
+    ("row", "<i8"), ("rows", "<i8"),      # rows [row, row + rows) of the part
+    ("offset", "<i8"), ("end", "<i8"),    # their bytes in a CSV part, else -1
+    ("min_ms", "<i8"), ("max_ms", "<i8"),
+])
+
+_NO_TIME = (np.iinfo(np.int64).max, TIMESTAMP_UNSET)  # (min, max) of a block without timestamps
+
+
+def sidecar(part) -> Path:
+    return Path(part).with_name(Path(part).name + SUFFIX)
+
+
+def time_range(ms):
+    ms = ms[ms != TIMESTAMP_UNSET]
+    return (int(ms.min()), int(ms.max())) if len(ms) else _NO_TIME
+
+
+def coalesce(blocks, rows: int = BLOCK_ROWS):
+    """Adjacent blocks merged while they stay within `rows` rows (many small
+    writes to a partition, or compacted parts, would otherwise leave many
+    small blocks)."""
+    out = []
+    for block in blocks.tolist():
+        if out and out[-1][1] + block[1] <= rows:
+            row, n, offset, _, low, high = out[-1]
+            out[-1] = (row, n + block[1], offset, block[3], min(low, block[4]), max(high, block[5]))
+        else:
+            out.append(block)
+    return np.array(out, DTYPE)
+
+
+def shift(blocks, rows: int, offset: int = 0):
+    """blocks of a part that starts `rows` rows (and `offset` bytes) into a merged part."""
+    blocks = blocks.copy()
+    blocks["row"] += rows
+    if offset:
+        blocks["offset"] += offset
+        blocks["end"] += offset
+    return blocks
+
+
+def overlapping(blocks, start_ms: int, end_ms: int):
+    """The blocks holding a timestamp in [start_ms, end_ms)."""
+    return blocks[(blocks["max_ms"] >= start_ms) & (blocks["min_ms"] < end_ms)]
+
+
+# ----- writing -----
+class IndexedWriter:
+    """A formats writer that records the block index of what it writes."""
+
+    def __init__(self, writer):
+        self._writer = writer
+        self._tell = getattr(writer, "tell", None)  # CSV: byte offsets
+        self._blocks = []
+        self.rows = 0
+
+    def write(self, cols: ReportColumns) -> None:
+        for start in range(0, len(cols), BLOCK_ROWS):
+            block = cols if len(cols) <= BLOCK_ROWS else cols.take(np.arange(start, min(start + BLOCK_ROWS, len(cols))))
+            offset = self._tell() if self._tell else -1
+            self._writer.write(block)
+            end = self._tell() if self._tell else -1
+            self._blocks.append((self.rows, len(block), offset, end, *time_range(block.timestamp_ms())))
+            self.rows += len(block)
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def blocks(self):
+        return coalesce(np.array(self._blocks, DTYPE))
+
+
+def save(path, blocks) -> None:
+    with open(path, "wb") as f:
+        np.save(f, blocks)
+
+
+def load(part):
+    """The block index of a part (scanned when it has no sidecar)."""
+    try:
+        with open(sidecar(part), "rb") as f:
+            return np.load(f)
+    except FileNotFoundError:
+        return scan(part)
+
+
+def scan(part):
+    """Index of a part without a sidecar, built by reading it: one block."""
+    part = Path(part)
+    whole = np.array([(0, -1, -1, -1) + _NO_TIME], DTYPE)
+    if part.suffix == ".csv":
+        with open(part, "rb") as f:
+            whole["offset"] = len(f.readline())
+            whole["end"] = f.seek(0, os.SEEK_END)
+    cols = list(read(part, whole))
+    rows = sum(map(len, cols))
+    if not rows:
+        return np.zeros(0, DTYPE)
+    ms = np.concatenate([c.timestamp_ms() for c in cols])
+    whole["rows"] = rows
+    whole["min_ms"], whole["max_ms"] = time_range(ms)
+    return whole
+
+
+# ----- reading -----
+def read(part, blocks):
+    """ReportColumns of each of the part's blocks, in order. rows == -1
+    reads to the end (scan())."""
+    readers = {".csv": _read_csv, ".arrow": _read_arrow, ".parquet": _read_parquet}
+    return readers[Path(part).suffix](part, blocks)
+
+
+def _read_csv(part, blocks):
+    with open(part, "rb") as f:
+        for block in blocks:
+            f.seek(block["offset"])
+            yield _csv_columns(f.read(block["end"] - block["offset"]))
+
+
+def _csv_columns(data: bytes):
+    # the same default text encoding the ColumnarCsvWriter wrote with
+    rows = list(csv.reader(io.TextIOWrapper(io.BytesIO(data), newline="")))
+    if not rows:
+        return ReportColumns.from_rows([])
+    ts, hh, power, efficiency, st, anomaly = zip(*rows)
+    households, household = dictionary_encode(hh)
+    statuses, status = dictionary_encode(st)
+    return ReportColumns(
+        households, household, statuses, status,
+        np.array(power, np.float32), np.array(efficiency, np.float32), np.array(anomaly) == "True",
+        timestamps=list(ts),
+    )
+
+
+def _require_pyarrow():
+    if not formats.load_pyarrow():
+        raise ReportFormatError("reading Parquet and Arrow parts needs pyarrow, which is not installed")
+
+
+def _arrow_columns(table):
+    pa = formats.pa
+    households, household = dictionary_encode(table.column("household_id").to_pylist())
+    statuses, status = dictionary_encode(table.column("status").to_pylist())
+    ms = table.column("timestamp").cast(pa.int64()).fill_null(TIMESTAMP_UNSET)
+    return ReportColumns(
+        households, household, statuses, status,
+        table.column("power").to_numpy(), table.column("efficiency").to_numpy(),
+        table.column("anomaly_detected").to_numpy(),
+        timestamp_ms=ms.to_numpy(),
+    )
+
+
+def _slice(table, block, first_row=0):
+    length = None if block["rows"] < 0 else int(block["rows"])
+    return table.slice(int(block["row"]) - first_row, length)
+
+
+def _read_arrow(part, blocks):
+    _require_pyarrow()
+    pa = formats.pa
+    # memory mapped: slicing touches only the record batches of the block
+    with pa.memory_map(str(part)) as source:
+        table = pa.ipc.open_file(source).read_all()
+        for block in blocks:
+            yield _arrow_columns(_slice(table, block))
+
+
+def _read_parquet(part, blocks):
+    _require_pyarrow()
+    f = formats.pq.ParquetFile(str(part))
+    meta = f.metadata
+    starts = np.cumsum([0] + [meta.row_group(i).num_rows for i in range(meta.num_row_groups)])
+    groups = table = None
+    for block in blocks:
+        stop = starts[-1] if block["rows"] < 0 else block["row"] + block["rows"]
+        wanted = (int(np.searchsorted(starts, block["row"], "right")) - 1, int(np.searchsorted(starts, stop)))
+        if wanted != groups:  # neighbouring blocks usually share a row group
+            groups, table = wanted, f.read_row_groups(range(*wanted))
+        yield _arrow_columns(_slice(table, block, int(starts[groups[0]])))
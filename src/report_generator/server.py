@@ -1,13 +1,23 @@
 import os
-import time
+import asyncio
 import csv
 import logging
+import tempfile
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from itertools import chain
 from pathlib import Path
 import grpc
-from concurrent import futures
 import energy_pb2, energy_pb2_grpc
-from grpc_health.v1 import health, health_pb2, health_pb2_grpc
-from src.common.grpc_logging import ServerLoggingInterceptor
+from src.common import fileref, serving
+from src.common.aio import blocking_iter, offload
+from src.common.columnar import processed_columns
+from src.common.recordio import read_messages
+from src.report_generator import formats
+from src.report_generator.formats import CSV_HEADER, ReportColumns, ReportFormatError
+from src.report_generator.store import ReportStore, query_range
 
 from generated import energy_pipeline_pb2 as exec_pb2
 from generated import energy_pipeline_pb2_grpc as exec_pb2_grpc
@@ -20,88 +30,395 @@ logging.basicConfig(
 )
 log = logging.getLogger(__name__)
 
-OUT_DIR = Path("/app/data")
+OUT_DIR = Path(os.getenv("REPORT_OUT_DIR", "/app/data"))
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 SERVICE_NAME = "energy.ReportGenerator"
 
+# Partitioned, append-only history (ReportRequest.store / BatchReportRequest.store)
+STORE = ReportStore(os.getenv("REPORT_STORE_DIR", str(OUT_DIR / "store")))
+COMPACT_INTERVAL_S = float(os.getenv("REPORT_STORE_COMPACT_INTERVAL_S", "300"))  # 0 = off
+
+# formats written by the start-up warm-up; parquet / arrow also load pyarrow,
+# which is otherwise imported on the first request that needs it
+WARMUP_FORMATS = [f.strip() for f in os.getenv("REPORT_WARMUP_FORMATS", "csv,csv_columnar").split(",") if f.strip()]
+
+
+@contextmanager
+def replacing(path):
+    """A temp path next to path that is renamed over it when the block
+    succeeds: readers only ever see a complete report, and concurrent writers
+    of the same report each write their own file (the last rename wins)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def write_csv(path, rows):
+    """Write (timestamp, household_id, power, efficiency, status, anomaly) tuples."""
+    with Path(path).open("w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(CSV_HEADER)
+        w.writerows(rows)
+
+
+def write_batch_csv(path, batch):
+    write_csv(path, zip(*processed_columns(batch)))
+
+
+def report_rows(report):
+    for rec in report.processed:
+        yield (rec.timestamp, rec.household_id, rec.power,
+               rec.efficiency, rec.status, rec.anomaly_detected)
+
+
+def write_report_chunks(path, fmt, chunks):
+    """Write ProcessedDataReport chunks to path in format fmt."""
+    if fmt == formats.CSV:
+        write_csv(path, chain.from_iterable(map(report_rows, chunks)))
+    else:
+        formats.write_report(path, fmt, map(ReportColumns.from_report, chunks))
+
+
+def write_report(fmt, report):
+    """Write a ProcessedDataReport to OUT_DIR in format fmt; returns the path."""
+    out = OUT_DIR / f"energy_report{formats.suffix(fmt)}"
+    with replacing(out) as tmp:
+        if fmt == formats.CSV:
+            write_csv(tmp, report_rows(report))
+        else:
+            formats.write_report(tmp, fmt, formats.report_chunks(report))
+    return out
+
+
+def write_batch_report(fmt, batch):
+    """write_report() for a ProcessedEnergyBatch."""
+    out = OUT_DIR / f"energy_report{formats.suffix(fmt)}"
+    with replacing(out) as tmp:
+        if fmt == formats.CSV:
+            write_batch_csv(tmp, batch)
+        else:
+            formats.write_report(tmp, fmt, [ReportColumns.from_batch(batch)])
+    return out
+
+
+def report_response(path, fmt):
+    # html_path predates the other formats and is kept for existing clients
+    return energy_pb2.ReportResponse(html_path=str(path), path=str(path), format=fmt)
+
+
+def store_response(partitions, fmt):
+    return energy_pb2.ReportResponse(
+        html_path=str(STORE.root), path=str(STORE.root), format=fmt,
+        partition_paths=[str(p) for p in partitions],
+    )
+
+
+def generate_report(request):
+    if request.store:
+        partitions = STORE.write(formats.report_chunks(request.report), request.format)
+        return store_response(partitions, request.format)
+    return report_response(write_report(request.format, request.report), request.format)
+
+
+def generate_batch_report(request):
+    if request.store:
+        partitions = STORE.write([ReportColumns.from_batch(request.batch)], request.format)
+        return store_response(partitions, request.format)
+    return report_response(write_batch_report(request.format, request.batch), request.format)
+
+
+def generate_file_report(request):
+    """GenerateReportFromFile: generate_report() for a ProcessedDataReport file,
+    read and written a chunk at a time."""
+    fmt = request.format
+    out = OUT_DIR / f"energy_report{formats.suffix(fmt)}"  # checks fmt before any reading
+    chunks = (energy_pb2.ProcessedDataReport.FromString(r) for r in fileref.records(request.input))
+    if request.store:
+        response = store_response(STORE.write(map(ReportColumns.from_report, chunks), fmt), fmt)
+    else:
+        with replacing(out) as tmp:
+            write_report_chunks(tmp, fmt, chunks)
+        response = report_response(out, fmt)
+    if request.remove_input:
+        fileref.remove(request.input)
+    return response
+
+
+def generate_report_stream(requests):
+    """GenerateReportStream: one report from a stream of ReportRequest chunks,
+    written as they arrive (format and store come from the first one)."""
+    requests = iter(requests)
+    first = next(requests, energy_pb2.ReportRequest())
+    fmt = first.format
+    out = OUT_DIR / f"energy_report{formats.suffix(fmt)}"
+    chunks = chain([first.report], (r.report for r in requests))
+    if first.store:
+        partitions = STORE.write(chain.from_iterable(map(formats.report_chunks, chunks)), fmt)
+        return store_response(partitions, fmt)
+    with replacing(out) as tmp:
+        write_report_chunks(tmp, fmt, chunks)
+    return report_response(out, fmt)
+
+
+def query_report(request, stats):
+    """QueryReport: the stored rows asked for, one ProcessedDataReport per
+    block read (see ReportStore.query)."""
+    for cols in STORE.query(request.household_id, request.start_ms, request.end_ms, stats):
+        yield cols.to_report()
+
+
+def log_query(request, stats, rows):
+    log.info("QueryReport: household=%r start_ms=%d end_ms=%d rows=%d partitions=%d parts=%d blocks_read=%d/%d",
+             request.household_id, request.start_ms, request.end_ms, rows,
+             stats["partitions"], stats["parts"], stats["blocks_read"], stats["blocks"])
+
+
+def warm_up(rows):
+    """Write a synthetic report of `rows` rows, from rows and from a batch, in
+    each of WARMUP_FORMATS to a scratch directory."""
+    households = [f"H{i:03d}" for i in range(50)]
+    report = energy_pb2.ProcessedDataReport(processed=[
+        energy_pb2.ProcessedEnergyReport(
+            timestamp=f"2025-01-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z",
+            household_id=households[i % 50], power=i % 200 * 0.75, efficiency=0.9,
+            status="HIGH" if i % 200 >= 150 else "OK", anomaly_detected=i % 200 >= 150,
+        )
+        for i in range(rows)
+    ])
+    batch = energy_pb2.ProcessedEnergyBatch(
+        household_ids=households, household=[i % 50 for i in range(rows)],
+        timestamp_ms=[1735689600000 + i * 1000 for i in range(rows)],
+        power=[r.power for r in report.processed], efficiency=[0.9] * rows,
+        statuses=["OK", "HIGH"], status=[int(r.anomaly_detected) for r in report.processed],
+        anomaly_detected=[r.anomaly_detected for r in report.processed],
+    )
+    with tempfile.TemporaryDirectory() as scratch:
+        store = ReportStore(Path(scratch) / "store")
+        for name in WARMUP_FORMATS:
+            fmt = energy_pb2.ReportFormat.Value(f"REPORT_FORMAT_{name.upper()}")
+            out = Path(scratch) / f"warmup{formats.suffix(fmt)}"
+            write_report_chunks(out, fmt, [report])
+            if fmt == formats.CSV:
+                write_batch_csv(out, batch)
+            else:
+                formats.write_report(out, fmt, [ReportColumns.from_batch(batch)])
+            if fmt != formats.HTML:
+                store.write([ReportColumns.from_batch(batch)], fmt)
+        for cols in store.query(households[0], 1735689600000, 1735689600000 + 3600_000):
+            cols.to_report()
+
+
+def format_error(context, e):
+    context.set_details(str(e))
+    context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+    return energy_pb2.ReportResponse()
+
 
 class ReportGeneratorServicer(energy_pb2_grpc.ReportGeneratorServicer):
     def GenerateReport(self, request, context):
-        report = request.report  # ProcessedDataReport
-        out_csv = OUT_DIR / "energy_report.csv"
-
-        with out_csv.open("w", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["timestamp", "household_id", "power",
-                        "efficiency", "status", "anomaly_detected"])
-            for rec in report.processed:
-                w.writerow([
-                    rec.timestamp, rec.household_id, rec.power,
-                    rec.efficiency, rec.status, rec.anomaly_detected
-                ])
-
-        log.info("GenerateReport: wrote %s", out_csv)
-        # Returning path in html_path field (matches proto)
-        return energy_pb2.ReportResponse(html_path=str(out_csv))
+        try:
+            response = generate_report(request)
+        except ReportFormatError as e:
+            return format_error(context, e)
+
+        log.info("GenerateReport: wrote %s partitions=%d", response.path, len(response.partition_paths))
+        return response
+
+    def GenerateBatchReport(self, request, context):
+        try:
+            response = generate_batch_report(request)
+        except ReportFormatError as e:
+            return format_error(context, e)
+
+        log.info("GenerateBatchReport: wrote %s rows=%d partitions=%d",
+                 response.path, len(request.batch.power), len(response.partition_paths))
+        return response
+
+    def GenerateReportFromFile(self, request, context):
+        try:
+            response = generate_file_report(request)
+        except ReportFormatError as e:
+            return format_error(context, e)
+        except fileref.ERRORS as e:
+            return fileref.set_error(context, e, energy_pb2.ReportResponse())
+
+        log.info("GenerateReportFromFile: %s -> %s partitions=%d",
+                 request.input.path, response.path, len(response.partition_paths))
+        return response
+
+    def GenerateReportStream(self, request_iterator, context):
+        try:
+            response = generate_report_stream(request_iterator)
+        except ReportFormatError as e:
+            return format_error(context, e)
+
+        log.info("GenerateReportStream: wrote %s partitions=%d", response.path, len(response.partition_paths))
+        return response
+
+    def QueryReport(self, request, context):
+        try:
+            query_range(request.start_ms, request.end_ms)
+        except ValueError as e:
+            format_error(context, e)
+            return
+        stats, rows = Counter(), 0
+        try:
+            for report in query_report(request, stats):
+                if not context.is_active():
+                    log.info("QueryReport: client went away after %d rows", rows)
+                    return
+                rows += len(report.processed)
+                yield report
+        except ReportFormatError as e:
+            format_error(context, e)
+            return
+        log_query(request, stats, rows)
+
 
 class ContainerExecutorServicer(exec_pb2_grpc.ContainerExecutorServicer):
+    def execute(self, request) -> str:
+        out_path = Path(request.output_file)
+
+        # Rows are streamed chunk by chunk from the record file into the
+        # report; the output format follows the file extension.
+        chunks = read_messages(request.input_file, energy_pb2.ProcessedDataReport)
+        with replacing(out_path) as tmp:
+            write_report_chunks(tmp, formats.format_for_path(out_path), chunks)
+        return f"Wrote report to {request.output_file}"
+
     def Execute(self, request, context):
         try:
-            report_data = energy_pb2.ProcessedDataReport()
-            with open(request.input_file, "rb") as f:
-                report_data.ParseFromString(f.read())
-
-            out_path = Path(request.output_file)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-
-            with out_path.open("w", newline="") as f:
-                writer = csv.writer(f)
-
-                writer.writerow(["timestamp","household_id","power",
-                                 "efficiency","status","anomaly_detected"])
-                for rec in report_data.processed:
-                    writer.writerow([
-                        rec.timestamp, rec.household_id, rec.power,
-                        rec.efficiency, rec.status, rec.anomaly_detected
-                    ])
-            return exec_pb2.ExecuteResponse(
-                success=True,
-                message=f"Wrote report to {request.output_file}"
-            )
+            return exec_pb2.ExecuteResponse(success=True, message=self.execute(request))
         except Exception as e:
             context.set_details(str(e))
             context.set_code(grpc.StatusCode.INTERNAL)
             return exec_pb2.ExecuteResponse(success=False, message=str(e))
 
 
-def serve(port: int = 50053):
-    server = grpc.server(
-        futures.ThreadPoolExecutor(max_workers=4),
-        interceptors=[ServerLoggingInterceptor()],
-    )
+# ----- asyncio (grpc.aio) -----
+# Same RPCs without a thread per call; report writing runs on the offload pool.
+class AsyncReportGeneratorServicer(energy_pb2_grpc.ReportGeneratorServicer):
+    async def GenerateReport(self, request, context):
+        try:
+            response = await offload(generate_report, request)
+        except ReportFormatError as e:
+            return format_error(context, e)
+
+        log.info("GenerateReport: wrote %s partitions=%d", response.path, len(response.partition_paths))
+        return response
+
+    async def GenerateBatchReport(self, request, context):
+        try:
+            response = await offload(generate_batch_report, request)
+        except ReportFormatError as e:
+            return format_error(context, e)
+
+        log.info("GenerateBatchReport: wrote %s rows=%d partitions=%d",
+                 response.path, len(request.batch.power), len(response.partition_paths))
+        return response
 
-    energy_pb2_grpc.add_ReportGeneratorServicer_to_server(ReportGeneratorServicer(), server)    
-    # ContainerExecutor (from energy_pipeline.proto)
-    exec_pb2_grpc.add_ContainerExecutorServicer_to_server(ContainerExecutorServicer(), server)
-    
-    # health service
-    health_serv = health.HealthServicer()
-    health_pb2_grpc.add_HealthServicer_to_server(health_serv, server)
-    health_serv.set("", health_pb2.HealthCheckResponse.SERVING)
-    health_serv.set(SERVICE_NAME, health_pb2.HealthCheckResponse.SERVING)
+    async def GenerateReportFromFile(self, request, context):
+        try:
+            response = await offload(generate_file_report, request)
+        except ReportFormatError as e:
+            return format_error(context, e)
+        except fileref.ERRORS as e:
+            return fileref.set_error(context, e, energy_pb2.ReportResponse())
+
+        log.info("GenerateReportFromFile: %s -> %s partitions=%d",
+                 request.input.path, response.path, len(response.partition_paths))
+        return response
+
+    async def GenerateReportStream(self, request_iterator, context):
+        # the writer runs on the offload pool and pulls the chunks from the loop
+        requests = blocking_iter(request_iterator, asyncio.get_running_loop())
+        try:
+            response = await offload(generate_report_stream, requests)
+        except ReportFormatError as e:
+            return format_error(context, e)
 
-    server.add_insecure_port(f"[::]:{port}")
-    server.start()
-    log.info("gRPC listening on :%s", port)
+        log.info("GenerateReportStream: wrote %s partitions=%d", response.path, len(response.partition_paths))
+        return response
 
+    async def QueryReport(self, request, context):
+        try:
+            query_range(request.start_ms, request.end_ms)
+        except ValueError as e:
+            format_error(context, e)
+            return
+        # each block is read on the offload pool; the loop only relays them
+        stats, rows = Counter(), 0
+        reports = query_report(request, stats)
+        step = None
+        try:
+            while True:
+                step = asyncio.ensure_future(offload(next, reports, None))
+                # shielded: a cancelled call must not close the query while a read is running
+                report = await asyncio.shield(step)
+                if report is None:
+                    break
+                rows += len(report.processed)
+                yield report
+        except ReportFormatError as e:
+            format_error(context, e)
+            return
+        finally:
+            if step is not None and not step.done():
+                await asyncio.wait([step])
+            reports.close()
+        log_query(request, stats, rows)
+
+
+class AsyncContainerExecutorServicer(ContainerExecutorServicer):
+    async def Execute(self, request, context):
+        try:
+            return exec_pb2.ExecuteResponse(success=True, message=await offload(self.execute, request))
+        except Exception as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INTERNAL)
+            return exec_pb2.ExecuteResponse(success=False, message=str(e))
+
+
+# ----- server -----
+def servicers(aio: bool = False):
+    if aio:
+        return [
+            (energy_pb2_grpc.add_ReportGeneratorServicer_to_server, AsyncReportGeneratorServicer()),
+            (exec_pb2_grpc.add_ContainerExecutorServicer_to_server, AsyncContainerExecutorServicer()),
+        ]
+    return [
+        (energy_pb2_grpc.add_ReportGeneratorServicer_to_server, ReportGeneratorServicer()),
+        # ContainerExecutor (from energy_pipeline.proto)
+        (exec_pb2_grpc.add_ContainerExecutorServicer_to_server, ContainerExecutorServicer()),
+    ]
+
+
+def compact_forever(stop: threading.Event, interval_s: float = COMPACT_INTERVAL_S):
+    """Merge small store parts every interval_s until stop is set."""
+    while not stop.wait(interval_s):
+        try:
+            merged = STORE.compact()
+            if merged:
+                log.info("report store: compacted %d parts", merged)
+        except Exception:
+            log.exception("report store compaction failed")
+
+
+def serve(port: int = 50053):
+    stop = threading.Event()
+    if COMPACT_INTERVAL_S > 0:
+        threading.Thread(target=compact_forever, args=(stop,), name="store-compactor", daemon=True).start()
     try:
-        while True:
-            time.sleep(86400)
-    except KeyboardInterrupt:
-        health_serv.set("", health_pb2.HealthCheckResponse.NOT_SERVING)
-        health_serv.set(SERVICE_NAME, health_pb2.HealthCheckResponse.NOT_SERVING)
-        server.stop(0)
+        serving.serve(SERVICE_NAME, servicers, port, warm_up)
+    finally:
+        stop.set()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,404 @@
+"""Append-only report store partitioned by household and day.
+
+    <root>/household=<id>/date=<YYYY-MM-DD>/part-<ns>-<pid>-<rand>.<ext>
+
+Each write groups the incoming rows by (household, UTC day) and adds one new
+part file per touched partition; existing files are never rewritten, so a
+write costs O(rows written) however much history the store holds. Parts are
+written under a dot-prefixed temp name and renamed into place, so readers
+(and the compactor) only ever see complete files, and concurrent reporters
+cannot collide because every part name is unique.
+
+compact() merges the small parts of a partition into one file. It takes a
+per-partition flock, so compactors in different processes never merge the
+same parts; query() holds the same lock shared while it reads a partition,
+so parts are never merged away under a query (the compactor skips the
+partition until a later run). Writers need no lock at all. Rows whose
+timestamp does not parse go to date=unknown.
+
+A compaction writes a marker (.compacting-*) naming its merged part and its
+sources before it starts and removes it once the sources are gone. A marker
+left by a crash is settled by the next compact() or query() that gets the
+partition to itself: the sources are removed when the merged part was
+published, else the half-written merge is. Until then parts() leaves out
+sources whose merged part is visible, so no row is read twice. compact() also
+removes temp files older than REPORT_STORE_STALE_TMP_S (writers killed
+mid-write).
+
+Every part has a sidecar block index (index.py), so query() reads only the
+blocks of the partitions a household and time range select: its cost follows
+the rows asked for, not the size of the store.
+"""
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+
+from src.common.columnar import TIMESTAMP_UNSET
+from src.report_generator import formats, index
+from src.report_generator.formats import ReportFormatError
+
+log = logging.getLogger(__name__)
+
+COMPACT_MIN_FILES = int(os.getenv("REPORT_STORE_COMPACT_MIN_FILES", "8"))
+SMALL_FILE_BYTES = int(os.getenv("REPORT_STORE_SMALL_FILE_BYTES", str(8 << 20)))
+STALE_TMP_S = float(os.getenv("REPORT_STORE_STALE_TMP_S", "3600"))  # older temp files are left over
+
+_DAY_MS = 86_400_000
+_LOCK = ".compact.lock"
+_MARKER = ".compacting-"
+_MAX_DAYS = 366  # time ranges up to this many days open their date directories directly
+_INT64 = np.iinfo(np.int64)
+
+
+def _writer_format(fmt):
+    # parts are always written column-wise; plain CSV uses the columnar CSV writer
+    if fmt == formats.HTML:
+        raise ReportFormatError("the report store keeps rows; HTML summaries cannot be appended")
+    return formats.CSV_COLUMNAR if fmt == formats.CSV else fmt
+
+
+def _part_name(ext: str) -> str:
+    return f"part-{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}{ext}"
+
+
+class ReportStore:
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def partition(self, household: str, day: str) -> Path:
+        return self.root / f"household={quote(household, safe='')}" / f"date={day}"
+
+    # ----- writes -----
+    def write(self, chunks, fmt=formats.CSV):
+        """Append an iterable of ReportColumns as one new part per touched
+        partition; returns the partition dirs, in the order first touched."""
+        fmt = _writer_format(fmt)
+        ext = formats.suffix(fmt)
+        open_parts = {}  # partition dir -> (tmp path, final path, writer)
+        try:
+            for cols in chunks:
+                for directory, rows in self._split(cols):
+                    if directory not in open_parts:
+                        directory.mkdir(parents=True, exist_ok=True)
+                        final = directory / _part_name(ext)
+                        tmp = directory / f".{final.name}.tmp"
+                        open_parts[directory] = (tmp, final, index.IndexedWriter(formats.open_writer(tmp, fmt)))
+                    open_parts[directory][2].write(cols.take(rows))
+            for tmp, final, writer in open_parts.values():
+                writer.close()
+                _publish(tmp, final, writer.blocks())
+        except BaseException:
+            for tmp, _, writer in open_parts.values():
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+                tmp.unlink(missing_ok=True)
+                _index_tmp(tmp).unlink(missing_ok=True)
+            raise
+        return list(open_parts)
+
+    def _split(self, cols):
+        """(partition dir, row indices) for each partition in one chunk."""
+        if not len(cols):
+            return
+        ms = cols.timestamp_ms()
+        unset = ms == TIMESTAMP_UNSET
+        day = np.where(unset, np.iinfo(np.int64).min, ms // _DAY_MS)
+
+        # stable sort by (household, day); each run is one partition, rows keep input order
+        order = np.lexsort((day, cols.household))
+        hh, dd = cols.household[order], day[order]
+        cuts = np.flatnonzero((hh[1:] != hh[:-1]) | (dd[1:] != dd[:-1])) + 1
+        for rows in np.split(order, cuts):
+            first = rows[0]
+            date = "unknown" if unset[first] else str(np.datetime64(int(day[first]), "D"))
+            yield self.partition(cols.households[cols.household[first]], date), rows
+
+    # ----- reads -----
+    def partitions(self):
+        return sorted(p for p in self.root.glob("household=*/date=*") if p.is_dir())
+
+    @staticmethod
+    def parts(partition: Path):
+        """Complete part files of a partition, oldest first (without the sources
+        of an interrupted compaction whose merged part is already visible)."""
+        parts = sorted(p for p in partition.glob("part-*") if p.suffix != index.SUFFIX and p.is_file())
+        superseded = _superseded(partition)
+        return [p for p in parts if p.name not in superseded] if superseded else parts
+
+    # ----- queries -----
+    def query(self, household: str = "", start_ms: int = 0, end_ms: int = 0, stats=None):
+        """The stored rows of household (all when empty) with a timestamp in
+        [start_ms, end_ms) (0: unbounded), as ReportColumns, one per block
+        read: households in ID order, then days, parts and blocks in order.
+        Rows without a timestamp only match a query without a time range.
+        stats (a Counter) counts partitions, parts, blocks and blocks_read."""
+        start, end = query_range(start_ms, end_ms)
+        bounded = (start, end) != (_INT64.min, _INT64.max)
+        stats = Counter() if stats is None else stats
+        for partition in self._query_partitions(household, start, end):
+            stats["partitions"] += 1
+            with open(partition / _LOCK, "a") as lock:
+                if _markers(partition):
+                    try:  # settle an interrupted compaction if no one else is here
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        _recover(partition)
+                    except BlockingIOError:
+                        pass
+                # shared with other queries; the compactor needs it exclusively and
+                # skips a partition being read, so the parts listed stay in place
+                fcntl.flock(lock, fcntl.LOCK_SH)
+                yield from self._query_partition(partition, start, end, bounded, stats)
+
+    def _query_partition(self, partition, start, end, bounded, stats):
+        for part in self.parts(partition):
+            blocks = index.load(part)
+            wanted = index.overlapping(blocks, start, end) if bounded else blocks
+            stats["parts"] += 1
+            stats["blocks"] += len(blocks)
+            stats["blocks_read"] += len(wanted)
+            if not len(wanted):
+                continue
+            for cols in index.read(part, wanted):
+                if bounded:
+                    ms = cols.timestamp_ms()
+                    cols = cols.take(np.flatnonzero((ms >= start) & (ms < end) & (ms != TIMESTAMP_UNSET)))
+                if len(cols):
+                    yield cols
+
+    def _query_partitions(self, household, start, end):
+        if household:
+            households = [self.root / f"household={quote(household, safe='')}"]
+        else:
+            households = sorted(p for p in self.root.glob("household=*") if p.is_dir())
+        if (start, end) == (_INT64.min, _INT64.max):
+            for directory in households:
+                yield from sorted(p for p in directory.glob("date=*") if p.is_dir())
+            return
+        first, last = start // _DAY_MS, (end - 1) // _DAY_MS
+        direct = last - first < _MAX_DAYS  # else list what is there
+        for directory in households:
+            if direct:
+                dates = (directory / f"date={np.datetime64(day, 'D')}" for day in range(first, last + 1))
+            else:
+                dates = (p for p in sorted(directory.glob("date=*"))
+                         if p.name != "date=unknown" and first <= _day(p) <= last)
+            yield from (p for p in dates if p.is_dir())
+
+    # ----- compaction -----
+    def compact(self, partitions=None, min_files: int = COMPACT_MIN_FILES,
+                small_bytes: int = SMALL_FILE_BYTES):
+        """Merge the small parts of each partition holding at least min_files of
+        them (per file type), after settling interrupted compactions and removing
+        stale temp files. Partitions another process is compacting (or a query
+        is reading) are skipped. Returns the number of parts merged away."""
+        merged = 0
+        for partition in partitions or self.partitions():
+            with open(partition / _LOCK, "a") as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                try:
+                    _recover(partition)
+                    _remove_stale(partition)
+                    merged += self._compact_partition(partition, min_files, small_bytes)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        return merged
+
+    def _compact_partition(self, partition, min_files, small_bytes):
+        by_ext = {}
+        for part in self.parts(partition):
+            if part.stat().st_size < small_bytes:
+                by_ext.setdefault(part.suffix, []).append(part)
+
+        merged = 0
+        for ext, small in by_ext.items():
+            if len(small) < max(min_files, 2):
+                continue
+            # the merged part takes the oldest input's timestamp so name order stays chronological
+            stamp = small[0].name.split("-")[1]
+            final = partition / f"part-{stamp}-{os.getpid()}-{uuid.uuid4().hex[:8]}{ext}"
+            tmp = partition / f".{final.name}.tmp"
+            marker = _begin(final, small)
+            try:
+                _publish(tmp, final, index.coalesce(_MERGERS[ext](small, tmp)))
+            finally:
+                _settle(marker)
+            merged += len(small)
+            log.info("compacted %d parts into %s", len(small), final)
+        return merged
+
+
+def query_range(start_ms: int, end_ms: int):
+    """[start, end) of a query, unbounded sides filled in; ValueError if empty."""
+    if start_ms and end_ms and end_ms <= start_ms:
+        raise ValueError(f"end_ms ({end_ms}) must be after start_ms ({start_ms})")
+    return start_ms or int(_INT64.min), end_ms or int(_INT64.max)
+
+
+def _day(partition: Path) -> int:
+    return int(np.datetime64(partition.name[len("date="):], "D").astype(np.int64))
+
+
+def _index_tmp(tmp: Path) -> Path:
+    return tmp.with_name(tmp.name + index.SUFFIX)
+
+
+# ----- crash recovery -----
+def _markers(partition: Path):
+    return sorted(p for p in partition.glob(_MARKER + "*") if p.suffix != ".tmp")
+
+
+def _read_marker(marker: Path):
+    with open(marker) as f:
+        entry = json.load(f)
+    return marker.parent / entry["part"], [marker.parent / name for name in entry["sources"]]
+
+
+def _begin(final: Path, sources) -> Path:
+    """Record a compaction of sources into final before anything is written."""
+    marker = final.with_name(_MARKER + final.stem)
+    tmp = marker.with_name(marker.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"part": final.name, "sources": [p.name for p in sources]}, f)
+    os.replace(tmp, marker)
+    return marker
+
+
+def _settle(marker: Path) -> bool:
+    """Finish the compaction a marker records (remove its sources) when its
+    merged part was published, else roll it back (remove what it wrote).
+    The marker goes last, so a crash here is settled again later. True if
+    the merged part was published."""
+    final, sources = _read_marker(marker)
+    published = final.exists()
+    if published:
+        for part in sources:
+            part.unlink(missing_ok=True)
+            index.sidecar(part).unlink(missing_ok=True)
+    else:
+        tmp = final.with_name(f".{final.name}.tmp")
+        for path in (tmp, _index_tmp(tmp), index.sidecar(final)):
+            path.unlink(missing_ok=True)
+    marker.unlink()
+    return published
+
+
+def _recover(partition: Path) -> None:
+    """Settle the compactions of a partition that were interrupted; the caller
+    holds its lock exclusively."""
+    for marker in _markers(partition):
+        done = _settle(marker)
+        log.warning("%s an interrupted compaction in %s", "finished" if done else "rolled back", partition)
+
+
+def _superseded(partition: Path):
+    """Names of the parts an interrupted compaction has already merged."""
+    names = set()
+    for marker in _markers(partition):
+        try:
+            final, sources = _read_marker(marker)
+        except FileNotFoundError:  # settled meanwhile
+            continue
+        if final.exists():
+            names.update(p.name for p in sources)
+    return names
+
+
+def _remove_stale(partition: Path, age_s: float = None) -> None:
+    """Remove temp files (parts, indexes, markers) older than age_s: left by a
+    writer that was killed; writers take no lock, so younger ones may be live."""
+    cutoff = time.time() - (STALE_TMP_S if age_s is None else age_s)
+    for path in partition.glob(".*.tmp*"):
+        if not path.name.endswith((".tmp", ".tmp" + index.SUFFIX)):
+            continue
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                log.info("removed stale temp file %s", path)
+        except FileNotFoundError:
+            pass
+
+
+def _publish(tmp: Path, final: Path, blocks) -> None:
+    """Rename a written part into place, its index first so a visible part always has one."""
+    index.save(_index_tmp(tmp), blocks)
+    os.replace(_index_tmp(tmp), index.sidecar(final))
+    os.replace(tmp, final)
+
+
+# ----- mergers -----
+# each returns the block index of the merged part
+def _merge_csv(parts, out):
+    blocks, rows = [], 0
+    with open(out, "wb") as dst:
+        for i, part in enumerate(parts):
+            part_blocks = index.load(part)
+            with open(part, "rb") as src:
+                header = src.readline()
+                if i == 0:
+                    dst.write(header)
+                blocks.append(index.shift(part_blocks, rows, dst.tell() - len(header)))
+                shutil.copyfileobj(src, dst, 1 << 20)
+            rows += int(part_blocks["rows"].sum())
+    return np.concatenate(blocks)
+
+
+def _merged_index(parts, row_counts):
+    blocks, rows = [], 0
+    for part, count in zip(parts, row_counts):
+        blocks.append(index.shift(index.load(part), rows))
+        rows += count
+    return np.concatenate(blocks)
+
+
+def _read_arrow(part):
+    with formats.pa.ipc.open_file(str(part)) as reader:
+        return reader.read_all()
+
+
+def _merge_arrow(parts, out):
+    if not formats.load_pyarrow():
+        raise ReportFormatError("compacting Arrow parts needs pyarrow")
+    pa = formats.pa
+    tables = [_read_arrow(p) for p in parts]
+    table = pa.concat_tables(tables).unify_dictionaries()
+    with pa.ipc.new_file(str(out), table.schema) as writer:
+        writer.write_table(table)
+    return _merged_index(parts, [t.num_rows for t in tables])
+
+
+def _merge_parquet(parts, out):
+    if not formats.load_pyarrow():
+        raise ReportFormatError("compacting Parquet parts needs pyarrow")
+    pq = formats.pq
+    schema = formats.arrow_schema()
+    row_counts = []
+    with pq.ParquetWriter(str(out), schema, compression=formats.PARQUET_COMPRESSION) as writer:
+        for part in parts:
+            table = pq.read_table(str(part), schema=schema)
+            writer.write_table(table)
+            row_counts.append(table.num_rows)
+    return _merged_index(parts, row_counts)
+
+
+_MERGERS = {".csv": _merge_csv, ".arrow": _merge_arrow, ".parquet": _merge_parquet}
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    root = sys.argv[1] if len(sys.argv) > 1 else os.getenv("REPORT_STORE_DIR", "/app/data/store")
+    print(f"merged {ReportStore(root).compact()} parts under {root}")
@@ -0,0 +1,191 @@
+"""HTML summary report: per-household aggregates computed in one streaming pass.
+
+SummaryAggregator folds each ReportColumns chunk into running per-household
+totals (rows, energy, peak power, efficiency sum and histogram, anomalies) with
+a handful of bincount calls, so memory is bounded by the number of households
+and no chunk is looked at twice. HtmlSummaryWriter wraps it in the writer
+interface of formats (write(chunk) / close()) and renders the page once, at
+close, from templates compiled at import time.
+"""
+from html import escape
+from pathlib import Path
+from string import Template
+
+import numpy as np
+
+from src.common.columnar import TIMESTAMP_UNSET
+
+EFFICIENCY_BINS = 10  # [0, 0.1), ..., [0.9, 1.0), between an underflow (< 0) and an overflow (>= 1.0) bin
+
+
+class SummaryAggregator:
+    def __init__(self):
+        self._codes = {}  # household id -> index into the running arrays
+        self.rows = np.zeros(0, np.int64)
+        self.power_sum = np.zeros(0, np.float64)
+        self.power_peak = np.zeros(0, np.float64)
+        self.efficiency_sum = np.zeros(0, np.float64)
+        self.anomalies = np.zeros(0, np.int64)
+        self.efficiency_hist = np.zeros(EFFICIENCY_BINS + 2, np.int64)  # [< 0, bins..., >= 1.0]
+        self.statuses = {}
+        self.first_ms = self.last_ms = None
+
+    @property
+    def households(self):
+        return list(self._codes)
+
+    def _grow(self, n):
+        extra = n - len(self.rows)
+        if extra > 0:
+            self.rows = np.concatenate([self.rows, np.zeros(extra, np.int64)])
+            self.power_sum = np.concatenate([self.power_sum, np.zeros(extra)])
+            self.power_peak = np.concatenate([self.power_peak, np.full(extra, -np.inf)])
+            self.efficiency_sum = np.concatenate([self.efficiency_sum, np.zeros(extra)])
+            self.anomalies = np.concatenate([self.anomalies, np.zeros(extra, np.int64)])
+
+    def add(self, cols) -> None:
+        if not len(cols):
+            return
+        # per-chunk aggregates on the chunk's own (small) household table ...
+        local = cols.household
+        k = len(cols.households)
+        power = cols.power.astype(np.float64)
+        efficiency = cols.efficiency.astype(np.float64)
+        rows = np.bincount(local, minlength=k)
+        power_sum = np.bincount(local, power, minlength=k)
+        efficiency_sum = np.bincount(local, efficiency, minlength=k)
+        anomalies = np.bincount(local, cols.anomaly, minlength=k).astype(np.int64)
+        peak = np.full(k, -np.inf)
+        np.maximum.at(peak, local, power)
+
+        # ... then folded into the running totals
+        codes = np.fromiter((self._codes.setdefault(h, len(self._codes)) for h in cols.households),
+                            np.int64, k)
+        self._grow(len(self._codes))
+        self.rows[codes] += rows
+        self.power_sum[codes] += power_sum
+        self.efficiency_sum[codes] += efficiency_sum
+        self.anomalies[codes] += anomalies
+        np.maximum(self.power_peak[codes], peak, out=peak)
+        self.power_peak[codes] = peak
+
+        known = efficiency[~np.isnan(efficiency)]
+        bins = np.clip(np.floor(known * EFFICIENCY_BINS), -1, EFFICIENCY_BINS).astype(np.int64) + 1
+        self.efficiency_hist += np.bincount(bins, minlength=EFFICIENCY_BINS + 2)
+
+        for status, n in zip(cols.statuses, np.bincount(cols.status, minlength=len(cols.statuses)).tolist()):
+            if n:
+                self.statuses[status] = self.statuses.get(status, 0) + n
+
+        ms = cols.timestamp_ms()
+        ms = ms[ms != TIMESTAMP_UNSET]
+        if len(ms):
+            lo, hi = int(ms.min()), int(ms.max())
+            self.first_ms = lo if self.first_ms is None else min(self.first_ms, lo)
+            self.last_ms = hi if self.last_ms is None else max(self.last_ms, hi)
+
+
+# ----- rendering -----
+_PAGE = Template("""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Energy report</title>
+<style>
+body { font-family: sans-serif; margin: 2em; }
+table { border-collapse: collapse; margin-bottom: 2em; }
+th, td { border: 1px solid #ccc; padding: 0.25em 0.75em; text-align: right; }
+th:first-child, td:first-child { text-align: left; }
+.bar { background: #4a90d9; height: 0.8em; }
+</style>
+</head>
+<body>
+<h1>Energy report</h1>
+<p>$rows rows from $households households, $first to $last.
+Total power $power_sum, peak $power_peak, $anomalies anomalies ($anomaly_pct).</p>
+
+<h2>Households</h2>
+<table>
+<tr><th>Household</th><th>Rows</th><th>Total power</th><th>Mean power</th><th>Peak power</th><th>Mean efficiency</th><th>Anomalies</th></tr>
+$household_rows
+</table>
+
+<h2>Efficiency distribution</h2>
+<table>
+<tr><th>Efficiency</th><th>Rows</th><th></th></tr>
+$efficiency_rows
+</table>
+
+<h2>Status</h2>
+<table>
+<tr><th>Status</th><th>Rows</th></tr>
+$status_rows
+</table>
+</body>
+</html>
+""")
+_HOUSEHOLD_ROW = "<tr><td>{}</td><td>{}</td><td>{:.2f}</td><td>{:.2f}</td><td>{:.2f}</td><td>{:.3f}</td><td>{}</td></tr>".format
+_EFFICIENCY_ROW = '<tr><td>{}</td><td>{}</td><td><div class="bar" style="width: {:.1f}em"></div></td></tr>'.format
+_STATUS_ROW = "<tr><td>{}</td><td>{}</td></tr>".format
+
+
+_EFFICIENCY_LABELS = (
+    ["&lt; 0"]
+    + [f"{b / EFFICIENCY_BINS:.1f} &ndash; {(b + 1) / EFFICIENCY_BINS:.1f}" for b in range(EFFICIENCY_BINS)]
+    + ["&ge; 1.0"]
+)
+
+
+def _timestamp(ms):
+    return "?" if ms is None else str(np.datetime64(ms, "ms").astype("datetime64[s]")) + "Z"
+
+
+def render(agg: SummaryAggregator) -> str:
+    rows = agg.rows
+    total = int(rows.sum())
+    counted = np.maximum(rows, 1)
+    mean_power = agg.power_sum / counted
+    mean_efficiency = agg.efficiency_sum / counted
+    peak = np.where(rows > 0, agg.power_peak, 0.0)
+    anomalies = int(agg.anomalies.sum())
+
+    order = sorted(range(len(rows)), key=agg.households.__getitem__)
+    households = agg.households
+    hist = agg.efficiency_hist
+    widest = max(int(hist.max()), 1)
+    return _PAGE.substitute(
+        rows=total,
+        households=len(households),
+        first=_timestamp(agg.first_ms),
+        last=_timestamp(agg.last_ms),
+        power_sum=f"{agg.power_sum.sum():.2f}",
+        power_peak=f"{peak.max():.2f}" if len(peak) else "0.00",
+        anomalies=anomalies,
+        anomaly_pct=f"{100 * anomalies / total:.2f}%" if total else "0.00%",
+        household_rows="\n".join(
+            _HOUSEHOLD_ROW(escape(households[i]), int(rows[i]), agg.power_sum[i], mean_power[i],
+                           peak[i], mean_efficiency[i], int(agg.anomalies[i]))
+            for i in order
+        ),
+        efficiency_rows="\n".join(
+            _EFFICIENCY_ROW(label, n, 20 * n / widest)
+            for label, n in zip(_EFFICIENCY_LABELS, hist.tolist())
+        ),
+        status_rows="\n".join(
+            _STATUS_ROW(escape(s), n) for s, n in sorted(agg.statuses.items())
+        ),
+    )
+
+
+class HtmlSummaryWriter:
+    """Aggregates the chunks it is given and writes the HTML page on close."""
+
+    def __init__(self, path):
+        self._path = Path(path)
+        self.aggregates = SummaryAggregator()
+
+    def write(self, cols) -> None:
+        self.aggregates.add(cols)
+
+    def close(self) -> None:
+        self._path.write_text(render(self.aggregates), encoding="utf-8")
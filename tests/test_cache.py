@@ -0,0 +1,120 @@
+"""Result cache: LRU eviction and byte accounting in both tiers, restarts, file copies."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for p in (ROOT, os.path.join(ROOT, "generated")):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+from src.energy_analyzer import cache
+from src.energy_analyzer.cache import ResultCache
+
+A, B, C = (cache.digest(name) for name in (b"a", b"b", b"c"))
+
+
+def entries(c):
+    s = c.stats()
+    return s["memory_entries"], s["memory_bytes"], s["disk_entries"], s["disk_bytes"]
+
+
+def age(c, key, seconds):
+    """Make key's disk entry look `seconds` older (disk LRU order survives restarts by mtime)."""
+    path = c._path(key)
+    t = os.stat(path).st_mtime - seconds
+    os.utime(path, (t, t))
+
+
+def test_memory_eviction_order_and_bytes():
+    c = ResultCache(max_bytes=10, disk_dir="")
+    c.put(A, b"aaaa")
+    c.put(B, b"bbbb")
+    assert c.get(A) == b"aaaa"  # B is now the least recently used
+    c.put(C, b"cccc")
+    assert entries(c) == (2, 8, 0, 0)
+    assert c.get(B) is None and c.get(A) == b"aaaa" and c.get(C) == b"cccc"
+    c.put(A, b"a")  # replacing an entry replaces its size
+    assert entries(c) == (2, 5, 0, 0)
+    assert c.stats()["hits"] == 3 and c.stats()["misses"] == 1
+
+
+def test_disk_eviction_order_and_bytes(tmp_path):
+    c = ResultCache(max_bytes=0, disk_dir=tmp_path, disk_bytes=10)
+    c.put(A, b"aaaa")
+    c.put(B, b"bbbb")
+    assert c.get(A) == b"aaaa"
+    c.put(C, b"cccc")
+    assert entries(c) == (0, 0, 2, 8)
+    assert not c._path(B).exists()
+    assert c.get(B) is None and c.get(A) == b"aaaa"
+    assert sum(p.stat().st_size for p in tmp_path.glob("??/*")) == 8
+
+
+def test_disk_hit_after_restart(tmp_path):
+    first = ResultCache(max_bytes=100, disk_dir=tmp_path, disk_bytes=10)
+    first.put(A, b"aaaa")
+    first.put(B, b"bbbb")
+    age(first, A, 20)
+    age(first, B, 10)
+    assert first.get(A) == b"aaaa"  # from memory: the disk order is unchanged
+
+    c = ResultCache(max_bytes=100, disk_dir=tmp_path, disk_bytes=10)
+    assert entries(c) == (0, 0, 2, 8)
+    assert c.get(A) == b"aaaa" and c.get(A) == b"aaaa"  # disk, then memory
+    assert c.stats()["hits"] == 2 and c.stats()["misses"] == 0
+    assert entries(c) == (1, 4, 2, 8)
+    c.put(C, b"cccc")  # the disk hit refreshed A, so B goes
+    assert not c._path(B).exists() and c._path(A).exists()
+
+
+def test_entry_larger_than_memory_tier(tmp_path):
+    c = ResultCache(max_bytes=10, disk_dir=tmp_path, disk_bytes=100)
+    c.put(A, b"aaaa")
+    c.put(B, b"b" * 20)
+    assert entries(c) == (1, 4, 2, 24)  # A stays in memory, B is only on disk
+    assert c.get(B) == b"b" * 20
+    assert entries(c) == (1, 4, 2, 24)
+    c.put(C, b"c" * 200)  # too big for either tier
+    assert c.get(C) is None and entries(c) == (1, 4, 2, 24)
+
+
+def test_scan_removes_interrupted_writes(tmp_path):
+    c = ResultCache(max_bytes=0, disk_dir=tmp_path)
+    c.put(A, b"aaaa")
+    leftover = c._path(A).with_name(f".{B}.123.456.tmp")
+    leftover.write_bytes(b"partial")
+    c = ResultCache(max_bytes=0, disk_dir=tmp_path)
+    assert not leftover.exists()
+    assert entries(c) == (0, 0, 1, 4)
+    assert c.get(A) == b"aaaa" and c.get(B) is None
+
+
+def test_put_file_and_get_file(tmp_path):
+    src, out = tmp_path / "in.rec", tmp_path / "out" / "result.rec"
+    src.write_bytes(b"r" * 64)
+    c = ResultCache(max_bytes=16, disk_dir=tmp_path / "cache", disk_bytes=1000)
+    c.put_file(A, src)
+    assert entries(c) == (0, 0, 1, 64)  # bigger than the memory tier: copied to disk only
+    assert c.get_file(A, out) and out.read_bytes() == b"r" * 64
+    assert not [p for p in out.parent.iterdir() if p.name.startswith(".")]
+    assert not c.get_file(B, out)
+
+    src.write_bytes(b"s" * 8)
+    c.put_file(B, src)
+    assert entries(c) == (1, 8, 2, 72)
+    c._path(B).unlink()  # served from memory all the same
+    assert c.get_file(B, out) and out.read_bytes() == b"s" * 8
+
+    c._path(A).unlink()  # a disk entry removed behind the cache's back is a miss
+    assert not c.get_file(A, out) and out.read_bytes() == b"s" * 8
+    assert entries(c)[2:] == (1, 8)
+    assert c.stats()["hits"] == 2 and c.stats()["misses"] == 2
+
+
+def test_stats_are_per_instance(tmp_path):
+    one, two = ResultCache(max_bytes=10, disk_dir=""), ResultCache(max_bytes=10, disk_dir="")
+    one.put(A, b"a")
+    one.get(A)
+    two.get(A)
+    assert (one.stats()["hits"], one.stats()["misses"]) == (1, 0)
+    assert (two.stats()["hits"], two.stats()["misses"]) == (0, 1)
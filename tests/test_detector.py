@@ -0,0 +1,140 @@
+"""EWMA anomaly detector against a per-row loop, and snapshot / restore."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for p in (ROOT, os.path.join(ROOT, "generated")):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+import numpy as np
+import pytest
+
+from src.energy_analyzer import detector
+from src.energy_analyzer.detector import EwmaDetector
+
+
+class Reference:
+    """The detector as a loop over rows: each batch is scored against the state
+    from before it, then its readings are applied one at a time."""
+
+    def __init__(self, alpha, z_threshold, warmup):
+        self.alpha, self.z_threshold, self.warmup = alpha, z_threshold, warmup
+        self.state = {}  # household -> [mean, moment2, count]
+
+    def update(self, keys, power):
+        flags = []
+        for k, x in zip(keys, power):
+            mean, moment2, count = self.state.get(k, (0.0, 0.0, 0))
+            std = np.sqrt(max(moment2 - mean * mean, 0.0))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                z = np.abs(x - mean) / np.float64(std)
+            flags.append(not np.isfinite(x) or (count >= self.warmup and z >= self.z_threshold))
+        for k, x in zip(keys, power):
+            if not np.isfinite(x):
+                continue
+            if k not in self.state:
+                self.state[k] = [x, x * x, 0]
+            s = self.state[k]
+            s[0] = (1 - self.alpha) * s[0] + self.alpha * x
+            s[1] = (1 - self.alpha) * s[1] + self.alpha * x * x
+            s[2] += 1
+        return np.array(flags)
+
+
+def batches(seed, n_batches=6, rows=400, households=12):
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(50, 300, households)
+    for _ in range(n_batches):
+        h = rng.integers(0, households, rows)
+        power = base[h] + rng.normal(0, 5, rows)
+        spikes = rng.random(rows) < 0.02
+        power[spikes] *= 4
+        power[rng.random(rows) < 0.01] = rng.choice([np.nan, np.inf, -np.inf])
+        yield [f"HH-{i}".encode() for i in h], power
+
+
+def state(det):
+    """household -> (mean, moment2, count) of a detector."""
+    keys = det.households.keys_by_slot()
+    return {k: (det.mean[i], det.moment2[i], int(det.count[i])) for i, k in enumerate(keys.tolist())}
+
+
+def assert_same_state(det, ref):
+    got = state(det)
+    assert got.keys() == ref.state.keys()
+    for k, (mean, moment2, count) in ref.state.items():
+        assert got[k][2] == count
+        assert got[k][:2] == pytest.approx((mean, moment2), rel=1e-9)
+
+
+@pytest.mark.parametrize("alpha", [0.05, 0.5, 1.0])
+def test_matches_row_loop(alpha):
+    det = EwmaDetector(alpha=alpha, z_threshold=3.0, warmup=20)
+    ref = Reference(alpha, 3.0, 20)
+    flagged = 0
+    for keys, power in batches(seed=int(alpha * 100)):
+        want = ref.update(keys, power)
+        assert det.update(keys, power).tolist() == want.tolist()
+        assert_same_state(det, ref)
+        flagged += int(want.sum())
+    assert flagged
+
+
+def test_long_runs_of_one_household():
+    # d ** n for long runs within one batch, and a household first seen mid-batch
+    det, ref = EwmaDetector(alpha=0.05, warmup=3), Reference(0.05, 3.0, 3)
+    rng = np.random.default_rng(1)
+    for n in (5000, 1, 3000):
+        keys = [b"A"] * n + [b"B"] * (n // 2)
+        power = rng.uniform(90, 110, len(keys))
+        assert det.update(keys, power).tolist() == ref.update(keys, power).tolist()
+        assert_same_state(det, ref)
+
+
+def test_update_table_matches_update():
+    one, two = EwmaDetector(warmup=5), EwmaDetector(warmup=5)
+    for keys, power in batches(seed=2):
+        households = sorted(set(k.decode() for k in keys), reverse=True)
+        index = np.array([households.index(k.decode()) for k in keys])
+        assert one.update_table(households, index, power).tolist() == two.update(keys, power).tolist()
+    assert one.update_table([], np.zeros(0, np.int64), np.zeros(0)).tolist() == []
+    assert state(one) == state(two)
+
+
+def test_snapshot_restore_round_trip(tmp_path):
+    path = tmp_path / "state" / "anomaly.npz"
+    det = EwmaDetector(warmup=5)
+    feed = list(batches(seed=3, households=3000))
+    for keys, power in feed[:3]:
+        det.update(keys, power)
+    det.snapshot(path)
+    assert not [p for p in path.parent.iterdir() if p != path]
+
+    restored = EwmaDetector(warmup=5)
+    assert restored.restore(path)
+    assert state(restored) == state(det)
+    # both go on from the same state: same flags, same state after
+    for keys, power in feed[3:]:
+        assert restored.update(keys, power).tolist() == det.update(keys, power).tolist()
+    assert state(restored) == state(det)
+    assert not EwmaDetector().restore(tmp_path / "missing.npz")
+
+
+def test_snapshotter(tmp_path):
+    path = tmp_path / "anomaly.npz"
+    det = EwmaDetector()
+    det.update([b"A", b"B"], np.array([100.0, 200.0]))
+    snapshots = detector.Snapshotter(det, path, interval_s=0)
+    snapshots.start()
+    snapshots.stop()  # saves on the way out
+    again = EwmaDetector()
+    detector.Snapshotter(again, path, interval_s=0).start()
+    assert state(again) == state(det)
+
+
+def test_create():
+    assert detector.create("static") is None
+    assert isinstance(detector.create("ewma"), EwmaDetector)
+    with pytest.raises(ValueError):
+        detector.create("zscore")
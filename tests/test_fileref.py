@@ -0,0 +1,123 @@
+"""FileRef resolution under FILEREF_ROOT, byte ranges and checksums."""
+import hashlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for p in (ROOT, os.path.join(ROOT, "generated")):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+import pytest
+
+import energy_pb2
+from src.common import fileref
+from src.common.fileref import FileRefError
+from src.common.recordio import RecordWriter
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    root = tmp_path / "data"
+    root.mkdir()
+    monkeypatch.setattr(fileref, "ROOT", root)
+    return root.resolve()
+
+
+def report(*households):
+    out = energy_pb2.ProcessedDataReport()
+    for h in households:
+        out.processed.add(household_id=h, power=1.0)
+    return out
+
+
+def write(path, *chunks):
+    with RecordWriter(path, checksum=True) as w:
+        for chunk in chunks:
+            w.write(chunk)
+    return w
+
+
+def households(ref):
+    return [r.household_id for rec in fileref.records(ref)
+            for r in energy_pb2.ProcessedDataReport.FromString(rec).processed]
+
+
+def test_resolve_inside_root(root):
+    assert fileref.resolve("in/a.rec") == root / "in" / "a.rec"
+    assert fileref.resolve(str(root / "a.rec")) == root / "a.rec"
+    assert fileref.resolve("in/../a.rec") == root / "a.rec"
+
+
+@pytest.mark.parametrize("path", ["", "../a.rec", "in/../../a.rec", "/etc/passwd"])
+def test_resolve_rejects_paths_outside_root(root, path):
+    with pytest.raises(FileRefError):
+        fileref.resolve(path)
+
+
+def test_resolve_rejects_absolute_path_beside_root(root):
+    # a sibling whose name starts with the root's is not under it
+    with pytest.raises(FileRefError):
+        fileref.resolve(str(root) + "-other/a.rec")
+
+
+def test_resolve_follows_symlinks_out_of_root(root, tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    write(outside / "a.rec", report("H1"))
+    (root / "link").symlink_to(outside, target_is_directory=True)
+    (root / "a.rec").symlink_to(outside / "a.rec")
+    for path in ("link/a.rec", "a.rec"):
+        with pytest.raises(FileRefError):
+            fileref.resolve(path)
+        with pytest.raises(FileRefError):
+            fileref.records(energy_pb2.FileRef(path=path))
+
+
+def test_output_path(root):
+    out = fileref.output_path("out/nested/a.rec")
+    assert out == root / "out" / "nested" / "a.rec" and out.parent.is_dir()
+    with pytest.raises(FileRefError):
+        fileref.output_path("../out/a.rec")
+    assert not (root.parent / "out").exists()
+
+
+def test_written_ref_round_trip(root):
+    w = write(fileref.output_path("a.rec"), report("H1", "H2"), report("H3"))
+    ref = fileref.written(w)
+    assert ref.sha256 == hashlib.sha256((root / "a.rec").read_bytes()).hexdigest()
+    assert households(ref) == ["H1", "H2", "H3"]
+    fileref.remove(ref)
+    assert not (root / "a.rec").exists()
+    fileref.remove(ref)  # already gone
+
+
+def test_byte_range(root):
+    # two files concatenated: each range reads as a file of its own
+    first = write(root / "a.rec", report("H1"))
+    second = write(root / "b.rec", report("H2", "H3"))
+    (root / "ab.rec").write_bytes((root / "a.rec").read_bytes() + (root / "b.rec").read_bytes())
+    assert households(energy_pb2.FileRef(path="ab.rec", length=first.size, sha256=first.sha256)) == ["H1"]
+    ref = energy_pb2.FileRef(path="ab.rec", offset=first.size, sha256=second.sha256.upper())
+    assert households(ref) == ["H2", "H3"]
+
+
+@pytest.mark.parametrize("offset,length", [(0, 1 << 20), (1 << 20, 0), (10, 1 << 20)])
+def test_range_past_end_of_file(root, offset, length):
+    write(root / "a.rec", report("H1"))
+    with pytest.raises(FileRefError, match="past the end"):
+        fileref.records(energy_pb2.FileRef(path="a.rec", offset=offset, length=length))
+
+
+def test_sha256_mismatch(root):
+    w = write(root / "a.rec", report("H1"))
+    with pytest.raises(FileRefError, match="sha256 mismatch"):
+        fileref.records(energy_pb2.FileRef(path="a.rec", sha256="0" * 64))
+    # the digest covers the range, not the whole file
+    with pytest.raises(FileRefError, match="sha256 mismatch"):
+        fileref.records(energy_pb2.FileRef(path="a.rec", length=w.size - 1, sha256=w.sha256))
+
+
+def test_missing_file(root):
+    with pytest.raises(FileNotFoundError):
+        fileref.records(energy_pb2.FileRef(path="missing.rec"))
@@ -5,29 +5,26 @@ for p in (ROOT, GEN):
     if p not in sys.path:
         sys.path.insert(0, p)
 
-import grpc
 import energy_pb2 as m
-import energy_pb2_grpc as g
+from src.common.client import PipelineClient
 
 GEN_ADDR = "localhost:50051"
 AN_ADDR  = "localhost:50052"
 REP_ADDR = "localhost:50053"
 
 def main(rows: int = 20):
-    # 1) Generate raw data
-    with grpc.insecure_channel(GEN_ADDR) as ch:
-        stub = g.EnergyGeneratorStub(ch)
-        gen_resp = stub.GenerateData(m.GenerateRequest(rows=rows))
-
-    # 2) Analyze
-    with grpc.insecure_channel(AN_ADDR) as ch:
-        stub = g.EnergyAnalyzerStub(ch)
-        ana_resp = stub.AnalyzeData(m.AnalyzeRequest(data=gen_resp.data))
-
-    # 3) Report
-    with grpc.insecure_channel(REP_ADDR) as ch:
-        stub = g.ReportGeneratorStub(ch)
-        rep_resp = stub.GenerateReport(m.ReportRequest(report=ana_resp.report))
+    # One client, long-lived channels; each call has a deadline and
+    # transient failures are retried. wait_for_ready lets the services
+    # still be starting when this runs.
+    with PipelineClient(GEN_ADDR, AN_ADDR, REP_ADDR, wait_for_ready=True) as client:
+        # 1) Generate raw data
+        gen_resp = client.generate(m.GenerateRequest(rows=rows))
+
+        # 2) Analyze
+        report = client.analyze(gen_resp.data)
+
+        # 3) Report
+        rep_resp = client.report(report)
 
     # Tell the user where the CSV is (host path because of the bind mount)
     out_path = os.path.join(ROOT, "data", "energy_report.csv")
@@ -0,0 +1,142 @@
+"""Record files: write / read round trips, legacy .pb files and truncation, with and without mmap."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for p in (ROOT, os.path.join(ROOT, "generated")):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+import pytest
+
+import energy_pb2
+from src.common import recordio
+from src.common.recordio import MAGIC, MappedRecordReader, RecordReader, RecordWriter
+
+READERS = [pytest.param(RecordReader, id="buffered"), pytest.param(MappedRecordReader, id="mmap")]
+
+
+def response(first, n):
+    return energy_pb2.GenerateResponse(data=[
+        energy_pb2.RawEnergyData(timestamp=f"t{i}", household_id=f"HH-{i % 7}" + "x" * (i % 200),
+                                 power_consumption=str(i))
+        for i in range(first, first + n)
+    ])
+
+
+def ids(records):
+    return [r.power_consumption for rec in records for r in energy_pb2.GenerateResponse.FromString(rec).data]
+
+
+def test_open_records_picks_reader(tmp_path, monkeypatch):
+    path = tmp_path / "a.rec"
+    with RecordWriter(path):
+        pass
+    assert type(recordio.open_records(path)) is MappedRecordReader
+    monkeypatch.setattr(recordio, "USE_MMAP", False)
+    assert type(recordio.open_records(path)) is RecordReader
+
+
+@pytest.mark.parametrize("reader", READERS)
+def test_round_trip(tmp_path, reader):
+    path = tmp_path / "out" / "a.rec"
+    chunks = [response(0, 5), response(5, 0), response(5, 300)]
+    with RecordWriter(path, checksum=True) as w:
+        w.write(chunks[0])
+        w.write(chunks[1].SerializeToString())
+        w.write(memoryview(chunks[2].SerializeToString()))
+    assert w.records == 3 and w.size == path.stat().st_size and len(w.sha256) == 64
+    assert path.read_bytes().startswith(MAGIC)
+    assert not [p for p in path.parent.iterdir() if p != path]
+
+    got = [bytes(rec) for rec in reader(path)]
+    assert got == [c.SerializeToString() for c in chunks]
+    assert [m.data for m in recordio.read_messages(path, energy_pb2.GenerateResponse)] == [c.data for c in chunks]
+
+
+def test_writer_abort(tmp_path):
+    path = tmp_path / "a.rec"
+    with pytest.raises(RuntimeError):
+        with RecordWriter(path) as w:
+            w.write(response(0, 3))
+            raise RuntimeError("failed")
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize("reader", READERS)
+def test_legacy_file(tmp_path, reader, monkeypatch):
+    # a single serialized message, no header: regrouped into chunks of chunk_rows
+    monkeypatch.setattr(recordio, "_READ_SIZE", 1000)  # rows straddle the buffered reads
+    path = tmp_path / "a.pb"
+    message = response(0, 250)
+    path.write_bytes(message.SerializeToString())
+    chunks = list(reader(path, chunk_rows=40))
+    assert [len(energy_pb2.GenerateResponse.FromString(c).data) for c in chunks] == [40] * 6 + [10]
+    assert b"".join(bytes(c) for c in chunks) == path.read_bytes()
+    assert ids(chunks) == [str(i) for i in range(250)]
+
+
+@pytest.mark.parametrize("reader", READERS)
+def test_byte_range(tmp_path, reader):
+    first, second = tmp_path / "a.rec", tmp_path / "b.rec"
+    for path, n in ((first, 3), (second, 4)):
+        with RecordWriter(path) as w:
+            w.write(response(0, n))
+    both = tmp_path / "ab.rec"
+    both.write_bytes(first.read_bytes() + second.read_bytes())
+    size = first.stat().st_size
+    assert ids(reader(both, length=size)) == ["0", "1", "2"]
+    assert ids(reader(both, offset=size)) == ["0", "1", "2", "3"]
+
+
+def record_file(tmp_path):
+    path = tmp_path / "a.rec"
+    with RecordWriter(path) as w:
+        w.write(response(0, 3))
+        w.write(response(3, 300))  # a record length of two varint bytes
+    return path
+
+
+@pytest.mark.parametrize("reader", READERS)
+def test_truncated_record(tmp_path, reader):
+    path = record_file(tmp_path)
+    data = path.read_bytes()
+    path.write_bytes(data[:-1])
+    records = iter(reader(path))
+    assert ids([next(records)]) == ["0", "1", "2"]
+    with pytest.raises(EOFError):
+        next(records)
+
+
+@pytest.mark.parametrize("reader", READERS)
+def test_truncated_length(tmp_path, reader):
+    path = record_file(tmp_path)
+    first = len(MAGIC) + 1 + len(response(0, 3).SerializeToString())
+    path.write_bytes(path.read_bytes()[:first + 1])  # the first of two length bytes
+    with pytest.raises(EOFError):
+        list(reader(path))
+
+
+@pytest.mark.parametrize("reader", READERS)
+def test_truncated_legacy_file(tmp_path, reader):
+    path = tmp_path / "a.pb"
+    path.write_bytes(response(0, 10).SerializeToString()[:-3])
+    with pytest.raises(EOFError):
+        list(reader(path, chunk_rows=4))
+
+
+@pytest.mark.parametrize("reader", READERS)
+def test_range_past_end(tmp_path, reader):
+    path = record_file(tmp_path)
+    with pytest.raises(EOFError):
+        list(reader(path, length=path.stat().st_size + 10))
+
+
+@pytest.mark.parametrize("reader", READERS)
+def test_empty_files(tmp_path, reader):
+    header_only = tmp_path / "a.rec"
+    with RecordWriter(header_only):
+        pass
+    empty = tmp_path / "a.pb"
+    empty.write_bytes(b"")
+    assert list(reader(header_only)) == [] and list(reader(empty)) == []
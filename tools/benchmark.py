@@ -0,0 +1,474 @@
+"""Benchmarks for each service and the whole pipeline, without Docker.
+
+The three services are started in this process on ephemeral ports, as the
+same thread-pool gRPC servers they run in production (GRPC_* settings
+apply), and driven over real channels. Every workload is a stage, a total
+row count per iteration, a batch size (rows per request) and a number of
+concurrent clients. For each one the suite reports:
+
+- rows/s over the whole run;
+- p50/p95/p99 latency of one batch through the stage (one RPC, or the three
+  RPCs of the pipeline);
+- peak resident set size of the process while it ran (servers and clients
+  together, sampled every 10 ms);
+- serialized request and response bytes (HTTP/2 framing not included).
+
+The *_file stages pass batches by reference (FileRef) through files in a
+temp directory, as the services do over their shared volume.
+pipeline_orchestrated runs each batch through the orchestrator's RunPipeline
+(stages overlapped chunk by chunk, ORCHESTRATOR_* settings).
+
+Each server also listens on a Unix domain socket (GRPC_UNIX_SOCKET), so every
+workload can run over either transport (--transport tcp unix) to see what
+skipping the TCP/IP stack buys co-located stages.
+
+Results are saved as JSON. They are compared with a baseline, and the exit
+status is 1 when a workload's throughput or p95 latency is worse than the
+baseline by more than the tolerance.
+
+    python tools/benchmark.py
+    python tools/benchmark.py --stages analyze pipeline --rows 100000 --batch 10000 --concurrency 1 8
+    python tools/benchmark.py --stages analyze --rows 200000 --batch 50000 200000 --transport tcp unix
+    python tools/benchmark.py --save-baseline          # write tools/benchmark_baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent import futures
+from dataclasses import asdict, dataclass, replace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GEN = os.path.join(ROOT, "generated")
+for p in (ROOT, GEN):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+# before the service modules read them
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("REPORT_OUT_DIR", tempfile.mkdtemp(prefix="energy-bench-"))
+os.environ.setdefault("FILEREF_ROOT", os.environ["REPORT_OUT_DIR"])  # by-reference stages
+
+import grpc
+import numpy as np
+
+import energy_pb2 as m
+import energy_pb2_grpc as g
+from src.common import serving
+from src.common.client import PipelineClient
+from src.energy_analyzer import server as analyzer_server
+from src.energy_analyzer.parallel import ShardedAnalyzer
+from src.energy_generator import server as generator_server
+from src.orchestrator import server as orchestrator_server
+from src.report_generator import server as report_server
+
+BASELINE = os.path.join(ROOT, "tools", "benchmark_baseline.json")
+RESULTS = os.path.join(ROOT, "data", "benchmark.json")
+
+
+# ----- in-process services -----
+TRANSPORTS = ("tcp", "unix")
+
+
+class Stubs:
+    """A stub for each service over one transport."""
+
+    def __init__(self, targets, options):
+        self.channels = [grpc.insecure_channel(t, options=options) for t in targets]
+        self.generator = g.EnergyGeneratorStub(self.channels[0])
+        self.analyzer_stub = g.EnergyAnalyzerStub(self.channels[1])
+        self.reporter = g.ReportGeneratorStub(self.channels[2])
+        self.orchestrator = g.PipelineOrchestratorStub(self.channels[3])
+
+    def close(self):
+        for ch in self.channels:
+            ch.close()
+
+
+class Services:
+    """Generator, analyzer, reporter and orchestrator on ephemeral ports and
+    Unix sockets, with stubs per transport."""
+
+    def __init__(self, config: serving.ServerConfig):
+        # the analyzer gets its production process pool; no result cache,
+        # which would answer every repeated request from memory
+        self.analyzer = ShardedAnalyzer()
+        self.analyzer.start()
+        self.socket_dir = tempfile.mkdtemp(prefix="energy-bench-sock-")
+        sock = {name: os.path.join(self.socket_dir, f"{name}.sock")
+                for name in ("generator", "analyzer", "reporter", "orchestrator")}
+        self.servers = [
+            serving.start(generator_server.SERVICE_NAME, generator_server.servicers(aio=False),
+                          replace(config, unix_socket=sock["generator"])),
+            serving.start(analyzer_server.SERVICE_NAME, analyzer_server.servicers(False, self.analyzer),
+                          replace(config, unix_socket=sock["analyzer"])),
+            serving.start(report_server.SERVICE_NAME, report_server.servicers(aio=False),
+                          replace(config, unix_socket=sock["reporter"])),
+        ]
+        # the orchestrator reaches the stages over TCP whatever the benchmark's transport
+        self.pipeline_client = PipelineClient(*(f"localhost:{s.port}" for s in self.servers), config=config)
+        self.servers.append(serving.start(
+            orchestrator_server.SERVICE_NAME, orchestrator_server.servicers(False, self.pipeline_client),
+            replace(config, unix_socket=sock["orchestrator"])))
+        options = serving.channel_options(config)
+        self.stubs = {
+            "tcp": Stubs([f"localhost:{s.port}" for s in self.servers], options),
+            "unix": Stubs([f"unix:{s.unix_socket}" for s in self.servers], options),
+        }
+
+    def close(self):
+        for stubs in self.stubs.values():
+            stubs.close()
+        for s in self.servers:
+            s.stop(0)
+        self.pipeline_client.close()
+        self.analyzer.close()
+        shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+
+# ----- stages -----
+# prepare(stubs, size, fmt) builds the input for one batch of `size` rows
+# once; call(stubs, prepared, size, seed, fmt) sends one batch through the
+# stage and returns (request bytes, response bytes).
+def _generate_request(size, seed):
+    return m.GenerateRequest(rows=size, seed=seed)
+
+
+def _analyze_request(svc, size):
+    return m.AnalyzeRequest(data=svc.generator.GenerateData(_generate_request(size, 0)).data)
+
+
+def _report_request(svc, size, fmt):
+    report = svc.analyzer_stub.AnalyzeData(_analyze_request(svc, size)).report
+    return m.ReportRequest(report=report, format=fmt)
+
+
+def _batch_report_request(svc, size, fmt):
+    batch = svc.analyzer_stub.AnalyzeBatch(svc.generator.GenerateBatch(_generate_request(size, 0)))
+    return m.BatchReportRequest(batch=batch, format=fmt)
+
+
+def _unary(rpc, request):
+    response = rpc(request)
+    return request.ByteSize(), response.ByteSize()
+
+
+def _pipeline(svc, size, seed, fmt):
+    gen = m.GenerateRequest(rows=size, seed=seed)
+    data = svc.generator.GenerateData(gen)
+    analyze = m.AnalyzeRequest(data=data.data)
+    report = svc.analyzer_stub.AnalyzeData(analyze)
+    request = m.ReportRequest(report=report.report, format=fmt)
+    done = svc.reporter.GenerateReport(request)
+    return (gen.ByteSize() + analyze.ByteSize() + request.ByteSize(),
+            data.ByteSize() + report.ByteSize() + done.ByteSize())
+
+
+def _pipeline_batch(svc, size, seed, fmt):
+    gen = m.GenerateRequest(rows=size, seed=seed)
+    raw = svc.generator.GenerateBatch(gen)
+    batch = svc.analyzer_stub.AnalyzeBatch(raw)
+    request = m.BatchReportRequest(batch=batch, format=fmt)
+    done = svc.reporter.GenerateBatchReport(request)
+    return (gen.ByteSize() + raw.ByteSize() + request.ByteSize(),
+            raw.ByteSize() + batch.ByteSize() + done.ByteSize())
+
+
+# by-reference stages: the batch goes from stage to stage as a file under
+# FILEREF_ROOT, named per call, and only FileRefs go over the wire
+def _raw_file(svc, size, fmt):
+    request = m.GenerateFileRequest(request=_generate_request(size, 0), output_file=f"bench/raw-{size}.pb")
+    return svc.generator.GenerateFile(request).file
+
+
+def _analyze_file(svc, ref, seed):
+    request = m.AnalyzeFileRequest(input=ref, output_file=f"bench/processed-{seed}.pb")
+    response = svc.analyzer_stub.AnalyzeFile(request)
+    os.remove(response.file.path)
+    return request.ByteSize(), response.ByteSize()
+
+
+def _pipeline_file(svc, size, seed, fmt):
+    gen = m.GenerateFileRequest(request=_generate_request(size, seed), output_file=f"bench/raw-{seed}.pb")
+    raw = svc.generator.GenerateFile(gen)
+    analyze = m.AnalyzeFileRequest(input=raw.file, output_file=f"bench/processed-{seed}.pb", remove_input=True)
+    processed = svc.analyzer_stub.AnalyzeFile(analyze)
+    request = m.ReportFileRequest(input=processed.file, format=fmt, remove_input=True)
+    done = svc.reporter.GenerateReportFromFile(request)
+    return (gen.ByteSize() + analyze.ByteSize() + request.ByteSize(),
+            raw.ByteSize() + processed.ByteSize() + done.ByteSize())
+
+
+def _pipeline_orchestrated(svc, size, seed, fmt):
+    request = m.PipelineRequest(request=_generate_request(size, seed), format=fmt)
+    received = sum(p.ByteSize() for p in svc.orchestrator.RunPipeline(request))
+    return request.ByteSize(), received
+
+
+@dataclass(frozen=True)
+class Stage:
+    prepare: object
+    call: object
+
+
+STAGES = {
+    "generate": Stage(
+        lambda svc, size, fmt: None,
+        lambda svc, _, size, seed, fmt: _unary(svc.generator.GenerateData, _generate_request(size, seed))),
+    "analyze": Stage(
+        lambda svc, size, fmt: _analyze_request(svc, size),
+        lambda svc, request, size, seed, fmt: _unary(svc.analyzer_stub.AnalyzeData, request)),
+    "aggregate": Stage(
+        lambda svc, size, fmt: m.AggregateRequest.FromString(_analyze_request(svc, size).SerializeToString()),
+        lambda svc, request, size, seed, fmt: _unary(svc.analyzer_stub.AggregateData, request)),
+    "report": Stage(
+        _report_request,
+        lambda svc, request, size, seed, fmt: _unary(svc.reporter.GenerateReport, request)),
+    "pipeline": Stage(
+        lambda svc, size, fmt: None,
+        lambda svc, _, size, seed, fmt: _pipeline(svc, size, seed, fmt)),
+    "generate_batch": Stage(
+        lambda svc, size, fmt: None,
+        lambda svc, _, size, seed, fmt: _unary(svc.generator.GenerateBatch, _generate_request(size, seed))),
+    "analyze_batch": Stage(
+        lambda svc, size, fmt: svc.generator.GenerateBatch(_generate_request(size, 0)),
+        lambda svc, request, size, seed, fmt: _unary(svc.analyzer_stub.AnalyzeBatch, request)),
+    "report_batch": Stage(
+        _batch_report_request,
+        lambda svc, request, size, seed, fmt: _unary(svc.reporter.GenerateBatchReport, request)),
+    "pipeline_batch": Stage(
+        lambda svc, size, fmt: None,
+        lambda svc, _, size, seed, fmt: _pipeline_batch(svc, size, seed, fmt)),
+    "pipeline_orchestrated": Stage(
+        lambda svc, size, fmt: None,
+        lambda svc, _, size, seed, fmt: _pipeline_orchestrated(svc, size, seed, fmt)),
+    "analyze_file": Stage(
+        _raw_file,
+        lambda svc, ref, size, seed, fmt: _analyze_file(svc, ref, seed)),
+    "pipeline_file": Stage(
+        lambda svc, size, fmt: None,
+        lambda svc, _, size, seed, fmt: _pipeline_file(svc, size, seed, fmt)),
+}
+
+
+# ----- measurement -----
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakRss:
+    """Highest resident set size of this process while the block runs."""
+
+    def __init__(self, interval_s: float = 0.01):
+        self.interval_s = interval_s
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while True:
+            self.peak = max(self.peak, _rss_bytes())
+            if self._stop.wait(self.interval_s):
+                return
+
+    def __enter__(self):
+        self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+@dataclass
+class Result:
+    stage: str
+    rows: int
+    batch: int
+    concurrency: int
+    transport: str
+    calls: int
+    seconds: float
+    rows_per_s: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    peak_rss_mb: float
+    request_bytes: int
+    response_bytes: int
+    bytes_per_row: float
+
+    @property
+    def key(self):
+        return self.stage, self.rows, self.batch, self.concurrency, self.transport
+
+
+def _batches(rows, batch):
+    return [min(batch, rows - start) for start in range(0, rows, batch)]
+
+
+def run(svc, name, rows, batch, concurrency, iterations, fmt, transport="tcp") -> Result:
+    stage = STAGES[name]
+    svc = svc.stubs[transport]
+    sizes = _batches(rows, batch)
+    prepared = {size: stage.prepare(svc, size, fmt) for size in set(sizes)}
+    for size in sizes:  # warm-up: one untimed iteration
+        stage.call(svc, prepared[size], size, 0, fmt)
+
+    latencies, sent, received = [], [0], [0]
+    lock = threading.Lock()
+
+    def client(worker):
+        mine, s, r = [], 0, 0
+        for it in range(iterations):
+            for i, size in enumerate(sizes):
+                seed = 1 + (worker * iterations + it) * len(sizes) + i
+                t0 = time.perf_counter()
+                req, resp = stage.call(svc, prepared[size], size, seed, fmt)
+                mine.append(time.perf_counter() - t0)
+                s += req
+                r += resp
+        with lock:
+            latencies.extend(mine)
+            sent[0] += s
+            received[0] += r
+
+    with PeakRss() as rss, futures.ThreadPoolExecutor(concurrency) as pool:
+        t0 = time.perf_counter()
+        for f in [pool.submit(client, w) for w in range(concurrency)]:
+            f.result()
+        seconds = time.perf_counter() - t0
+
+    total = rows * iterations * concurrency
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return Result(
+        stage=name, rows=rows, batch=batch, concurrency=concurrency, transport=transport, calls=len(latencies),
+        seconds=round(seconds, 4), rows_per_s=round(total / seconds, 1),
+        p50_ms=round(float(p50), 3), p95_ms=round(float(p95), 3), p99_ms=round(float(p99), 3),
+        peak_rss_mb=round(rss.peak / (1 << 20), 1),
+        request_bytes=sent[0], response_bytes=received[0],
+        bytes_per_row=round((sent[0] + received[0]) / total, 1),
+    )
+
+
+# ----- baseline -----
+def compare(results, baseline, tolerance):
+    """(result, baseline entry, throughput change, p95 change, regressed) per matching workload."""
+    base = {(b["stage"], b["rows"], b["batch"], b["concurrency"], b.get("transport", "tcp")): b
+            for b in baseline["results"]}
+    out = []
+    for r in results:
+        b = base.get(r.key)
+        if b is None:
+            continue
+        throughput = r.rows_per_s / b["rows_per_s"] - 1
+        p95 = r.p95_ms / b["p95_ms"] - 1 if b["p95_ms"] else 0.0
+        out.append((r, b, throughput, p95, throughput < -tolerance or p95 > tolerance))
+    return out
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_results(results):
+    print(f"{'stage':<21} {'rows':>8} {'batch':>7} {'conc':>4} {'via':>4} {'rows/s':>11} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rss MB':>7} {'B/row':>7}")
+    for r in results:
+        print(f"{r.stage:<21} {r.rows:>8} {r.batch:>7} {r.concurrency:>4} {r.transport:>4} {r.rows_per_s:>11.0f} "
+              f"{r.p50_ms:>9.2f} {r.p95_ms:>9.2f} {r.p99_ms:>9.2f} {r.peak_rss_mb:>7.0f} {r.bytes_per_row:>7.1f}")
+
+
+def _print_comparison(rows, tolerance):
+    print(f"\nagainst baseline (tolerance {tolerance:.0%}):")
+    for r, b, throughput, p95, regressed in rows:
+        flag = "REGRESSION" if regressed else "ok"
+        print(f"  {r.stage:<21} rows={r.rows} batch={r.batch} conc={r.concurrency} via={r.transport}: "
+              f"rows/s {throughput:+.1%}  p95 {p95:+.1%}  {flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES),
+                        default=["generate", "analyze", "report", "pipeline", "pipeline_batch"])
+    parser.add_argument("--rows", nargs="+", type=int, default=[20000], help="rows per iteration")
+    parser.add_argument("--batch", nargs="+", type=int, default=[1000, 10000], help="rows per request")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4], help="concurrent clients")
+    parser.add_argument("--transport", nargs="+", choices=TRANSPORTS, default=["tcp"],
+                        help="tcp (localhost) and/or unix (Unix domain socket)")
+    parser.add_argument("--iterations", type=int, default=3, help="timed iterations per client")
+    parser.add_argument("--report-format", default="csv",
+                        help="ReportFormat for the report stages (csv, csv_columnar, parquet, arrow, html)")
+    parser.add_argument("--out", default=RESULTS, help="results JSON")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="allowed throughput drop / p95 increase before a workload counts as a regression")
+    args = parser.parse_args(argv)
+
+    fmt = m.ReportFormat.Value(f"REPORT_FORMAT_{args.report_format.upper()}")
+    config = serving.load_config(0)
+    config = replace(config, metrics_port=0, max_workers=max(config.max_workers, max(args.concurrency)))
+
+    svc = Services(config)
+    results = []
+    try:
+        # a batch larger than the rows is the same workload as batch == rows
+        shapes = list(dict.fromkeys((rows, min(batch, rows)) for rows in args.rows for batch in args.batch))
+        for name in args.stages:
+            for rows, batch in shapes:
+                for concurrency in args.concurrency:
+                    for transport in args.transport:
+                        results.append(run(svc, name, rows, batch, concurrency, args.iterations, fmt, transport))
+                        print(f"{name} rows={rows} batch={batch} concurrency={concurrency} via {transport}: "
+                              f"{results[-1].rows_per_s:.0f} rows/s", file=sys.stderr)
+    finally:
+        svc.close()
+
+    _print_results(results)
+    doc = {
+        "meta": {
+            "commit": _git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+            "grpc": grpc.__version__, "server": asdict(config), "iterations": args.iterations,
+            "report_format": args.report_format,
+        },
+        "results": [asdict(r) for r in results],
+    }
+    for path in [args.out] + ([args.baseline] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(doc, f, indent=2)
+        print(f"results written to {path}")
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    comparison = compare(results, baseline, args.tolerance)
+    theirs = baseline.get("meta", {})
+    if (theirs.get("cpus"), theirs.get("machine")) != (doc["meta"]["cpus"], doc["meta"]["machine"]):
+        print(f"\nnote: the baseline was recorded on {theirs.get('cpus')} CPUs ({theirs.get('machine')}); "
+              f"record one on this machine with --save-baseline")
+    _print_comparison(comparison, args.tolerance)
+    return 1 if any(regressed for *_, regressed in comparison) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
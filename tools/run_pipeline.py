@@ -0,0 +1,119 @@
+"""Run generate -> analyze -> report once and preview the report.
+
+By default the running services are called over gRPC (docker-compose up);
+with --embedded the same stages run in this process (src/pipeline/embedded.py)
+and no services are needed. --columnar uses the columnar RPCs / batches;
+--workdir hands the batch between the services as files in their shared
+volume (by reference) instead of inline. --orchestrated asks the
+orchestrator service to run the stages overlapped, chunk by chunk, and
+prints its progress.
+
+    python3 tools/run_pipeline.py --rows 20
+    python3 tools/run_pipeline.py --embedded --rows 1000000 --columnar --format parquet
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GEN = os.path.join(ROOT, "generated")
+for p in (ROOT, GEN):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+# embedded runs write where the containers' bind mount puts the report
+os.environ.setdefault("REPORT_OUT_DIR", os.path.join(ROOT, "data"))
+
+import energy_pb2 as m
+
+
+def run_grpc(args, request, fmt):
+    from src.common.client import PipelineClient
+
+    t0 = time.perf_counter()
+    with PipelineClient(args.generator, args.analyzer, args.reporter, wait_for_ready=True) as client:
+        result = client.run(request, fmt, store=args.store, columnar=args.columnar, workdir=args.workdir)
+    stages = " ".join(f"{k}={v:.2f}s" for k, v in result.seconds.items())
+    print(f"processed={result.processed} skipped={result.skipped} in {time.perf_counter() - t0:.2f}s ({stages})")
+    # the reporter answers with its container path; the bind mount puts it under data/
+    path = result.response.path
+    if path.startswith("/app/data/"):
+        path = os.path.join(ROOT, "data", path[len("/app/data/"):])
+    return path, result.response
+
+
+def run_orchestrated(args, request, fmt):
+    import grpc
+    import energy_pb2_grpc
+
+    request.chunk_size = args.chunk_rows
+    with grpc.insecure_channel(args.orchestrator) as channel:
+        stub = energy_pb2_grpc.PipelineOrchestratorStub(channel)
+        run = m.PipelineRequest(request=request, format=fmt, store=args.store, in_flight=args.in_flight)
+        for progress in stub.RunPipeline(run, wait_for_ready=True):
+            print(f"{progress.elapsed_s:7.2f}s generated={progress.generated_rows} "
+                  f"analyzed={progress.analyzed_rows} reported={progress.reported_rows} chunks={progress.chunks}")
+    print(f"processed={progress.reported_rows} skipped={progress.skipped_rows} in {progress.elapsed_s:.2f}s")
+    path = progress.report.path
+    if path.startswith("/app/data/"):
+        path = os.path.join(ROOT, "data", path[len("/app/data/"):])
+    return path, progress.report
+
+
+def run_embedded(args, request, fmt):
+    from src.pipeline.embedded import EmbeddedPipeline
+
+    t0 = time.perf_counter()
+    with EmbeddedPipeline() as pipeline:
+        result = pipeline.run(request, fmt, store=args.store, columnar=args.columnar)
+    stages = " ".join(f"{k}={v:.2f}s" for k, v in result.seconds.items())
+    print(f"processed={result.processed} skipped={result.skipped} in {time.perf_counter() - t0:.2f}s ({stages})")
+    return result.path, result.response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--households", type=int, default=0)
+    parser.add_argument("--anomaly-rate", type=float, default=0.0)
+    parser.add_argument("--format", default="csv", help="csv, csv_columnar, parquet, arrow or html")
+    parser.add_argument("--store", action="store_true", help="append to the partitioned report store")
+    parser.add_argument("--columnar", action="store_true", help="RawEnergyBatch / ProcessedEnergyBatch path")
+    parser.add_argument("--workdir", default="",
+                        help="pass the batch by reference through this dir of the services' data volume, e.g. refs")
+    parser.add_argument("--orchestrated", action="store_true", help="run through the orchestrator service")
+    parser.add_argument("--chunk-rows", type=int, default=0, help="orchestrated: rows per chunk")
+    parser.add_argument("--in-flight", type=int, default=0, help="orchestrated: chunks analyzed at once")
+    parser.add_argument("--embedded", action="store_true", help="run the stages in this process, no services")
+    parser.add_argument("--generator", default="localhost:50051")
+    parser.add_argument("--analyzer", default="localhost:50052")
+    parser.add_argument("--reporter", default="localhost:50053")
+    parser.add_argument("--orchestrator", default="localhost:50054")
+    args = parser.parse_args(argv)
+
+    request = m.GenerateRequest(rows=args.rows, seed=args.seed, households=args.households,
+                                anomaly_rate=args.anomaly_rate)
+    fmt = m.ReportFormat.Value(f"REPORT_FORMAT_{args.format.upper()}")
+    runner = run_embedded if args.embedded else run_orchestrated if args.orchestrated else run_grpc
+    path, response = runner(args, request, fmt)
+
+    if response.partition_paths:
+        print(f"Report store at: {path} ({len(response.partition_paths)} partitions written)")
+        return
+    print(f"Report at: {path}")
+    if fmt not in (m.REPORT_FORMAT_CSV, m.REPORT_FORMAT_CSV_COLUMNAR):
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            print("---- preview ----")
+            for _, line in zip(range(10), f):
+                print(line.rstrip())
+    except FileNotFoundError:
+        # no bind mount: the file only exists inside the container
+        print("File not found on host. It should exist inside the reporter container.")
+
+
+if __name__ == "__main__":
+    main()
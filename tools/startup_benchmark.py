@@ -0,0 +1,245 @@
+"""Cold-start benchmark: time from process start to the first successful RPC.
+
+Each service is started as its own process (python -m src.<service>.server,
+as its container runs it) on a free port, and a client that is already
+connected measures, from just before the process is spawned:
+
+- listen_s: the first health check answered (any status);
+- ready_s: health SERVING, i.e. after the warm-up (GRPC_WARMUP_ROWS);
+- first_s: the first representative RPC, sent once the service is ready, done;
+
+plus that first RPC's latency and the median of the next few (first_ms,
+next_ms), which shows what a cold call still costs. Every run is repeated
+for each --warmup-rows value (0 turns the warm-up off) and medians are
+reported.
+
+--imports adds an import-time profile of each service module
+(python -X importtime): the total and the heaviest modules it pulls in.
+
+    python tools/startup_benchmark.py
+    python tools/startup_benchmark.py --services reporter --report-format parquet --warmup-rows 0 1000 10000
+    python tools/startup_benchmark.py --imports --runs 1
+
+Other settings reach the services through the environment as usual
+(e.g. GRPC_SERVER_MODE=aio, REPORT_WARMUP_FORMATS=csv,parquet).
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GEN = os.path.join(ROOT, "generated")
+for p in (ROOT, GEN):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+import grpc
+from grpc_health.v1 import health_pb2, health_pb2_grpc
+
+import energy_pb2 as m
+import energy_pb2_grpc as g
+from src.energy_analyzer import engine
+from src.energy_generator.profiles import LoadProfile
+
+RESULTS = os.path.join(ROOT, "data", "startup_benchmark.json")
+
+MODULES = {
+    "generator": "src.energy_generator.server",
+    "analyzer": "src.energy_analyzer.server",
+    "reporter": "src.report_generator.server",
+}
+
+# reconnect quickly while the server is still starting (gRPC's default first
+# backoff is 1 s, which would hide everything measured here)
+CHANNEL_OPTIONS = [
+    ("grpc.initial_reconnect_backoff_ms", 10),
+    ("grpc.min_reconnect_backoff_ms", 10),
+    ("grpc.max_reconnect_backoff_ms", 50),
+]
+
+SERVING = health_pb2.HealthCheckResponse.SERVING
+
+
+# ----- workloads -----
+def rpcs(rows: int, fmt: int):
+    """The RPC each service is probed with: service -> fn(channel)."""
+    profile = LoadProfile()
+    raw = profile.serialized(0, rows)
+    analyze = m.AnalyzeRequest.FromString(raw)
+    body, _, skipped = engine.analyze_serialized(raw)
+    report = m.ReportRequest(report=m.ProcessedDataReport.FromString(engine.serialize_report(body, skipped)),
+                             format=fmt)
+    return {
+        "generator": lambda ch: g.EnergyGeneratorStub(ch).GenerateData(m.GenerateRequest(rows=rows)),
+        "analyzer": lambda ch: g.EnergyAnalyzerStub(ch).AnalyzeData(analyze),
+        "reporter": lambda ch: g.ReportGeneratorStub(ch).GenerateReport(report),
+    }
+
+
+# ----- one cold start -----
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("", 0))
+        return s.getsockname()[1]
+
+
+def _env(port: int, warmup_rows: int, out_dir: str):
+    env = dict(os.environ)
+    env.update(
+        PYTHONPATH=os.pathsep.join([ROOT, GEN, env.get("PYTHONPATH", "")]).rstrip(os.pathsep),
+        GRPC_PORT=str(port), GRPC_METRICS_PORT="0", GRPC_WARMUP_ROWS=str(warmup_rows),
+        LOG_LEVEL=env.get("LOG_LEVEL", "WARNING"),
+        REPORT_OUT_DIR=out_dir, FILEREF_ROOT=out_dir,
+        REPORT_STORE_COMPACT_INTERVAL_S="0", ANOMALY_STATE_PATH="",
+        ANALYZE_CACHE_BYTES="0",  # repeated probes would be answered from the cache
+    )
+    return env
+
+
+def _stop(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def cold_start(service: str, call, warmup_rows: int, out_dir: str, next_calls: int = 3, timeout: float = 60):
+    """Start the service once; its timings in seconds / milliseconds."""
+    port = _free_port()
+    channel = grpc.insecure_channel(f"localhost:{port}", options=CHANNEL_OPTIONS)
+    health = health_pb2_grpc.HealthStub(channel)
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", MODULES[service]], cwd=ROOT,
+                            env=_env(port, warmup_rows, out_dir))
+    try:
+        listen = None
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{service} exited with status {proc.returncode} during start-up")
+            if time.perf_counter() - t0 > timeout:
+                raise RuntimeError(f"{service} was not SERVING after {timeout}s")
+            try:
+                status = health.Check(health_pb2.HealthCheckRequest(), timeout=1, wait_for_ready=True).status
+            except grpc.RpcError:
+                continue  # not listening yet
+            listen = listen or time.perf_counter()
+            if status == SERVING:
+                break
+            time.sleep(0.005)
+        ready = time.perf_counter()
+        call(channel)
+        first = time.perf_counter()
+        later = []
+        for _ in range(next_calls):
+            t = time.perf_counter()
+            call(channel)
+            later.append(time.perf_counter() - t)
+    finally:
+        channel.close()
+        _stop(proc)
+    return {
+        "listen_s": listen - t0, "ready_s": ready - t0, "first_s": first - t0,
+        "first_ms": (first - ready) * 1000, "next_ms": statistics.median(later) * 1000 if later else 0.0,
+    }
+
+
+# ----- import profile -----
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(service: str, top: int = 8):
+    """Cumulative import time of the service module and of the heaviest
+    modules it imports directly (each counted where it is first imported)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {MODULES[service]}"],
+                          cwd=ROOT, env=_env(0, 0, tempfile.gettempdir()),
+                          capture_output=True, text=True, check=True)
+    total, children = 0.0, []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if not match:
+            continue
+        cumulative_us, depth, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if name == MODULES[service]:
+            total = cumulative_us / 1e6
+        elif depth == 3:  # one level below the service module (two spaces per level)
+            children.append((cumulative_us / 1e6, name))
+    children.sort(reverse=True)
+    return {"import_s": total, "heaviest": [{"module": n, "s": s} for s, n in children[:top]]}
+
+
+# ----- report -----
+def _median(runs, key):
+    return statistics.median(r[key] for r in runs)
+
+
+def _print_results(results):
+    print(f"{'service':<10} {'warmup':>7} {'listen s':>9} {'ready s':>8} {'first s':>8} "
+          f"{'first ms':>9} {'next ms':>8}")
+    for r in results:
+        print(f"{r['service']:<10} {r['warmup_rows']:>7} {r['listen_s']:>9.3f} {r['ready_s']:>8.3f} "
+              f"{r['first_s']:>8.3f} {r['first_ms']:>9.1f} {r['next_ms']:>8.1f}")
+
+
+def _print_imports(profiles):
+    for service, profile in profiles.items():
+        print(f"\n{service}: {MODULES[service]} imports in {profile['import_s']:.3f}s")
+        for item in profile["heaviest"]:
+            print(f"  {item['s']:>7.3f}s  {item['module']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--services", nargs="+", choices=sorted(MODULES), default=list(MODULES))
+    parser.add_argument("--warmup-rows", nargs="+", type=int, default=[0, 1000],
+                        help="GRPC_WARMUP_ROWS values to compare (0 = no warm-up)")
+    parser.add_argument("--runs", type=int, default=5, help="cold starts per service and warm-up setting")
+    parser.add_argument("--rows", type=int, default=10000, help="rows in each probe RPC")
+    parser.add_argument("--report-format", default="csv",
+                        help="ReportFormat of the reporter's probe (csv, csv_columnar, parquet, arrow, html)")
+    parser.add_argument("--imports", action="store_true", help="also profile each service's imports")
+    parser.add_argument("--out", default=RESULTS, help="results JSON")
+    args = parser.parse_args(argv)
+
+    probes = rpcs(args.rows, m.ReportFormat.Value(f"REPORT_FORMAT_{args.report_format.upper()}"))
+    results = []
+    with tempfile.TemporaryDirectory(prefix="energy-startup-") as out_dir:
+        for service in args.services:
+            for warmup_rows in args.warmup_rows:
+                runs = [cold_start(service, probes[service], warmup_rows, out_dir) for _ in range(args.runs)]
+                result = {"service": service, "warmup_rows": warmup_rows, "runs": len(runs)}
+                result.update({key: _median(runs, key) for key in runs[0]})
+                results.append(result)
+                print(f"{service} warmup_rows={warmup_rows}: first RPC done {result['first_s']:.3f}s "
+                      f"after start", file=sys.stderr)
+    _print_results(results)
+
+    profiles = {}
+    if args.imports:
+        profiles = {service: import_profile(service) for service in args.services}
+        _print_imports(profiles)
+
+    doc = {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "python": sys.version.split()[0],
+                 "cpus": os.cpu_count(), "runs": args.runs, "rows": args.rows,
+                 "report_format": args.report_format},
+        "results": results,
+        "imports": profiles,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(doc, f, indent=2)
+    print(f"\nresults written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())